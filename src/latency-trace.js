@@ -0,0 +1,15 @@
+// Clock for end-to-end latency traces.
+// The MAVLink parser stamps forwarded telemetry with a trace id and the
+// receive, decode and forward times; the UDP ingest worker, the main process
+// and the renderer add their own stages (see renderer/latency-view.js).
+// Every process uses a monotonic clock anchored to the wall clock at its
+// start (performance.timeOrigin + performance.now() here and in the
+// renderer, the same construction in the parser), so stamps taken by
+// different processes on one host can be subtracted.
+const { performance } = require('perf_hooks');
+
+function traceClock() {
+  return performance.timeOrigin + performance.now();
+}
+
+module.exports = { traceClock };
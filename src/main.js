@@ -1,23 +1,66 @@
-const { app, BrowserWindow, ipcMain } = require('electron');
+const { app, BrowserWindow, ipcMain, dialog } = require('electron');
 const path = require('path');
 const { spawn } = require('child_process');
-const dgram = require('dgram');
+const net = require('net');
+const { Worker } = require('worker_threads');
 const fs = require('fs');
+const { readNDJSON } = require('./ndjson-reader');
+const { StatusChannel, DEFAULT_RATE } = require('./status-channel');
+const { SharedTelemetry, createSharedBuffer } = require('./shared-telemetry');
+const { traceClock } = require('./latency-trace');
+
+const MISSION_DAEMON_HOST = '127.0.0.1';
+const MISSION_DAEMON_PORT = 14560;
+const DAEMON_COMMAND_TIMEOUT = 10000; // ms to wait for the daemon to answer a command
+// Mission backend: 'simple' (simulator), 'mavlink' (pymavlink) or 'dronekit'
+const MISSION_BACKEND = process.env.MISSION_BACKEND || 'simple';
+// Optional geofence JSON checked by the mission controller on every position update
+const MISSION_FENCE = process.env.MISSION_FENCE;
+// Optional directory of DEM tiles; missions are checked for terrain clearance
+const MISSION_TERRAIN = process.env.MISSION_TERRAIN;
+// Optional MBTiles file for the offline moving map, served by tile_server.py
+const MAP_TILES = process.env.MAP_TILES;
+const TILE_SERVER_HOST = '127.0.0.1';
+const TILE_SERVER_PORT = 14570;
+// Status pushes to the renderer per second; changes in between are coalesced
+const STATUS_RATE = Number(process.env.STATUS_RATE) || DEFAULT_RATE;
 
 let mainWindow;
-let pythonProcess;
-let udpServer;
-let droneStatus = {
+let missionDaemon;
+let daemonSocket;
+let daemonConnecting;
+let daemonRequestId = 0;
+let daemonPending = new Map();
+let currentJobId = null;
+let udpWorker;
+let tileServer;
+let tileServerReady = null;
+// Numeric telemetry written by the UDP ingest worker, read here without a message round trip
+const sharedTelemetry = new SharedTelemetry(createSharedBuffer());
+const statusChannel = new StatusChannel(sendToRenderer, {
   connected: false,
   armed: false,
   mode: 'UNKNOWN',
   altitude: 0,
   latitude: 0,
   longitude: 0,
+  heading: 0,
+  groundspeed: 0,
   battery: 0,
   distanceToTarget: 0,
+  climbRate: null,
+  homeDistance: null,
+  homeBearing: null,
+  eta: null,
+  batteryDrain: null,
+  flightTimeLeft: null,
+  geofence: null,
+  fenceName: null,
+  fenceDistance: null,
+  dataAge: null,
+  linkRtt: null,
   status: 'Disconnected'
-};
+}, STATUS_RATE);
 
 function createWindow() {
   mainWindow = new BrowserWindow({
@@ -39,15 +82,19 @@ function createWindow() {
   }
 }
 
-app.whenReady().then(createWindow);
+app.whenReady().then(() => {
+  createWindow();
+  // Start the mission daemon up front so the first mission starts warm
+  startMissionDaemon();
+  if (MAP_TILES) {
+    startTileServer(MAP_TILES).catch((error) => console.error('Tile server:', error.message));
+  }
+});
 
 app.on('window-all-closed', () => {
-  if (pythonProcess) {
-    pythonProcess.kill();
-  }
-  if (udpServer) {
-    udpServer.close();
-  }
+  stopMissionDaemon();
+  stopUdpWorker();
+  stopTileServer();
   if (process.platform !== 'darwin') {
     app.quit();
   }
@@ -59,63 +106,264 @@ app.on('activate', () => {
   }
 });
 
+function sendToRenderer(channel, ...args) {
+  if (mainWindow && !mainWindow.isDestroyed()) {
+    mainWindow.webContents.send(channel, ...args);
+  }
+}
+
+// Mission daemon management
+function startMissionDaemon() {
+  if (missionDaemon) {
+    return;
+  }
+
+  const daemonScriptPath = path.join(__dirname, 'python/mission_daemon.py');
+
+  if (!fs.existsSync(daemonScriptPath)) {
+    console.error('Mission daemon script not found');
+    return;
+  }
+
+  const daemonArgs = [
+    '-u', daemonScriptPath,
+    '--backend', MISSION_BACKEND,
+    '--port', String(MISSION_DAEMON_PORT)
+  ];
+  if (MISSION_FENCE) {
+    daemonArgs.push('--fence', MISSION_FENCE);
+  }
+  if (MISSION_TERRAIN) {
+    daemonArgs.push('--terrain', MISSION_TERRAIN);
+  }
+  missionDaemon = spawn('python', daemonArgs);
+  console.log('Mission daemon started');
+
+  missionDaemon.stdout.on('data', (data) => {
+    const output = data.toString();
+    console.log('Python output:', output);
+    sendToRenderer('python-output', output);
+  });
+
+  missionDaemon.stderr.on('data', (data) => {
+    const error = data.toString();
+    console.error('Python error:', error);
+    sendToRenderer('python-error', error);
+  });
+
+  missionDaemon.on('close', (code) => {
+    console.log(`Mission daemon exited with code ${code}`);
+    missionDaemon = null;
+    if (currentJobId) {
+      currentJobId = null;
+      sendToRenderer('mission-complete', code);
+    }
+  });
+}
+
+function stopMissionDaemon() {
+  if (daemonSocket) {
+    daemonSocket.write(JSON.stringify({ command: 'shutdown' }) + '\n');
+    daemonSocket.end();
+    daemonSocket = null;
+  }
+  if (missionDaemon) {
+    const daemon = missionDaemon;
+    setTimeout(() => daemon.kill(), 2000);
+  }
+}
+
+// Offline map tiles: tile_server.py serves an MBTiles file to the renderer over HTTP
+async function startTileServer(file) {
+  // The old server has to release the port first
+  await stopTileServer();
+  const url = `http://${TILE_SERVER_HOST}:${TILE_SERVER_PORT}`;
+  const server = spawn('python', [
+    '-u', path.join(__dirname, 'python/tile_server.py'), file,
+    '--host', TILE_SERVER_HOST,
+    '--port', String(TILE_SERVER_PORT)
+  ]);
+  tileServer = server;
+  let output = '';
+  let exited = false;
+  server.stdout.on('data', (data) => {
+    output += data.toString();
+    console.log('Tile server:', data.toString().trim());
+  });
+  server.stderr.on('data', (data) => {
+    output += data.toString();
+    console.error('Tile server error:', data.toString().trim());
+  });
+  server.on('close', (code) => {
+    exited = true;
+    if (tileServer === server) {
+      tileServer = null;
+      tileServerReady = null;
+    }
+    console.log(`Tile server exited with code ${code}`);
+  });
+
+  // Ready once it answers with the file's metadata
+  tileServerReady = new Promise((resolve, reject) => {
+    const attempt = async (remaining) => {
+      if (exited) {
+        reject(new Error(output.trim() || 'Tile server exited'));
+        return;
+      }
+      try {
+        const response = await fetch(`${url}/metadata`);
+        resolve({ url, name: path.basename(file), metadata: await response.json() });
+      } catch (error) {
+        if (remaining <= 0) {
+          reject(new Error(`Could not reach tile server: ${error.message}`));
+        } else {
+          setTimeout(() => attempt(remaining - 1), 100);
+        }
+      }
+    };
+    attempt(50);
+  });
+  return tileServerReady;
+}
+
+function stopTileServer() {
+  const server = tileServer;
+  tileServer = null;
+  tileServerReady = null;
+  if (!server || server.exitCode !== null || server.signalCode !== null) {
+    return Promise.resolve();
+  }
+  return new Promise((resolve) => {
+    server.once('close', resolve);
+    server.kill();
+  });
+}
+
+function connectToDaemon(retries = 50) {
+  if (daemonSocket) {
+    return Promise.resolve(daemonSocket);
+  }
+  if (daemonConnecting) {
+    return daemonConnecting;
+  }
+
+  startMissionDaemon();
+
+  daemonConnecting = new Promise((resolve, reject) => {
+    const attempt = (remaining) => {
+      const socket = net.createConnection({ host: MISSION_DAEMON_HOST, port: MISSION_DAEMON_PORT });
+
+      socket.once('connect', () => {
+        socket.setNoDelay(true);
+        readNDJSON(socket, handleDaemonMessage, (line) => {
+          console.error('Invalid message from mission daemon:', line);
+        });
+        socket.on('close', () => {
+          if (daemonSocket === socket) {
+            daemonSocket = null;
+          }
+          for (const { reject: rejectPending } of daemonPending.values()) {
+            rejectPending(new Error('Mission daemon disconnected'));
+          }
+          daemonPending.clear();
+        });
+        daemonSocket = socket;
+        daemonConnecting = null;
+        resolve(socket);
+      });
+
+      socket.once('error', (err) => {
+        socket.destroy();
+        if (remaining <= 0) {
+          daemonConnecting = null;
+          reject(new Error(`Could not reach mission daemon: ${err.message}`));
+          return;
+        }
+        setTimeout(() => attempt(remaining - 1), 200);
+      });
+    };
+    attempt(retries);
+  });
+
+  return daemonConnecting;
+}
+
+async function sendDaemonCommand(command) {
+  const socket = await connectToDaemon();
+  const requestId = ++daemonRequestId;
+
+  return new Promise((resolve, reject) => {
+    const timer = setTimeout(() => {
+      daemonPending.delete(requestId);
+      reject(new Error('Mission daemon did not respond'));
+    }, DAEMON_COMMAND_TIMEOUT);
+    daemonPending.set(requestId, {
+      resolve: (message) => {
+        clearTimeout(timer);
+        resolve(message);
+      },
+      reject: (error) => {
+        clearTimeout(timer);
+        reject(error);
+      }
+    });
+    socket.write(JSON.stringify({ ...command, request_id: requestId }) + '\n');
+  });
+}
+
+function handleDaemonMessage(message) {
+  if (message.type === 'response') {
+    const pending = daemonPending.get(message.request_id);
+    if (pending) {
+      daemonPending.delete(message.request_id);
+      pending.resolve(message);
+    }
+  } else if (message.type === 'event') {
+    handleDaemonEvent(message);
+  }
+}
+
+function handleDaemonEvent(event) {
+  switch (event.event) {
+    case 'job_started':
+      console.log(`Mission ${event.job_id} started after ${(event.start_latency * 1000).toFixed(1)} ms`);
+      break;
+    case 'job_finished':
+    case 'job_failed':
+      if (event.job_id === currentJobId) {
+        currentJobId = null;
+      }
+      sendToRenderer('mission-complete', event.success ? 0 : 1);
+      break;
+    case 'geofence_breach':
+    case 'geofence_near_breach':
+    case 'geofence_clear':
+      applyGeofenceEvent(event);
+      break;
+    default:
+      applyMissionEvent(event);
+      break;
+  }
+}
+
 // IPC handlers
-ipcMain.handle('start-mission', async (event, { latitude, longitude, altitude, waitTime }) => {
+ipcMain.handle('start-mission', async (event, { latitude, longitude, altitude, waitTime, mission }) => {
   try {
-    // Choose the appropriate script based on availability
-    let scriptPath;
-    
-    // Try simple UDP mission first to avoid DroneKit mode errors
-    const simpleScriptPath = path.join(__dirname, 'python/simple_udp_mission.py');
-    const droneKitScriptPath = path.join(__dirname, 'python/drone_mission.py');
-    
-    // Check if we should use the simple script or full DroneKit
-    const useSimpleScript = true; // Set to false when DroneKit issues are resolved
-    
-    if (useSimpleScript && fs.existsSync(simpleScriptPath)) {
-      scriptPath = simpleScriptPath;
-      console.log('Using simple UDP mission script');
-    } else if (fs.existsSync(droneKitScriptPath)) {
-      scriptPath = droneKitScriptPath;
-      console.log('Using full DroneKit mission script');
+    const jobId = `mission-${Date.now()}`;
+    const command = { command: 'start_mission', job_id: jobId };
+    if (mission) {
+      // Waypoint mission loaded from a file (e.g. survey_planner.py output)
+      Object.assign(command, mission);
     } else {
-      throw new Error('No mission script found');
+      Object.assign(command, { latitude, longitude, altitude, wait_time: waitTime });
     }
-    
-    // Update the script with new coordinates
-    let scriptContent = fs.readFileSync(scriptPath, 'utf8');
-    
-    // Replace the coordinates in the script
-    scriptContent = scriptContent.replace(/LATITUDE = [\d.-]+/, `LATITUDE = ${latitude}`);
-    scriptContent = scriptContent.replace(/LONGITUDE = [\d.-]+/, `LONGITUDE = ${longitude}`);
-    scriptContent = scriptContent.replace(/ALTITUDE = [\d.-]+/, `ALTITUDE = ${altitude}`);
-    scriptContent = scriptContent.replace(/WAIT_TIME_AT_TARGET = [\d.-]+/, `WAIT_TIME_AT_TARGET = ${waitTime}`);
-    
-    fs.writeFileSync(scriptPath, scriptContent);
-    
-    // Start the Python process
-    pythonProcess = spawn('python', [scriptPath]);
-    
-    pythonProcess.stdout.on('data', (data) => {
-      const output = data.toString();
-      console.log('Python output:', output);
-      mainWindow.webContents.send('python-output', output);
-      
-      // Parse output for status updates
-      parseStatusFromOutput(output);
-    });
-    
-    pythonProcess.stderr.on('data', (data) => {
-      const error = data.toString();
-      console.error('Python error:', error);
-      mainWindow.webContents.send('python-error', error);
-    });
-    
-    pythonProcess.on('close', (code) => {
-      console.log(`Python process exited with code ${code}`);
-      mainWindow.webContents.send('mission-complete', code);
-    });
-    
+    const response = await sendDaemonCommand(command);
+
+    if (!response.ok) {
+      return { success: false, message: response.message };
+    }
+
+    currentJobId = response.job_id;
     return { success: true, message: 'Mission started successfully' };
   } catch (error) {
     console.error('Error starting mission:', error);
@@ -123,49 +371,128 @@ ipcMain.handle('start-mission', async (event, { latitude, longitude, altitude, w
   }
 });
 
+ipcMain.handle('load-mission-file', async () => {
+  const result = await dialog.showOpenDialog(mainWindow, {
+    title: 'Load Mission File',
+    filters: [{ name: 'Mission JSON', extensions: ['json'] }],
+    properties: ['openFile']
+  });
+  if (result.canceled || !result.filePaths.length) {
+    return { success: false, canceled: true };
+  }
+
+  const filePath = result.filePaths[0];
+  try {
+    const data = JSON.parse(await fs.promises.readFile(filePath, 'utf8'));
+    const waypoints = Array.isArray(data) ? data : data.waypoints;
+    if (!Array.isArray(waypoints) || waypoints.length === 0) {
+      return { success: false, message: 'Mission file has no waypoints' };
+    }
+    const invalid = waypoints.findIndex(wp =>
+      !Number.isFinite(wp.latitude) || !Number.isFinite(wp.longitude) || !Number.isFinite(wp.altitude));
+    if (invalid !== -1) {
+      return { success: false, message: `Waypoint ${invalid + 1} needs numeric latitude, longitude and altitude` };
+    }
+
+    const mission = { waypoints };
+    if (data.default_speed !== undefined) mission.default_speed = data.default_speed;
+    if (data.arrival_radius !== undefined) mission.arrival_radius = data.arrival_radius;
+    return { success: true, name: path.basename(filePath), mission };
+  } catch (error) {
+    return { success: false, message: `Could not read mission file: ${error.message}` };
+  }
+});
+
+ipcMain.handle('save-trace', async (event, content) => {
+  const result = await dialog.showSaveDialog(mainWindow, {
+    title: 'Export Latency Trace',
+    defaultPath: `latency-trace-${new Date().toISOString().replace(/[:.]/g, '-')}.json`,
+    filters: [{ name: 'Trace JSON', extensions: ['json'] }]
+  });
+  if (result.canceled || !result.filePath) {
+    return { success: false, canceled: true };
+  }
+  try {
+    await fs.promises.writeFile(result.filePath, content);
+    return { success: true, message: `Trace saved to ${result.filePath}` };
+  } catch (error) {
+    return { success: false, message: `Could not save trace: ${error.message}` };
+  }
+});
+
+ipcMain.handle('load-map-tiles', async () => {
+  const result = await dialog.showOpenDialog(mainWindow, {
+    title: 'Load Offline Map',
+    filters: [{ name: 'MBTiles', extensions: ['mbtiles'] }],
+    properties: ['openFile']
+  });
+  if (result.canceled || !result.filePaths.length) {
+    return { success: false, canceled: true };
+  }
+  try {
+    return { success: true, ...await startTileServer(result.filePaths[0]) };
+  } catch (error) {
+    return { success: false, message: error.message };
+  }
+});
+
+// The map started from MAP_TILES, if any, once it is ready
+ipcMain.handle('get-map-tiles', async () => {
+  if (!tileServerReady) {
+    return { success: false };
+  }
+  try {
+    return { success: true, ...await tileServerReady };
+  } catch (error) {
+    return { success: false, message: error.message };
+  }
+});
+
 ipcMain.handle('stop-mission', async () => {
-  if (pythonProcess) {
-    pythonProcess.kill();
-    pythonProcess = null;
-    return { success: true, message: 'Mission stopped' };
+  if (currentJobId && daemonSocket) {
+    const response = await sendDaemonCommand({ command: 'cancel', job_id: currentJobId });
+    if (response.ok) {
+      return { success: true, message: 'Mission stopped' };
+    }
+    return { success: false, message: response.message };
   }
   return { success: false, message: 'No mission running' };
 });
 
+// UDP ingest runs in a worker thread; see udp-ingest-worker.js
 ipcMain.handle('start-udp-server', async (event, port) => {
   try {
-    if (udpServer) {
-      udpServer.close();
-    }
-    
-    udpServer = dgram.createSocket('udp4');
-    
-    udpServer.on('listening', () => {
-      const address = udpServer.address();
-      console.log(`UDP Server listening on ${address.address}:${address.port}`);
-      mainWindow.webContents.send('udp-status', { connected: true, port: address.port });
+    stopUdpWorker();
+
+    const worker = new Worker(path.join(__dirname, 'udp-ingest-worker.js'), {
+      workerData: { port, buffer: sharedTelemetry.buffer, rate: STATUS_RATE }
     });
-    
-    udpServer.on('message', (msg, remote) => {
-      const message = msg.toString();
-      console.log(`UDP message from ${remote.address}:${remote.port} - ${message}`);
-      
-      // Parse Herelink telemetry data
-      parseHerelinkData(message);
-      
-      mainWindow.webContents.send('udp-message', {
-        from: `${remote.address}:${remote.port}`,
-        message: message
-      });
+    udpWorker = worker;
+
+    worker.on('message', (message) => {
+      if (worker !== udpWorker) {
+        return;
+      }
+      switch (message.type) {
+        case 'listening':
+          console.log(`UDP Server listening on ${message.address}:${message.port}`);
+          sendToRenderer('udp-status', { connected: true, port: message.port });
+          break;
+        case 'telemetry':
+          applyWorkerTelemetry(message);
+          break;
+        case 'error':
+          console.error('UDP Server error:', message.message);
+          sendToRenderer('udp-error', message.message);
+          break;
+      }
     });
-    
-    udpServer.on('error', (err) => {
-      console.error('UDP Server error:', err);
-      mainWindow.webContents.send('udp-error', err.message);
+
+    worker.on('error', (err) => {
+      console.error('UDP ingest worker error:', err);
+      sendToRenderer('udp-error', err.message);
     });
-    
-    udpServer.bind(port);
-    
+
     return { success: true, message: `UDP server started on port ${port}` };
   } catch (error) {
     console.error('Error starting UDP server:', error);
@@ -174,107 +501,72 @@ ipcMain.handle('start-udp-server', async (event, port) => {
 });
 
 ipcMain.handle('stop-udp-server', async () => {
-  if (udpServer) {
-    udpServer.close();
-    udpServer = null;
-    mainWindow.webContents.send('udp-status', { connected: false });
+  if (udpWorker) {
+    stopUdpWorker();
+    sendToRenderer('udp-status', { connected: false });
     return { success: true, message: 'UDP server stopped' };
   }
   return { success: false, message: 'No UDP server running' };
 });
 
+function stopUdpWorker() {
+  if (udpWorker) {
+    // The worker closes its socket and exits; later messages from it are ignored
+    udpWorker.postMessage({ type: 'stop' });
+    udpWorker = null;
+  }
+}
+
+function applyWorkerTelemetry(message) {
+  if (message.trace) {
+    message.trace.main = traceClock();
+    statusChannel.setTrace(message.trace);
+  }
+  const numeric = message.numeric ? sharedTelemetry.read() : null;
+  if (numeric) {
+    statusChannel.update(numeric);
+  }
+  if (message.text) {
+    statusChannel.update(message.text);
+  }
+  if (message.lines) {
+    // Raw lines for the console go out batched with the next status flush
+    statusChannel.appendBatch('udp-messages', message.lines.items, message.lines.dropped);
+  }
+  if (message.events) {
+    message.events.forEach(fenceEvent => sendToRenderer('geofence-event', fenceEvent));
+  }
+}
+
 ipcMain.handle('get-drone-status', async () => {
-  return droneStatus;
+  // Include telemetry the worker wrote since its last notification
+  const numeric = sharedTelemetry.read();
+  if (numeric) {
+    statusChannel.update(numeric);
+  }
+  return statusChannel.snapshot();
 });
 
-function parseStatusFromOutput(output) {
-  // Parse different status information from Python output
-  if (output.includes('Connecting to vehicle')) {
-    droneStatus.status = 'Connecting...';
-  } else if (output.includes('Arming motors')) {
-    droneStatus.status = 'Arming...';
-    droneStatus.connected = true;
-  } else if (output.includes('Taking off')) {
-    droneStatus.status = 'Taking off...';
-    droneStatus.armed = true;
-  } else if (output.includes('Altitude:')) {
-    const altMatch = output.match(/Altitude: ([\d.]+)/);
-    if (altMatch) {
-      droneStatus.altitude = parseFloat(altMatch[1]);
-    }
-  } else if (output.includes('Distance to target:')) {
-    const distMatch = output.match(/Distance to target: ([\d.]+)/);
-    if (distMatch) {
-      droneStatus.distanceToTarget = parseFloat(distMatch[1]);
-      droneStatus.status = 'Flying to target...';
-    }
-  } else if (output.includes('Reached target location')) {
-    droneStatus.status = 'At target location';
-  } else if (output.includes('Return To Launch')) {
-    droneStatus.status = 'Returning to launch';
-    droneStatus.mode = 'RTL';
-  }
-  
-  // Send updated status to renderer
-  mainWindow.webContents.send('drone-status-update', droneStatus);
+function applyMissionEvent(event) {
+  // Structured events from the mission controllers: phase, altitude, distance, mode
+  statusChannel.update({
+    status: event.phase,
+    altitude: event.altitude,
+    distanceToTarget: event.distance,
+    mode: event.mode,
+    armed: event.armed,
+    connected: event.connected,
+    latitude: event.latitude,
+    longitude: event.longitude
+  });
 }
 
-function parseHerelinkData(data) {
-  try {
-    // Parse JSON telemetry data from our mission scripts
-    const telemetry = JSON.parse(data);
-    
-    // Handle telemetry from simple UDP mission script
-    if (telemetry.latitude !== undefined) droneStatus.latitude = telemetry.latitude;
-    if (telemetry.longitude !== undefined) droneStatus.longitude = telemetry.longitude;
-    if (telemetry.altitude !== undefined) droneStatus.altitude = telemetry.altitude;
-    if (telemetry.mode !== undefined) droneStatus.mode = telemetry.mode;
-    if (telemetry.armed !== undefined) droneStatus.armed = telemetry.armed;
-    if (telemetry.battery !== undefined) droneStatus.battery = telemetry.battery;
-    if (telemetry.groundspeed !== undefined) droneStatus.groundspeed = telemetry.groundspeed;
-    if (telemetry.heading !== undefined) droneStatus.heading = telemetry.heading;
-    if (telemetry.connected !== undefined) droneStatus.connected = telemetry.connected;
-    if (telemetry.status !== undefined) droneStatus.status = telemetry.status;
-    
-    // Handle MAVLink parser data structure
-    if (telemetry.drone_status) {
-      const status = telemetry.drone_status;
-      
-      if (status.latitude !== undefined) droneStatus.latitude = status.latitude;
-      if (status.longitude !== undefined) droneStatus.longitude = status.longitude;
-      if (status.altitude !== undefined) droneStatus.altitude = status.altitude;
-      if (status.mode !== undefined) droneStatus.mode = status.mode;
-      if (status.armed !== undefined) droneStatus.armed = status.armed;
-      if (status.battery !== undefined) droneStatus.battery = status.battery;
-      if (status.groundspeed !== undefined) droneStatus.groundspeed = status.groundspeed;
-      if (status.heading !== undefined) droneStatus.heading = status.heading;
-      if (status.connected !== undefined) droneStatus.connected = status.connected;
-      if (status.system_status !== undefined) droneStatus.status = status.system_status;
-    }
-    
-    // Send updated status to renderer
-    mainWindow.webContents.send('drone-status-update', droneStatus);
-    
-    // Log message type for debugging
-    if (telemetry.mavlink_type) {
-      console.log(`MAVLink: ${telemetry.mavlink_type} from ${telemetry.source_ip}`);
-    }
-    
-  } catch (error) {
-    // Handle raw data (non-JSON)
-    const dataStr = data.toString();
-    
-    if (dataStr.length > 100) {
-      // This is likely raw MAVLink data - just log it briefly
-      console.log(`Received raw data - length: ${dataStr.length} bytes`);
-    } else {
-      // Short message, might be readable
-      console.log('Received data:', dataStr.substring(0, 50));
-    }
-    
-    // Update connection status even for raw data
-    droneStatus.connected = true;
-    droneStatus.status = 'Receiving data';
-    mainWindow.webContents.send('drone-status-update', droneStatus);
-  }
-}
\ No newline at end of file
+function applyGeofenceEvent(event) {
+  // Fence transitions carry their own distance/position; keep them out of the mission status
+  statusChannel.update({
+    geofence: event.status,
+    fenceName: event.fence,
+    fenceDistance: event.distance
+  });
+  sendToRenderer('geofence-event', event);
+}
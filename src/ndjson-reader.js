@@ -0,0 +1,58 @@
+const { StringDecoder } = require('string_decoder');
+
+// Streaming reader for newline-delimited JSON.
+// Chunks may split lines (or multi-byte characters) anywhere, and one chunk
+// may carry many events; every complete line is parsed exactly once.
+class NDJSONReader {
+  constructor(onMessage, onError) {
+    this.onMessage = onMessage;
+    this.onError = onError || ((line, error) => console.error('Invalid NDJSON line:', error.message));
+    this.decoder = new StringDecoder('utf8');
+    this.pending = '';
+  }
+
+  push(chunk) {
+    const text = this.pending + (typeof chunk === 'string' ? chunk : this.decoder.write(chunk));
+    let start = 0;
+    let newline;
+
+    while ((newline = text.indexOf('\n', start)) !== -1) {
+      const line = text.slice(start, newline);
+      start = newline + 1;
+      if (line.trim()) {
+        this.parseLine(line);
+      }
+    }
+
+    this.pending = text.slice(start);
+  }
+
+  end() {
+    const rest = this.pending + this.decoder.end();
+    this.pending = '';
+    if (rest.trim()) {
+      this.parseLine(rest);
+    }
+  }
+
+  parseLine(line) {
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      this.onError(line, error);
+      return;
+    }
+    this.onMessage(message);
+  }
+}
+
+// Attach a reader to a readable stream
+function readNDJSON(stream, onMessage, onError) {
+  const reader = new NDJSONReader(onMessage, onError);
+  stream.on('data', (chunk) => reader.push(chunk));
+  stream.on('end', () => reader.end());
+  return reader;
+}
+
+module.exports = { NDJSONReader, readNDJSON };
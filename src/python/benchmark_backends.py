@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+Mission Backend Benchmark
+Compares the DroneKit backend (drone_mission.DroneController) with the
+pymavlink backend (mavlink_backend.MAVLinkController):
+
+  import    cold import time of each library, in fresh interpreters
+  startup   time from connect() to the first position fix (needs --connection)
+  tick      cost of reading the vehicle state once: DroneKit attribute reads
+            against pymavlink latest-message cache reads, each fed to the
+            controller (needs --connection)
+  dispatch  decode + listener/handler + publish cost per message, offline
+
+Both backends are timed through their current controllers: the DroneKit
+DroneController with its attribute listeners and publisher, and the
+MAVLinkController with its message handlers and publisher.
+
+Example against SITL:
+  python benchmark_backends.py --connection tcp:127.0.0.1:5760
+"""
+
+import subprocess
+import statistics
+import time
+import sys
+import argparse
+
+IMPORT_STATEMENTS = {
+    'dronekit': 'from dronekit import connect, VehicleMode, LocationGlobalRelative',
+    'pymavlink': 'from pymavlink import mavutil',
+}
+
+STARTUP_TIMEOUT = 30.0  # Seconds allowed for the connection and the first position
+TICK_MESSAGES = ('HEARTBEAT', 'GLOBAL_POSITION_INT', 'VFR_HUD', 'SYS_STATUS')  # Read per pymavlink tick
+
+def time_import(statement, runs=5):
+    """Median cold import time in seconds, or None if the import fails"""
+    code = ("import time; t = time.perf_counter(); " + statement +
+            "; print(time.perf_counter() - t)")
+    samples = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+def time_per_call(function, iterations):
+    """Mean seconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations
+
+def wait_for(condition, timeout, what):
+    """Poll until condition() is true; TimeoutError after timeout seconds"""
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() >= deadline:
+            raise TimeoutError(f"no {what} within {timeout:g}s")
+        time.sleep(0.01)
+
+def benchmark_dronekit_live(connection, iterations):
+    """Startup time and per-tick vehicle state read cost for the DroneKit backend"""
+    from dronekit import connect
+    from drone_mission import DroneController, TELEMETRY_ATTRIBUTES
+
+    controller = DroneController()
+    start = time.perf_counter()
+    controller.vehicle = connect(connection, wait_ready=False, timeout=STARTUP_TIMEOUT)
+    try:
+        controller.register_telemetry_listeners()
+        wait_for(lambda: controller.publisher.get('lat'), STARTUP_TIMEOUT, 'position')
+        startup = time.perf_counter() - start
+
+        vehicle = controller.vehicle
+        attributes = [name.split('.') for name in TELEMETRY_ATTRIBUTES]
+
+        def tick():
+            # Every telemetry attribute read through DroneKit's object model
+            for path in attributes:
+                value = vehicle
+                for part in path:
+                    value = getattr(value, part)
+                controller.on_vehicle_attribute(vehicle, '.'.join(path), value)
+
+        per_tick = time_per_call(tick, iterations)
+    finally:
+        controller.cleanup()
+    return startup, per_tick
+
+def benchmark_mavlink_live(connection, iterations):
+    """Startup time and per-tick vehicle state read cost for the pymavlink backend"""
+    import threading
+    from mavlink_backend import MAVLinkController
+
+    controller = MAVLinkController([connection])
+    start = time.perf_counter()
+    if not controller.connect_to_vehicle(timeout=STARTUP_TIMEOUT):
+        raise TimeoutError(f"no heartbeat within {STARTUP_TIMEOUT:g}s")
+    try:
+        receiver = threading.Thread(target=controller.receive_thread)
+        receiver.daemon = True
+        receiver.start()
+        wait_for(lambda: controller.latest('GLOBAL_POSITION_INT'), STARTUP_TIMEOUT, 'position')
+        startup = time.perf_counter() - start
+
+        # Wait for one of each telemetry message so every tick reads a full state
+        wait_for(lambda: all(controller.latest(name) for name in TICK_MESSAGES),
+                 STARTUP_TIMEOUT, ', '.join(TICK_MESSAGES))
+
+        def tick():
+            # Every telemetry message read from the latest-message cache
+            for name in TICK_MESSAGES:
+                controller.handlers[name](controller.latest(name))
+
+        per_tick = time_per_call(tick, iterations)
+    finally:
+        controller.cleanup()
+    return startup, per_tick
+
+def simulated_frames(count=200):
+    """Encoded MAVLink frames from one simulated vehicle"""
+    from swarm_simulator import SwarmSimulator
+
+    simulator = SwarmSimulator(1, seed=0)
+    frames = []
+    while len(frames) < count:
+        simulator.step(0.05)
+        for batch in simulator.due_frames():
+            frames.extend(frame.tobytes() for frame in batch)
+    return frames
+
+def time_dispatch(mav, dispatch, frames, iterations):
+    """Mean seconds to decode and dispatch one message"""
+    start = time.perf_counter()
+    count = 0
+    for _ in range(iterations):
+        for data in frames:
+            for msg in mav.parse_buffer(data) or []:
+                dispatch(msg)
+                count += 1
+    return (time.perf_counter() - start) / max(count, 1)
+
+def benchmark_dronekit_dispatch(iterations):
+    """Per-message decode + listener cost of the DroneKit backend, offline"""
+    from dronekit import Vehicle
+    from dronekit.mavlink import MAVConnection
+    from drone_mission import DroneController
+
+    # Nothing arrives on the connection's port: messages are fed to its
+    # listeners the same way its receive thread does
+    handler = MAVConnection('udpin:127.0.0.1:0', source_system=255)
+    controller = DroneController()
+    controller.vehicle = Vehicle(handler)
+    controller.register_telemetry_listeners()
+    handler.start()
+
+    def dispatch(msg):
+        for listener in handler.message_listeners:
+            listener(handler, msg)
+
+    per_message = time_dispatch(handler.master.mav, dispatch, simulated_frames(), iterations)
+    handler.close()
+    return per_message
+
+def benchmark_mavlink_dispatch(iterations):
+    """Per-message decode + handler cost of the pymavlink backend, offline"""
+    from pymavlink import mavutil
+    from mavlink_backend import MAVLinkController
+
+    controller = MAVLinkController()
+    controller.master = mavutil.mavlink_connection('udpin:127.0.0.1:0', source_system=255)
+    controller.master.target_system = 1
+    controller.master.target_component = 1
+
+    def dispatch(msg):
+        controller.messages[msg.get_type()] = msg
+        handler = controller.handlers.get(msg.get_type())
+        if handler:
+            handler(msg)
+
+    per_message = time_dispatch(controller.master.mav, dispatch, simulated_frames(), iterations)
+    controller.master.close()
+    return per_message
+
+def format_time(seconds, scale=1000.0, unit='ms'):
+    """Format a duration, or n/a"""
+    if seconds is None:
+        return 'n/a'
+    return f"{seconds * scale:.3f} {unit}"
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Benchmark DroneKit vs pymavlink backends')
+    parser.add_argument('--connection', help='Vehicle connection string for live benchmarks')
+    parser.add_argument('--iterations', type=int, default=1000, help='Iterations per timing')
+    parser.add_argument('--import-runs', type=int, default=5, help='Fresh interpreters per import timing')
+    args = parser.parse_args()
+
+    print("=== Mission Backend Benchmark ===")
+    results = {'dronekit': {}, 'pymavlink': {}}
+
+    for backend, statement in IMPORT_STATEMENTS.items():
+        results[backend]['import'] = time_import(statement, args.import_runs)
+
+    if args.connection:
+        for backend, function in (('dronekit', benchmark_dronekit_live),
+                                  ('pymavlink', benchmark_mavlink_live)):
+            try:
+                startup, per_tick = function(args.connection, args.iterations)
+                results[backend]['startup'] = startup
+                results[backend]['tick'] = per_tick
+            except Exception as e:
+                print(f"{backend} live benchmark failed: {e}")
+
+    for backend, function in (('dronekit', benchmark_dronekit_dispatch),
+                              ('pymavlink', benchmark_mavlink_dispatch)):
+        try:
+            results[backend]['dispatch'] = function(max(1, args.iterations // 100))
+        except Exception as e:
+            print(f"{backend} dispatch benchmark failed: {e}")
+
+    print(f"{'':<22}{'DroneKit':>16}{'pymavlink':>16}")
+    rows = [
+        ('Import', 'import', 1000.0, 'ms'),
+        ('Startup to position', 'startup', 1000.0, 'ms'),
+        ('Telemetry tick', 'tick', 1e6, 'us'),
+        ('Per-message dispatch', 'dispatch', 1e6, 'us'),
+    ]
+    for label, key, scale, unit in rows:
+        print(f"{label:<22}"
+              f"{format_time(results['dronekit'].get(key), scale, unit):>16}"
+              f"{format_time(results['pymavlink'].get(key), scale, unit):>16}")
+
+if __name__ == "__main__":
+    main()
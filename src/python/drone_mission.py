@@ -1,11 +1,15 @@
 from dronekit import connect, VehicleMode, LocationGlobalRelative
-from geopy.distance import geodesic
 import time
 import socket
 import json
 import threading
 import sys
 import logging
+from mission_events import open_event_stream
+from telemetry_publisher import TelemetryPublisher
+from waypoint_mission import Mission, MissionProgress
+from geofence import GeofenceMonitor
+from profiler import start_profiler
 
 # Suppress DroneKit mode errors
 logging.getLogger('dronekit').setLevel(logging.CRITICAL)
@@ -16,15 +20,36 @@ LONGITUDE = 74.7179  # Replace with your target longitude
 ALTITUDE = 30  # Replace with your target altitude
 WAIT_TIME_AT_TARGET = 30  # Wait time in seconds
 
+# Periodic telemetry rate in Hz; mode/armed/phase changes are sent immediately
+TELEMETRY_RATE = 1.0
+
+# Vehicle attributes whose listeners feed the telemetry publisher
+TELEMETRY_ATTRIBUTES = ('location.global_relative_frame', 'mode', 'armed',
+                        'battery', 'groundspeed', 'heading')
+
 # Herelink UDP connection settings
 HERELINK_HOST = '192.168.43.22'  # Default Herelink IP
 HERELINK_PORT = 14550  # Default MAVLink port
 
 class DroneController:
-    def __init__(self):
+    def __init__(self, telemetry_rate=TELEMETRY_RATE, geofence=None):
         self.vehicle = None
         self.udp_socket = None
         self.is_running = True
+        self.cancel_requested = False
+        self.event_callback = None
+        self.fence_monitor = GeofenceMonitor(geofence, self.on_fence_event) if geofence else None
+        self.publisher = TelemetryPublisher(self.send_telemetry, telemetry_rate, {
+            'lat': 0,
+            'lon': 0,
+            'alt': 0,
+            'mode': 'UNKNOWN',
+            'armed': False,
+            'battery': 0,
+            'groundspeed': 0,
+            'heading': 0,
+            'connected': False
+        })
         
     def setup_udp_connection(self):
         """Setup UDP connection to Herelink"""
@@ -47,6 +72,28 @@ class DroneController:
             except Exception as e:
                 print(f"Error sending telemetry: {e}")
     
+    def report_event(self, event, **data):
+        """Pass a structured mission event to the registered callback"""
+        if self.event_callback:
+            try:
+                self.event_callback(event, data)
+            except Exception as e:
+                print(f"Error reporting event: {e}")
+        if event == 'phase':
+            self.publisher.update(status=data['phase'])
+    
+    def mission_active(self):
+        """Whether the current mission should keep running"""
+        return self.is_running and not self.cancel_requested
+    
+    def on_fence_event(self, event, data):
+        """Report geofence transitions and return to launch on a breach"""
+        self.report_event(event, **data)
+        self.publisher.update(geofence=data['status'])
+        if event == 'geofence_breach' and self.mission_active():
+            print(f"Geofence breach at {data['fence']} ({data['distance']:.1f}m) - returning to launch")
+            self.cancel_requested = True
+    
     def safe_get_mode(self):
         """Safely get vehicle mode without throwing exceptions"""
         try:
@@ -270,41 +317,40 @@ class DroneController:
         except Exception as e:
             print(f"Error checking pre-arm status: {e}")
     
-    def telemetry_thread(self):
-        """Background thread to send telemetry data"""
-        while self.is_running and self.vehicle:
-            try:
-                if self.vehicle.location.global_relative_frame:
-                    # Safely get telemetry data
-                    location = self.vehicle.location.global_relative_frame
-                    
-                    telemetry_data = {
-                        'lat': location.lat if location.lat else 0,
-                        'lon': location.lon if location.lon else 0,
-                        'alt': location.alt if location.alt else 0,
-                        'mode': self.safe_get_mode(),
-                        'armed': self.safe_get_armed_status(),
-                        'battery': self.vehicle.battery.voltage if self.vehicle.battery else 0,
-                        'groundspeed': self.vehicle.groundspeed if self.vehicle.groundspeed else 0,
-                        'heading': self.vehicle.heading if self.vehicle.heading else 0,
-                        'timestamp': time.time(),
-                        'connected': True
-                    }
-                    
-                    self.send_telemetry(telemetry_data)
-                time.sleep(1)
-            except Exception as e:
-                print(f"Telemetry error: {e}")
-                time.sleep(1)
+    def on_vehicle_attribute(self, vehicle, name, value):
+        """DroneKit attribute listener feeding the telemetry publisher"""
+        try:
+            if name == 'location.global_relative_frame':
+                self.publisher.update(
+                    lat=value.lat if value.lat else 0,
+                    lon=value.lon if value.lon else 0,
+                    alt=value.alt if value.alt else 0
+                )
+                if self.fence_monitor and value.lat and value.lon:
+                    self.fence_monitor.update(value.lat, value.lon, value.alt)
+            elif name == 'mode':
+                mode = str(value.name) if value else 'UNKNOWN'
+                if mode != self.publisher.get('mode'):
+                    self.report_event('mode', mode=mode)
+                self.publisher.update(mode=mode)
+            elif name == 'armed':
+                self.publisher.update(armed=bool(value))
+            elif name == 'battery':
+                self.publisher.update(battery=value.voltage if value and value.voltage else 0)
+            elif name in ('groundspeed', 'heading'):
+                self.publisher.update({name: value if value else 0})
+        except Exception as e:
+            print(f"Telemetry error: {e}")
     
-    def get_distance_to_target(self, current_location, target_location):
-        """Calculate distance to target location"""
-        if not current_location.lat or not current_location.lon:
-            return float('inf')
-        return geodesic(
-            (current_location.lat, current_location.lon), 
-            (target_location.lat, target_location.lon)
-        ).meters
+    def register_telemetry_listeners(self):
+        """Push telemetry on vehicle attribute changes instead of polling"""
+        for name in TELEMETRY_ATTRIBUTES:
+            self.vehicle.add_attribute_listener(name, self.on_vehicle_attribute)
+        self.publisher.update(connected=True)
+    
+    def telemetry_thread(self):
+        """Background thread sending telemetry at the telemetry rate and on changes"""
+        self.publisher.run()
     
     def wait_for_mode_change(self, target_mode, timeout=30):
         """Wait for mode change with timeout and error handling"""
@@ -354,13 +400,18 @@ class DroneController:
                 raise Exception(f"All arming methods failed: {e}")
         
         print("Successfully armed for testing!")
+        self.report_event('phase', phase='Armed', armed=True)
         
         # For testing, we'll simulate takeoff since real takeoff might be dangerous
         print("SIMULATING takeoff for indoor testing...")
+        self.report_event('phase', phase='Taking off')
         
         # Update our internal status to simulate flight
         for alt in range(0, int(target_altitude) + 1, 2):
+            if not self.mission_active():
+                break
             print(f"Simulated Altitude: {alt}m")
+            self.report_event('altitude', altitude=alt)
             time.sleep(0.5)
             
             if alt >= target_altitude * 0.9:
@@ -369,43 +420,89 @@ class DroneController:
         
         print("Indoor testing takeoff simulation complete!")
     
-    def arm_and_goto(self, target_location):
+    def return_to_launch(self):
+        """Switch the vehicle to RTL and wait for the mode change"""
+        print("Changing mode to RTL (Return To Launch).")
+        self.report_event('phase', phase='Returning to launch', mode='RTL')
+        try:
+            self.vehicle.mode = VehicleMode("RTL")
+            self.wait_for_mode_change("RTL")
+        except Exception as e:
+            print(f"Error setting RTL mode: {e}")
+    
+    def arm_and_goto(self, target_location, wait_time=None):
         """Execute the complete mission: takeoff, goto, and return"""
+        if wait_time is None:
+            wait_time = WAIT_TIME_AT_TARGET
+        mission = Mission.single_target(target_location.lat, target_location.lon,
+                                        target_location.alt, wait_time)
+        return self.fly_mission(mission)
+    
+    def hold_position(self, seconds):
+        """Wait at the current waypoint unless the mission stops"""
+        wait_end = time.time() + seconds
+        while self.mission_active() and time.time() < wait_end:
+            time.sleep(min(1, max(0, wait_end - time.time())))
+    
+    def fly_mission(self, mission):
+        """Execute a waypoint mission: takeoff, fly every leg, and return"""
         try:
-            self.arm_and_takeoff(target_location.alt)
-            
-            print(f"Going to target location: {target_location}")
-            self.vehicle.simple_goto(target_location)
-            
-            while self.is_running:
-                try:
-                    current_location = self.vehicle.location.global_relative_frame
-                    distance_to_target = self.get_distance_to_target(current_location, target_location)
-                    
-                    print(f"Distance to target: {distance_to_target:.1f} meters")
-                    
-                    if distance_to_target < 2:  # Within 2 meters of target
-                        print("Reached target location!")
-                        break
-                except Exception as e:
-                    print(f"Error calculating distance: {e}")
-                
-                time.sleep(1)
-            
-            if self.is_running:
-                print(f"Waiting for {WAIT_TIME_AT_TARGET} seconds at the target location...")
-                time.sleep(WAIT_TIME_AT_TARGET)
+            waypoints = mission.waypoints
+            self.arm_and_takeoff(waypoints[0].alt)
+            
+            progress = MissionProgress(mission)
+            self.report_event('phase', phase='Flying to target')
+            for index, waypoint in enumerate(waypoints):
+                if not self.mission_active():
+                    break
+                last = index == len(waypoints) - 1
+                target_location = LocationGlobalRelative(waypoint.lat, waypoint.lon, waypoint.alt)
+                print(f"Going to waypoint {index + 1}/{len(waypoints)}: {target_location}")
+                self.vehicle.simple_goto(target_location, groundspeed=mission.leg_speed(index))
                 
-                print("Changing mode to RTL (Return To Launch).")
-                try:
-                    self.vehicle.mode = VehicleMode("RTL")
-                    self.wait_for_mode_change("RTL")
-                except Exception as e:
-                    print(f"Error setting RTL mode: {e}")
+                while self.mission_active():
+                    try:
+                        current_location = self.vehicle.location.global_relative_frame
+                        if current_location.lat and current_location.lon:
+                            arrived = progress.update(current_location.lat, current_location.lon,
+                                                      self.vehicle.groundspeed or 0)
+                            state = progress.state()
+                            print(f"Distance to target: {progress.distance_to_waypoint:.1f} meters "
+                                  f"(ETA {state['eta_waypoint']:.0f}s)")
+                            self.report_event('distance', distance=state['distance_to_waypoint'], **state)
+                            if arrived:
+                                break
+                    except Exception as e:
+                        print(f"Error calculating distance: {e}")
+                    
+                    time.sleep(1)
                 
+                if not self.mission_active():
+                    break
+                if last:
+                    print("Reached target location!")
+                    self.report_event('phase', phase='At target location')
+                else:
+                    print(f"Reached waypoint {index + 1}")
+                    self.report_event('waypoint_reached', waypoint=index)
+                if waypoint.hold_time:
+                    print(f"Waiting for {waypoint.hold_time:g} seconds at the waypoint...")
+                    self.hold_position(waypoint.hold_time)
+                progress.advance()
+            
+            if self.mission_active():
+                self.return_to_launch()
                 print("Mission completed successfully!")
+                self.report_event('phase', phase='Mission completed')
+                return True
+            
+            if self.cancel_requested and self.is_running:
+                print("Mission cancelled - returning to launch")
+                self.return_to_launch()
+                self.report_event('phase', phase='Mission cancelled')
             else:
                 print("Mission stopped by user")
+            return False
                 
         except Exception as e:
             print(f"Mission error: {e}")
@@ -458,40 +555,62 @@ class DroneController:
         print("Failed to connect to vehicle with all connection methods")
         return False
     
+    def prepare(self):
+        """Connect to the vehicle and start telemetry, ready for missions"""
+        # Setup UDP for telemetry
+        if not self.setup_udp_connection():
+            print("Warning: Could not setup UDP connection for telemetry")
+        
+        # Connect to vehicle
+        if not self.connect_to_vehicle():
+            print("Error: Could not connect to vehicle")
+            return False
+        
+        # Setup indoor testing mode
+        self.setup_indoor_testing()
+        
+        # Start telemetry thread
+        self.register_telemetry_listeners()
+        telemetry_thread = threading.Thread(target=self.telemetry_thread)
+        telemetry_thread.daemon = True
+        telemetry_thread.start()
+        return True
+    
+    def enter_guided_mode(self):
+        """Switch to GUIDED before flying a mission"""
+        print("Setting mode to GUIDED.")
+        try:
+            self.vehicle.mode = VehicleMode("GUIDED")
+            self.wait_for_mode_change("GUIDED")
+            self.report_event('phase', phase='Guided', mode='GUIDED')
+        except Exception as e:
+            print(f"Warning: Could not set GUIDED mode: {e}")
+    
+    def execute_mission(self, latitude, longitude, altitude, wait_time=None):
+        """Fly one mission on an already connected vehicle"""
+        self.cancel_requested = False
+        self.enter_guided_mode()
+        
+        target_location = LocationGlobalRelative(latitude, longitude, altitude)
+        print(f"Mission target: {latitude}, {longitude} at {altitude}m altitude")
+        
+        return self.arm_and_goto(target_location, wait_time)
+    
+    def execute_waypoint_mission(self, mission):
+        """Fly one waypoint mission on an already connected vehicle"""
+        self.cancel_requested = False
+        self.enter_guided_mode()
+        print(f"Mission: {len(mission)} waypoints, {mission.total_distance:.0f}m route")
+        return self.fly_mission(mission)
+    
     def run_mission(self):
         """Main mission execution function"""
         try:
-            # Setup UDP for telemetry
-            if not self.setup_udp_connection():
-                print("Warning: Could not setup UDP connection for telemetry")
-            
-            # Connect to vehicle
-            if not self.connect_to_vehicle():
-                print("Error: Could not connect to vehicle")
+            if not self.prepare():
                 return False
             
-            # Setup indoor testing mode
-            self.setup_indoor_testing()
-            
-            # Start telemetry thread
-            telemetry_thread = threading.Thread(target=self.telemetry_thread)
-            telemetry_thread.daemon = True
-            telemetry_thread.start()
-            
             # Execute mission
-            print("Setting mode to GUIDED.")
-            try:
-                self.vehicle.mode = VehicleMode("GUIDED")
-                self.wait_for_mode_change("GUIDED")
-            except Exception as e:
-                print(f"Warning: Could not set GUIDED mode: {e}")
-            
-            target_location = LocationGlobalRelative(LATITUDE, LONGITUDE, ALTITUDE)
-            print(f"Mission target: {LATITUDE}, {LONGITUDE} at {ALTITUDE}m altitude")
-            
-            self.arm_and_goto(target_location)
-            
-            return True
+            return self.execute_mission(LATITUDE, LONGITUDE, ALTITUDE)
             
         except KeyboardInterrupt:
             print("Mission interrupted by user")
@@ -505,6 +624,7 @@ class DroneController:
     def cleanup(self):
         """Clean up resources"""
         self.is_running = False
+        self.publisher.stop()
         
         if self.vehicle:
             try:
@@ -532,6 +652,18 @@ def main():
     
     controller = DroneController()
     
+    # Opt-in profiling through $DRONE_PROFILE
+    profiler = start_profiler('drone_mission')
+    if profiler:
+        # telemetry_thread runs for the whole flight; time each send it makes
+        controller.publisher.send = profiler.time_function(
+            controller.publisher.send, 'DroneController.telemetry_thread:send')
+    
+    # Structured events go to the dedicated channel when one is provided
+    event_stream = open_event_stream()
+    if event_stream:
+        controller.event_callback = event_stream.write_event
+    
     try:
         success = controller.run_mission()
         if success:
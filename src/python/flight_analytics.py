@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+"""
+Post-Flight Analytics
+Per-flight statistics computed with array operations over the columnar
+cache of a telemetry log (see flight_log.py): maximum altitude, distance
+flown, time armed and in each flight mode, battery drain rate and link
+loss episodes. The first query of a log converts it; later queries only
+memory-map the columns they need.
+"""
+
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+try:
+    from pymavlink import mavutil
+except ImportError:
+    mavutil = None
+
+from flight_log import FlightLog
+from geo_utils import EARTH_RADIUS
+
+MAV_MODE_FLAG_SAFETY_ARMED = 0x80
+MAV_TYPE_GCS = 6
+MAV_AUTOPILOT_INVALID = 8
+LINK_GAP = 2.0           # Seconds without a vehicle frame that count as a link loss episode
+TRACK_INTERVAL = 1.0     # Seconds between fixes used for distance flown, so GPS noise does not add up
+HEARTBEAT_TIMEOUT = 5.0  # Seconds a heartbeat's mode is assumed to last at most
+
+def path_length(lat, lon):
+    """Length in meters of a track of lat/lon points (degrees), all legs at once"""
+    phi = np.radians(lat)
+    lam = np.radians(lon)
+    d_phi = np.diff(phi)
+    d_lam = np.diff(lam)
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(d_lam / 2) ** 2
+    steps = 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return float(steps.sum())
+
+def thin(times, interval):
+    """Indices of the first sample in each interval"""
+    return np.unique(np.floor(times / interval), return_index=True)[1]
+
+def durations(times, limit):
+    """How long each sample holds: time to the next sample, at most limit seconds"""
+    if len(times) == 0:
+        return np.zeros(0)
+    return np.minimum(np.diff(times, append=times[-1]), limit)
+
+def mode_name(vehicle_type, custom_mode):
+    if mavutil:
+        mapping = mavutil.mode_mapping_bynumber(int(vehicle_type))
+        if mapping and int(custom_mode) in mapping:
+            return mapping[int(custom_mode)]
+    return f"Mode({int(custom_mode)})"
+
+def vehicle_component(log):
+    """(sysid, compid) of the vehicle's autopilot, or (None, None)
+
+    The autopilot is the component that sent the most HEARTBEATs that
+    were not from a ground station.
+    """
+    if not log.has('HEARTBEAT'):
+        return None, None
+    hb = log.table('HEARTBEAT', 'sysid', 'compid', 'type', 'autopilot')
+    vehicle = (hb['type'] != MAV_TYPE_GCS) & (hb['autopilot'] != MAV_AUTOPILOT_INVALID)
+    if not vehicle.any():
+        return None, None
+    keys = hb['sysid'][vehicle].astype(np.uint16) << 8 | hb['compid'][vehicle]
+    values, counts = np.unique(keys, return_counts=True)
+    key = values[counts.argmax()]
+    return int(key >> 8), int(key & 0xFF)
+
+def rows_from(log, message, sysid, compid):
+    if sysid is None:
+        return slice(None)
+    return (log.column(message, 'sysid') == sysid) & (log.column(message, 'compid') == compid)
+
+def seconds(log, message, rows):
+    return log.column(message, 'time_us')[rows] / 1e6
+
+def altitude_stats(log, sysid, compid):
+    if not log.has('GLOBAL_POSITION_INT'):
+        return None
+    rows = rows_from(log, 'GLOBAL_POSITION_INT', sysid, compid)
+    relative = log.column('GLOBAL_POSITION_INT', 'relative_alt')[rows] / 1000.0
+    amsl = log.column('GLOBAL_POSITION_INT', 'alt')[rows] / 1000.0
+    lat = log.column('GLOBAL_POSITION_INT', 'lat')[rows] / 1e7
+    lon = log.column('GLOBAL_POSITION_INT', 'lon')[rows] / 1e7
+    fix = (lat != 0) | (lon != 0)
+    track = thin(seconds(log, 'GLOBAL_POSITION_INT', rows)[fix], TRACK_INTERVAL)
+    speed = np.hypot(log.column('GLOBAL_POSITION_INT', 'vx')[rows],
+                     log.column('GLOBAL_POSITION_INT', 'vy')[rows]) / 100.0
+    if not len(relative):
+        return None
+    return {
+        'max_altitude_m': round(float(relative.max()), 1),
+        'max_altitude_amsl_m': round(float(amsl.max()), 1),
+        'distance_flown_m': round(path_length(lat[fix][track], lon[fix][track]), 1),
+        'max_groundspeed_ms': round(float(speed.max()), 1),
+        'positions': int(len(relative)),
+    }
+
+def phase_stats(log, sysid, compid):
+    """Time armed and per flight mode, from the vehicle's heartbeats"""
+    if sysid is None:
+        return None
+    rows = rows_from(log, 'HEARTBEAT', sysid, compid)
+    t = seconds(log, 'HEARTBEAT', rows)
+    held = durations(t, HEARTBEAT_TIMEOUT)
+    armed = (log.column('HEARTBEAT', 'base_mode')[rows] & MAV_MODE_FLAG_SAFETY_ARMED) != 0
+    modes = log.column('HEARTBEAT', 'custom_mode')[rows]
+    vehicle_type = log.column('HEARTBEAT', 'type')[rows]
+
+    unique, first, inverse = np.unique(modes, return_index=True, return_inverse=True)
+    per_mode = np.bincount(inverse, weights=held, minlength=len(unique))
+    # A mode change is where consecutive heartbeats differ
+    changes = int(np.count_nonzero(np.diff(modes.astype(np.int64))))
+    arms = np.count_nonzero(np.diff(armed.astype(np.int8)) == 1) + int(len(armed) > 0 and armed[0])
+    return {
+        'time_armed_s': round(float(held[armed].sum()), 1),
+        'arm_cycles': int(arms),
+        'mode_changes': changes,
+        'time_in_mode_s': {
+            mode_name(vehicle_type[first[i]], mode): round(float(per_mode[i]), 1) for i, mode in enumerate(unique)
+        },
+    }
+
+def battery_stats(log, sysid, compid):
+    """Battery drain as a least-squares slope over the armed part of the flight"""
+    if not log.has('SYS_STATUS'):
+        return None
+    rows = rows_from(log, 'SYS_STATUS', sysid, compid)
+    t = seconds(log, 'SYS_STATUS', rows)
+    remaining = log.column('SYS_STATUS', 'battery_remaining')[rows].astype(np.float64)
+    voltage = log.column('SYS_STATUS', 'voltage_battery')[rows] / 1000.0
+    if not len(t):
+        return None
+
+    window = np.ones(len(t), dtype=bool)
+    if log.has('HEARTBEAT') and sysid is not None:
+        # Armed intervals, looked up for every battery sample
+        hb_rows = rows_from(log, 'HEARTBEAT', sysid, compid)
+        hb_t = seconds(log, 'HEARTBEAT', hb_rows)
+        hb_armed = (log.column('HEARTBEAT', 'base_mode')[hb_rows] & MAV_MODE_FLAG_SAFETY_ARMED) != 0
+        if hb_armed.any():
+            index = np.clip(np.searchsorted(hb_t, t, side='right') - 1, 0, len(hb_t) - 1)
+            window = hb_armed[index]
+
+    known = window & (remaining >= 0)  # -1 means the autopilot does not estimate it
+    result = {
+        'voltage_start_v': round(float(voltage[0]), 2),
+        'voltage_end_v': round(float(voltage[-1]), 2),
+        'voltage_min_v': round(float(voltage.min()), 2),
+    }
+    if known.sum() >= 2 and np.ptp(t[known]) > 0:
+        slope = np.polyfit(t[known] - t[known][0], remaining[known], 1)[0]
+        result['remaining_start_pct'] = int(remaining[known][0])
+        result['remaining_end_pct'] = int(remaining[known][-1])
+        result['drain_pct_per_min'] = round(float(-slope * 60), 2)
+    if window.sum() >= 2 and np.ptp(t[window]) > 0:
+        slope = np.polyfit(t[window] - t[window][0], voltage[window], 1)[0]
+        result['voltage_drop_v_per_min'] = round(float(-slope * 60), 3)
+    return result
+
+def link_stats(log, sysid, compid, gap=LINK_GAP):
+    """Link loss episodes (gaps between vehicle frames) and sequence-gap loss"""
+    rows = rows_from(log, 'FRAMES', sysid, compid)
+    t = seconds(log, 'FRAMES', rows)
+    if len(t) < 2:
+        return None
+    gaps = np.diff(t)
+    lost = np.flatnonzero(gaps > gap)
+    seq = log.column('FRAMES', 'seq')[rows].astype(np.int16)
+    missing = (np.diff(seq) - 1) & 0xFF
+    # Large jumps backwards are reordered or repeated frames, not loss
+    missing = missing[missing < 128]
+    received = len(t)
+    return {
+        'frames': received,
+        'loss_rate': round(float(missing.sum() / (missing.sum() + received)), 4),
+        'episodes': [{'start_s': round(float(t[i] - t[0]), 1), 'duration_s': round(float(gaps[i]), 1)}
+                     for i in lost],
+        'longest_gap_s': round(float(gaps.max()), 1),
+    }
+
+def analyze(log):
+    """All per-flight statistics of a FlightLog"""
+    sysid, compid = vehicle_component(log)
+    t = log.column('FRAMES', 'time_us')
+    report = {
+        'log': log.log_path,
+        'vehicle': {'sysid': sysid, 'compid': compid} if sysid is not None else None,
+        'duration_s': round(float((t[-1] - t[0]) / 1e6), 1) if len(t) else 0.0,
+        'frames': int(len(t)),
+    }
+    report['flight'] = altitude_stats(log, sysid, compid)
+    report['phases'] = phase_stats(log, sysid, compid)
+    report['battery'] = battery_stats(log, sysid, compid)
+    report['link'] = link_stats(log, sysid, compid)
+    return report
+
+def print_report(report):
+    print(f"Log: {report['log']}")
+    print(f"Duration: {report['duration_s']}s, {report['frames']} frames")
+    flight = report['flight']
+    if flight:
+        print(f"Max altitude: {flight['max_altitude_m']}m ({flight['max_altitude_amsl_m']}m AMSL)")
+        print(f"Distance flown: {flight['distance_flown_m']}m, max groundspeed {flight['max_groundspeed_ms']}m/s")
+    phases = report['phases']
+    if phases:
+        print(f"Armed: {phases['time_armed_s']}s over {phases['arm_cycles']} cycles, "
+              f"{phases['mode_changes']} mode changes")
+        for mode, duration in sorted(phases['time_in_mode_s'].items(), key=lambda item: -item[1]):
+            print(f"  {mode}: {duration}s")
+    battery = report['battery']
+    if battery:
+        drain = battery.get('drain_pct_per_min')
+        print(f"Battery: {battery['voltage_start_v']}V -> {battery['voltage_end_v']}V "
+              f"(min {battery['voltage_min_v']}V)" + (f", {drain}%/min" if drain is not None else ''))
+    link = report['link']
+    if link:
+        print(f"Link: {link['loss_rate'] * 100:.2f}% frames lost, longest gap {link['longest_gap_s']}s, "
+              f"{len(link['episodes'])} loss episodes")
+        for episode in link['episodes']:
+            print(f"  at {episode['start_s']}s for {episode['duration_s']}s")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Post-flight statistics from MAVLink .tlog files')
+    parser.add_argument('logs', nargs='+', help='.tlog files (converted to a columnar cache on first use)')
+    parser.add_argument('--rebuild', action='store_true', help='Re-convert even if the cache is current')
+    parser.add_argument('--json', action='store_true', help='Print the reports as JSON')
+    args = parser.parse_args()
+
+    reports = []
+    for log_path in args.logs:
+        started = time.perf_counter()
+        try:
+            log = FlightLog(log_path, args.rebuild)
+            report = analyze(log)
+        except (OSError, ValueError) as e:
+            print(f"Error reading {log_path}: {e}")
+            sys.exit(1)
+        report['processing_s'] = round(time.perf_counter() - started, 3)
+        report['converted'] = log.converted
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+            print(f"({'converted and analyzed' if log.converted else 'analyzed from cache'} "
+                  f"in {report['processing_s']}s)\n")
+    if args.json:
+        print(json.dumps(reports if len(reports) > 1 else reports[0], indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Columnar Flight Logs
+Converts recorded MAVLink telemetry logs (.tlog: every frame prefixed with
+its receive time as a big-endian uint64 of microseconds, as written by
+QGroundControl, MAVProxy and `mavlink_parser.py --tlog`) into one directory
+of NumPy columns per message type, in a single streaming pass.
+
+  <log>.columns/
+    meta.json                  source size/mtime, frame counts
+    FRAMES/<column>.npy        time_us, sysid, compid, seq, msgid of every frame
+    GLOBAL_POSITION_INT/<field>.npy
+    HEARTBEAT/<field>.npy      ... one directory per decoded message type
+
+Every message directory also has time_us, sysid, compid and seq columns.
+Columns are plain .npy files opened memory-mapped, so later queries read
+only the columns they use and never decode MAVLink again. The cache is
+rebuilt when the source log changes.
+
+Decoded message types are those in mavlink_frames.MESSAGES; other frames
+appear in FRAMES only. Frames are not checksummed again: ground stations
+record only frames that pass their checksum, and TlogWriter
+(`mavlink_parser.py --tlog`) drops failing frames of every type whose
+checksum seed it knows, which includes every decoded type.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+
+import numpy as np
+
+from mavlink_frames import (MESSAGES_BY_ID, MAVLINK2_MAGIC, MAVLINK2_HEADER_LEN, MAVLINK1_HEADER_LEN,
+                            CHECKSUM_LEN, frame_crc_ok)
+from mavlink_router import MAVLINK1_MAGIC, MAVLINK2_SIGNED, SIGNATURE_LEN, message_crc_extra
+
+CACHE_SUFFIX = '.columns'
+CACHE_VERSION = 1
+READ_CHUNK = 4 << 20     # Bytes read from the log at a time
+SPILL_SIZE = 8 << 20     # Bytes of records buffered per message type before writing
+TLOG_FLUSH_INTERVAL = 1.0  # Seconds; a killed recorder loses at most this much
+TLOG_TIME = struct.Struct('>Q')
+RECORD_HEADER = struct.Struct('<QBBB')
+RECORD_HEADER_FIELDS = [('time_us', '<u8'), ('sysid', 'u1'), ('compid', 'u1'), ('seq', 'u1')]
+FRAME_DTYPE = np.dtype(RECORD_HEADER_FIELDS + [('msgid', '<u4')])
+FRAME_RECORD = struct.Struct('<QBBBI')
+
+def record_dtype(spec):
+    """Packed record of one message: receive time, header fields and payload"""
+    return np.dtype(RECORD_HEADER_FIELDS + [(name, spec.dtype.fields[name][0].str)
+                                            for name in spec.dtype.names])
+
+class TlogWriter:
+    """Records vehicle frames to a .tlog as they are received
+
+    Frames with a bad checksum are dropped. Frames of message types with an
+    unknown checksum seed (all but mavlink_frames.MESSAGES without pymavlink)
+    are recorded unchecked.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab', buffering=1 << 16)
+        self.frames = 0
+        self.bad_crc = 0
+        self.next_flush = 0.0
+
+    def write(self, data, frames, now=None):
+        """Append the frames of one datagram; frames as returned by scan_frames"""
+        now = time.time() if now is None else now
+        stamp = TLOG_TIME.pack(int(now * 1e6))
+        for start, end, _, _, _, msgid in frames:
+            crc_extra = message_crc_extra(msgid)
+            if crc_extra is not None and not frame_crc_ok(data, start, crc_extra):
+                self.bad_crc += 1
+                continue
+            self.file.write(stamp)
+            self.file.write(data[start:end])
+            self.frames += 1
+        if now >= self.next_flush:
+            self.file.flush()
+            self.next_flush = now + TLOG_FLUSH_INTERVAL
+
+    def close(self):
+        self.file.close()
+
+class ColumnSpill:
+    """Packed records of one message type, buffered in memory and spilled to a file"""
+
+    def __init__(self, path, dtype):
+        self.path = path
+        self.dtype = dtype
+        self.buffer = bytearray()
+        self.file = None
+        self.count = 0
+
+    def append(self, record):
+        self.buffer += record
+        self.count += 1
+        if len(self.buffer) >= SPILL_SIZE:
+            self.spill()
+
+    def spill(self):
+        if self.file is None:
+            self.file = open(self.path, 'wb')
+        self.file.write(self.buffer)
+        self.buffer = bytearray()
+
+    def write_columns(self, directory):
+        """Split the records into one .npy per field"""
+        os.makedirs(directory, exist_ok=True)
+        if self.file is None:
+            records = np.frombuffer(bytes(self.buffer), dtype=self.dtype)
+        else:
+            self.spill()
+            self.file.close()
+            records = np.memmap(self.path, dtype=self.dtype, mode='r')
+        for name in self.dtype.names:
+            # One column at a time, so memory stays at one column of the log
+            np.save(os.path.join(directory, name + '.npy'), np.ascontiguousarray(records[name]))
+        del records
+        if self.file is not None:
+            os.remove(self.path)
+
+def cache_path(log_path):
+    return log_path + CACHE_SUFFIX
+
+def source_signature(log_path):
+    stat = os.stat(log_path)
+    return {'size': stat.st_size, 'mtime': stat.st_mtime, 'version': CACHE_VERSION}
+
+def cache_is_current(log_path):
+    try:
+        with open(os.path.join(cache_path(log_path), 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return meta.get('source') == source_signature(log_path)
+
+def convert_log(log_path, output=None):
+    """Convert a .tlog into columnar .npy files in one streaming pass; returns the metadata"""
+    output = output or cache_path(log_path)
+    building = output + '.partial'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+
+    frames = ColumnSpill(os.path.join(building, 'FRAMES.rec'), FRAME_DTYPE)
+    messages = {}
+    for msgid, spec in MESSAGES_BY_ID.items():
+        messages[msgid] = (spec, ColumnSpill(os.path.join(building, spec.name + '.rec'), record_dtype(spec)))
+    skipped = 0
+
+    with open(log_path, 'rb') as f:
+        pending = b''
+        while True:
+            chunk = f.read(READ_CHUNK)
+            data = pending + chunk
+            size = len(data)
+            i = 0
+            while i + 8 + MAVLINK1_HEADER_LEN <= size:
+                magic = data[i + 8]
+                start = i + 8
+                if magic == MAVLINK2_MAGIC and start + MAVLINK2_HEADER_LEN <= size:
+                    length = data[start + 1]
+                    header = MAVLINK2_HEADER_LEN
+                    end = start + header + length + CHECKSUM_LEN
+                    if data[start + 2] & MAVLINK2_SIGNED:
+                        end += SIGNATURE_LEN
+                    msgid = data[start + 7] | (data[start + 8] << 8) | (data[start + 9] << 16)
+                    seq, sysid, compid = data[start + 4], data[start + 5], data[start + 6]
+                elif magic == MAVLINK1_MAGIC:
+                    length = data[start + 1]
+                    header = MAVLINK1_HEADER_LEN
+                    end = start + header + length + CHECKSUM_LEN
+                    msgid = data[start + 5]
+                    seq, sysid, compid = data[start + 2], data[start + 3], data[start + 4]
+                elif magic == MAVLINK2_MAGIC:
+                    break  # Header continues in the next chunk
+                else:
+                    # Not at a record boundary; resynchronise byte by byte
+                    i += 1
+                    skipped += 1
+                    continue
+                if end > size:
+                    break
+
+                time_us = TLOG_TIME.unpack_from(data, i)[0]
+                frames.append(FRAME_RECORD.pack(time_us, sysid, compid, seq, msgid))
+                entry = messages.get(msgid)
+                if entry is not None:
+                    spec, spill = entry
+                    payload = data[start + header:start + header + min(length, spec.length)]
+                    # MAVLink 2 drops trailing zero bytes; restore them
+                    spill.append(RECORD_HEADER.pack(time_us, sysid, compid, seq) +
+                                 payload.ljust(spec.length, b'\0'))
+                i = end
+            pending = data[i:]
+            if not chunk:
+                skipped += len(pending)
+                break
+
+    frames.write_columns(os.path.join(building, 'FRAMES'))
+    counts = {}
+    for spec, spill in messages.values():
+        if spill.count:
+            spill.write_columns(os.path.join(building, spec.name))
+            counts[spec.name] = spill.count
+    meta = {
+        'source': source_signature(log_path),
+        'frames': frames.count,
+        'messages': counts,
+        'skipped_bytes': skipped,
+    }
+    with open(os.path.join(building, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+
+    # Replace the old cache only once the new one is complete
+    shutil.rmtree(output, ignore_errors=True)
+    os.replace(building, output)
+    return meta
+
+class FlightLog:
+    """Memory-mapped columns of a converted log, converting it first if needed"""
+
+    def __init__(self, log_path, rebuild=False):
+        self.log_path = log_path
+        self.directory = cache_path(log_path)
+        self.converted = False
+        if rebuild or not cache_is_current(log_path):
+            convert_log(log_path, self.directory)
+            self.converted = True
+        with open(os.path.join(self.directory, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.columns = {}
+
+    def has(self, message):
+        return message == 'FRAMES' or message in self.meta['messages']
+
+    def column(self, message, field):
+        """One column as a read-only memory-mapped array"""
+        key = (message, field)
+        array = self.columns.get(key)
+        if array is None:
+            array = np.load(os.path.join(self.directory, message, field + '.npy'), mmap_mode='r')
+            self.columns[key] = array
+        return array
+
+    def table(self, message, *fields):
+        """Several columns of a message as a dict"""
+        return {field: self.column(message, field) for field in fields}
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Convert MAVLink .tlog files into columnar NumPy files')
+    parser.add_argument('logs', nargs='+', help='.tlog files to convert')
+    parser.add_argument('--force', action='store_true', help='Convert even if the cache is current')
+    args = parser.parse_args()
+
+    for log_path in args.logs:
+        if not args.force and cache_is_current(log_path):
+            print(f"{log_path}: cache is current")
+            continue
+        started = time.perf_counter()
+        try:
+            meta = convert_log(log_path)
+        except OSError as e:
+            print(f"Error converting {log_path}: {e}")
+            sys.exit(1)
+        elapsed = time.perf_counter() - started
+        types = ', '.join(f"{name} {count}" for name, count in sorted(meta['messages'].items()))
+        print(f"{log_path}: {meta['frames']} frames in {elapsed:.2f}s -> {cache_path(log_path)}")
+        print(f"  {types or 'no decoded message types'}")
+        if meta['skipped_bytes']:
+            print(f"  Skipped {meta['skipped_bytes']} bytes outside frames")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Streaming Flight Metrics
+Derived values the GUI shows next to the raw telemetry, updated
+incrementally as position and battery messages arrive:
+  - climb rate, an exponentially weighted average of altitude change
+  - distance and bearing to home and to the current target
+  - ETA to the target at the current groundspeed
+  - battery drain rate and the flight time left until the reserve
+
+Every estimator keeps a fixed handful of numbers and is updated in O(1);
+nothing is stored per sample or rescanned. Averages use a time constant
+rather than a per-sample weight, so they behave the same whatever rate
+the vehicle streams at.
+
+The battery percentage is integer and changes about once a minute, which
+makes sample-to-sample differences useless. The drain rate is instead the
+slope of an exponentially forgotten least-squares line through the
+(time, percentage) samples, kept as five running sums.
+"""
+
+import math
+
+from geo_utils import haversine_distance, initial_bearing
+
+CLIMB_TAU = 2.0          # Seconds; time constant of the climb rate average
+SPEED_TAU = 3.0          # Seconds; time constant of the groundspeed average
+DRAIN_TAU = 120.0        # Seconds; memory of the battery drain fit
+MIN_DRAIN_SPAN = 30.0    # Seconds of battery samples before a drain rate is reported
+MIN_ETA_SPEED = 0.5      # m/s; slower than this there is no meaningful ETA
+MAX_STEP = 5.0           # Seconds; a longer gap restarts the averages instead of blending
+BATTERY_RESERVE = 20.0   # Percent kept for landing, excluded from the flight time left
+
+def ewma_gain(dt, tau):
+    """Weight of a new sample dt seconds after the previous one"""
+    return 1.0 - math.exp(-dt / tau)
+
+class DrainEstimator:
+    """Slope of an exponentially forgotten least-squares fit of value against time"""
+
+    def __init__(self, tau=DRAIN_TAU):
+        self.tau = tau
+        self.reset()
+
+    def reset(self):
+        self.origin = None
+        self.last = None
+        self.first = None
+        self.sw = self.st = self.sy = self.stt = self.sty = 0.0
+
+    def add(self, t, value):
+        if self.origin is None:
+            self.origin = self.first = t
+        elif t <= self.last:
+            return
+        else:
+            decay = math.exp(-(t - self.last) / self.tau)
+            self.sw *= decay
+            self.st *= decay
+            self.sy *= decay
+            self.stt *= decay
+            self.sty *= decay
+        self.last = t
+        x = t - self.origin
+        self.sw += 1.0
+        self.st += x
+        self.sy += value
+        self.stt += x * x
+        self.sty += x * value
+
+    def slope(self):
+        """Value change per second, or None until there is enough data"""
+        if self.last is None or self.last - self.first < MIN_DRAIN_SPAN:
+            return None
+        denominator = self.sw * self.stt - self.st * self.st
+        if denominator <= 0:
+            return None
+        return (self.sw * self.sty - self.st * self.sy) / denominator
+
+class FlightMetrics:
+    def __init__(self, home=None, target=None, reserve=BATTERY_RESERVE):
+        self.home = home          # (lat, lon); otherwise taken where the vehicle arms
+        self.home_fixed = home is not None
+        self.target = target      # (lat, lon) of the current goal, if known
+        self.reserve = reserve
+        self.armed = False
+        self.position = None
+        self.last_position_time = None
+        self.last_altitude = None
+        self.climb_rate = None
+        self.groundspeed = None
+        self.drain = DrainEstimator()
+        self.battery = None
+        self.values = {}
+
+    def set_home(self, lat, lon):
+        self.home = (lat, lon)
+        self.home_fixed = True
+        self.update_geometry()
+
+    def set_target(self, lat, lon):
+        self.target = (lat, lon)
+        self.update_geometry()
+
+    def update_armed(self, armed):
+        if armed and not self.armed:
+            # A new flight: home is where it took off unless the autopilot said otherwise
+            if not self.home_fixed and self.position:
+                self.home = self.position
+            self.drain.reset()
+        self.armed = armed
+
+    def update_position(self, t, lat, lon, altitude, vn, ve):
+        """Position fix at vehicle time t (s), relative altitude (m) and velocity (m/s)"""
+        if lat == 0 and lon == 0:
+            return
+        self.position = (lat, lon)
+        if self.home is None:
+            self.home = self.position
+        speed = math.hypot(vn, ve)
+
+        dt = None if self.last_position_time is None else t - self.last_position_time
+        if dt == 0:
+            return  # The same fix again
+        if dt is None or dt < 0 or dt > MAX_STEP:
+            # First fix, a gap, or the vehicle clock restarted: start the averages again
+            self.groundspeed = speed
+            self.climb_rate = None
+        else:
+            climb = (altitude - self.last_altitude) / dt
+            if self.climb_rate is None:
+                self.climb_rate = climb
+            else:
+                self.climb_rate += ewma_gain(dt, CLIMB_TAU) * (climb - self.climb_rate)
+            self.groundspeed += ewma_gain(dt, SPEED_TAU) * (speed - self.groundspeed)
+        self.last_position_time = t
+        self.last_altitude = altitude
+
+        self.values['climb_rate'] = round(self.climb_rate, 2) if self.climb_rate is not None else None
+        self.values['groundspeed'] = round(self.groundspeed, 2)
+        self.update_geometry()
+
+    def update_geometry(self):
+        if self.position is None:
+            return
+        lat, lon = self.position
+        for name, point in (('home', self.home), ('target', self.target)):
+            if point is None:
+                continue
+            self.values[f'{name}_distance'] = round(haversine_distance(lat, lon, point[0], point[1]), 1)
+            self.values[f'{name}_bearing'] = round(initial_bearing(lat, lon, point[0], point[1]), 1)
+        distance = self.values.get('target_distance')
+        if distance is not None and self.groundspeed is not None and self.groundspeed >= MIN_ETA_SPEED:
+            self.values['target_eta'] = round(distance / self.groundspeed, 1)
+        else:
+            self.values['target_eta'] = None
+
+    def update_battery(self, t, remaining):
+        """Battery percentage at time t (s); negative means the autopilot has no estimate"""
+        if remaining is None or remaining < 0:
+            return
+        self.battery = remaining
+        self.drain.add(t, remaining)
+        slope = self.drain.slope()
+        if slope is None or slope >= 0:
+            # Not enough history, or charging/flat: no time estimate
+            self.values['battery_drain'] = round(-slope * 60, 2) if slope is not None else None
+            self.values['flight_time_left'] = None
+            return
+        drain_per_second = -slope
+        self.values['battery_drain'] = round(drain_per_second * 60, 2)  # %/min
+        usable = max(0.0, remaining - self.reserve)
+        self.values['flight_time_left'] = round(usable / drain_per_second)
+
+    def snapshot(self):
+        return dict(self.values)
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Geodesy Helpers
+Small spherical-earth helpers shared by the mission, simulation and
+telemetry modules. Accurate to well under a meter over mission distances.
+"""
+
+import math
+
+EARTH_RADIUS = 6371008.8  # Mean earth radius in meters
+METERS_PER_DEG_LAT = 111320.0
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance in meters"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (math.sin(d_phi / 2) ** 2 +
+         math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2)
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+def initial_bearing(lat1, lon1, lat2, lon2):
+    """Initial bearing in degrees (0-360) from point 1 to point 2"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_lambda = math.radians(lon2 - lon1)
+    y = math.sin(d_lambda) * math.cos(phi2)
+    x = math.cos(phi1) * math.sin(phi2) - math.sin(phi1) * math.cos(phi2) * math.cos(d_lambda)
+    return math.degrees(math.atan2(y, x)) % 360
+
+class LocalProjection:
+    """Equirectangular projection to (north, east) meters around an origin"""
+
+    def __init__(self, origin_lat, origin_lon):
+        self.origin_lat = origin_lat
+        self.origin_lon = origin_lon
+        self.meters_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(origin_lat))
+
+    def to_local(self, lat, lon):
+        """(north, east) in meters from the origin"""
+        return ((lat - self.origin_lat) * METERS_PER_DEG_LAT,
+                (lon - self.origin_lon) * self.meters_per_deg_lon)
+
+    def to_global(self, north, east):
+        """(lat, lon) of a local point"""
+        return (self.origin_lat + north / METERS_PER_DEG_LAT,
+                self.origin_lon + east / self.meters_per_deg_lon)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Geofence Engine
+Keep-in (inclusion) and keep-out (exclusion) areas made of polygons and
+cylinders, each with an optional altitude band. Fences are registered in a
+uniform latitude/longitude grid; the edges of every fence touching a grid
+cell are concatenated once, so checking a position is a single vectorized
+pass over the few fences near it, however many fences are loaded.
+
+Each check returns the signed margin to the closest boundary in meters
+(positive = safe, negative = breached). GeofenceMonitor turns successive
+checks into breach / near-breach / clear events.
+
+Fence JSON:
+  {"near_distance": 50,
+   "fences": [
+     {"type": "polygon", "name": "Airport", "kind": "exclusion",
+      "vertices": [[34.01, 74.70], [34.02, 74.71], ...], "max_alt": 120},
+     {"type": "cylinder", "name": "Stadium", "kind": "exclusion",
+      "center": [34.03, 74.72], "radius": 300},
+     {"type": "polygon", "name": "Flying field", "kind": "inclusion",
+      "vertices": [...], "max_alt": 120}]}
+"""
+
+import math
+import json
+
+import numpy as np
+
+from geo_utils import METERS_PER_DEG_LAT
+
+NEAR_DISTANCE = 50.0  # Meters from a boundary that count as a near breach
+CELL_SIZE = 0.01      # Grid cell size in degrees (~1.1 km of latitude)
+
+STATUS_OK = 'ok'
+STATUS_NEAR = 'near_breach'
+STATUS_BREACH = 'breach'
+
+class PolygonFence:
+    def __init__(self, name, vertices, inclusion=False, min_alt=None, max_alt=None):
+        vertices = np.asarray(vertices, dtype=float)
+        if vertices.ndim != 2 or vertices.shape[0] < 3 or vertices.shape[1] != 2:
+            raise ValueError(f"Fence {name}: a polygon needs at least three (lat, lon) vertices")
+        if np.allclose(vertices[0], vertices[-1]):
+            vertices = vertices[:-1]
+        self.name = name
+        self.inclusion = inclusion
+        self.min_alt = min_alt
+        self.max_alt = max_alt
+        self.lat = vertices[:, 0]
+        self.lon = vertices[:, 1]
+
+    def bounds(self):
+        """(min_lat, min_lon, max_lat, max_lon)"""
+        return self.lat.min(), self.lon.min(), self.lat.max(), self.lon.max()
+
+class CylinderFence:
+    def __init__(self, name, lat, lon, radius, inclusion=False, min_alt=None, max_alt=None):
+        if radius <= 0:
+            raise ValueError(f"Fence {name}: radius must be positive")
+        self.name = name
+        self.inclusion = inclusion
+        self.min_alt = min_alt
+        self.max_alt = max_alt
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.radius = float(radius)
+
+    def bounds(self):
+        """(min_lat, min_lon, max_lat, max_lon)"""
+        d_lat = self.radius / METERS_PER_DEG_LAT
+        d_lon = self.radius / (METERS_PER_DEG_LAT * math.cos(math.radians(self.lat)))
+        return self.lat - d_lat, self.lon - d_lon, self.lat + d_lat, self.lon + d_lon
+
+def fence_from_dict(data):
+    """Build a fence from its JSON description"""
+    inclusion = data.get('kind', 'exclusion') == 'inclusion'
+    name = data.get('name', 'fence')
+    if data.get('type', 'polygon') == 'cylinder':
+        lat, lon = data['center']
+        return CylinderFence(name, lat, lon, float(data['radius']), inclusion,
+                             data.get('min_alt'), data.get('max_alt'))
+    return PolygonFence(name, data['vertices'], inclusion, data.get('min_alt'), data.get('max_alt'))
+
+class FenceGroup:
+    """Concatenated geometry of a set of fences, checked in one pass"""
+
+    def __init__(self, fences):
+        self.polygons = [f for f in fences if isinstance(f, PolygonFence)]
+        self.cylinders = [f for f in fences if isinstance(f, CylinderFence)]
+        # Margins are reported polygons first, then cylinders
+        self.ordered = self.polygons + self.cylinders
+        self.inclusion = np.array([f.inclusion for f in self.ordered])
+        self.floor = np.array([-np.inf if f.min_alt is None else f.min_alt
+                               for f in self.ordered], dtype=float)
+        self.ceiling = np.array([np.inf if f.max_alt is None else f.max_alt
+                                 for f in self.ordered], dtype=float)
+
+        if self.polygons:
+            sizes = np.array([len(p.lat) for p in self.polygons])
+            self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+            self.a_lat = np.concatenate([p.lat for p in self.polygons])
+            self.a_lon = np.concatenate([p.lon for p in self.polygons])
+            self.b_lat = np.concatenate([np.roll(p.lat, -1) for p in self.polygons])
+            self.b_lon = np.concatenate([np.roll(p.lon, -1) for p in self.polygons])
+
+        if self.cylinders:
+            self.c_lat = np.array([c.lat for c in self.cylinders])
+            self.c_lon = np.array([c.lon for c in self.cylinders])
+            self.c_radius = np.array([c.radius for c in self.cylinders])
+
+    def horizontal_margins(self, lat, lon):
+        """Distance to each fence boundary, positive inside the fence"""
+        meters_per_deg_lon = METERS_PER_DEG_LAT * math.cos(math.radians(lat))
+        margins = []
+
+        if self.polygons:
+            # Edges relative to the query point, in meters
+            x1 = (self.a_lon - lon) * meters_per_deg_lon
+            y1 = (self.a_lat - lat) * METERS_PER_DEG_LAT
+            x2 = (self.b_lon - lon) * meters_per_deg_lon
+            y2 = (self.b_lat - lat) * METERS_PER_DEG_LAT
+            dx = x2 - x1
+            dy = y2 - y1
+            length_sq = dx * dx + dy * dy
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = np.clip(np.where(length_sq > 0, -(x1 * dx + y1 * dy) / length_sq, 0.0), 0.0, 1.0)
+                crosses = ((y1 > 0) != (y2 > 0)) & (x1 - y1 * dx / dy > 0)
+            distance = np.hypot(x1 + t * dx, y1 + t * dy)
+            nearest = np.minimum.reduceat(distance, self.offsets)
+            inside = np.add.reduceat(crosses.astype(np.int32), self.offsets) % 2 == 1
+            margins.append(np.where(inside, nearest, -nearest))
+
+        if self.cylinders:
+            d_north = (self.c_lat - lat) * METERS_PER_DEG_LAT
+            d_east = (self.c_lon - lon) * meters_per_deg_lon
+            margins.append(self.c_radius - np.hypot(d_north, d_east))
+
+        return np.concatenate(margins)
+
+    def margins(self, lat, lon, alt=None):
+        """Signed safety margin per fence; negative means breached"""
+        inside = self.horizontal_margins(lat, lon)
+        if alt is None:
+            vertical = np.full(len(inside), np.inf)
+        else:
+            vertical = np.minimum(alt - self.floor, self.ceiling - alt)  # Positive inside the band
+
+        # Inclusion: stay inside horizontally and inside the band.
+        # Exclusion: stay outside horizontally or outside the band.
+        return np.where(self.inclusion, np.minimum(inside, vertical), np.maximum(-inside, -vertical))
+
+class Geofence:
+    def __init__(self, fences=(), near_distance=NEAR_DISTANCE, cell_size=CELL_SIZE):
+        self.near_distance = near_distance
+        self.cell_size = cell_size
+        self.exclusions = []
+        self.inclusions = []
+        self.grid = {}
+        self.cell_groups = {}
+        self.inclusion_group = None
+        for fence in fences:
+            self.add(fence)
+
+    def __len__(self):
+        return len(self.exclusions) + len(self.inclusions)
+
+    def add(self, fence):
+        """Add a fence and register it in the grid"""
+        if fence.inclusion:
+            # Keep-in areas must always be checked, so they are not gridded
+            self.inclusions.append(fence)
+            self.inclusion_group = FenceGroup(self.inclusions)
+            return
+
+        index = len(self.exclusions)
+        self.exclusions.append(fence)
+        min_lat, min_lon, max_lat, max_lon = fence.bounds()
+        # Grow the box by the near-breach distance so near misses are found
+        pad_lat = self.near_distance / METERS_PER_DEG_LAT
+        pad_lon = self.near_distance / (METERS_PER_DEG_LAT *
+                                        max(math.cos(math.radians(max(abs(min_lat), abs(max_lat)))), 1e-6))
+        first = self.cell(min_lat - pad_lat, min_lon - pad_lon)
+        last = self.cell(max_lat + pad_lat, max_lon + pad_lon)
+        for row in range(first[0], last[0] + 1):
+            for col in range(first[1], last[1] + 1):
+                self.grid.setdefault((row, col), []).append(index)
+                self.cell_groups.pop((row, col), None)
+
+    def cell(self, lat, lon):
+        """Grid cell containing a point"""
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def group_for(self, key):
+        """Concatenated geometry of the exclusion fences in a cell, built on first use"""
+        group = self.cell_groups.get(key)
+        if group is None and key in self.grid:
+            group = FenceGroup([self.exclusions[i] for i in self.grid[key]])
+            self.cell_groups[key] = group
+        return group
+
+    def check(self, lat, lon, alt=None):
+        """Fence status at a position
+
+        Returns a dict with status (ok / near_breach / breach), the
+        controlling fence and its signed margin in meters.
+        """
+        worst_margin = math.inf
+        worst_fence = None
+
+        group = self.group_for(self.cell(lat, lon))
+        if group:
+            margins = group.margins(lat, lon, alt)
+            i = int(np.argmin(margins))
+            worst_margin = float(margins[i])
+            worst_fence = group.ordered[i]
+
+        if self.inclusion_group:
+            # Being inside any one keep-in area is enough
+            margins = self.inclusion_group.margins(lat, lon, alt)
+            i = int(np.argmax(margins))
+            if margins[i] < worst_margin:
+                worst_margin = float(margins[i])
+                worst_fence = self.inclusion_group.ordered[i]
+
+        if worst_margin < 0:
+            status = STATUS_BREACH
+        elif worst_margin < self.near_distance:
+            status = STATUS_NEAR
+        else:
+            status = STATUS_OK
+
+        return {
+            'status': status,
+            'fence': worst_fence.name if worst_fence else None,
+            'distance': round(worst_margin, 2) if worst_fence else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data, cell_size=CELL_SIZE):
+        fences = [fence_from_dict(fence) for fence in data['fences']]
+        return cls(fences, data.get('near_distance', NEAR_DISTANCE), cell_size)
+
+    @classmethod
+    def from_json(cls, path, cell_size=CELL_SIZE):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f), cell_size)
+
+class GeofenceMonitor:
+    """Checks positions and reports status transitions as events"""
+
+    def __init__(self, geofence, callback=None):
+        self.geofence = geofence
+        self.callback = callback
+        self.status = STATUS_OK
+        self.last_result = None
+
+    def update(self, lat, lon, alt=None):
+        """Check a position; calls callback(event, data) when the status changes"""
+        result = self.geofence.check(lat, lon, alt)
+        self.last_result = result
+        if result['status'] != self.status:
+            previous = self.status
+            self.status = result['status']
+            if self.callback:
+                event = 'geofence_clear' if self.status == STATUS_OK else 'geofence_' + self.status
+                self.callback(event, dict(result, previous=previous,
+                                          latitude=lat, longitude=lon, altitude=alt))
+        return result
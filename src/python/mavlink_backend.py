@@ -0,0 +1,505 @@
+#!/usr/bin/env python3
+"""
+PyMAVLink Mission Backend
+Mission controller that talks to the vehicle directly over a pymavlink
+connection instead of DroneKit. A receive thread keeps the latest message
+of every type in a cache and pushes the fields the GUI needs into the
+telemetry publisher; commands (mode change, arm, takeoff, RTL) are sent as
+COMMAND_LONG and tracked until the matching COMMAND_ACK arrives.
+
+Same mission interface as DroneController: prepare(), execute_mission(),
+cancel_requested, event_callback and cleanup().
+"""
+
+import socket
+import json
+import time
+import threading
+import sys
+import argparse
+
+try:
+    from pymavlink import mavutil
+    MAVLINK_AVAILABLE = True
+except ImportError:
+    print("PyMAVLink not available. Install with: pip install pymavlink")
+    MAVLINK_AVAILABLE = False
+
+from mission_events import open_event_stream
+from telemetry_publisher import TelemetryPublisher
+from waypoint_mission import Mission, MissionProgress
+from geofence import Geofence, GeofenceMonitor
+from profiler import start_profiler
+
+# Target GPS coordinates
+LATITUDE = 34.0173
+LONGITUDE = 74.7179
+ALTITUDE = 30
+WAIT_TIME_AT_TARGET = 30
+
+# Connection strings tried in order
+CONNECTION_STRINGS = [
+    'udpin:0.0.0.0:14550',  # Herelink / GCS UDP stream
+    '/dev/ttyUSB0',         # USB serial connection (fallback)
+]
+
+# Periodic telemetry rate in Hz; mode/armed/phase changes are sent immediately
+TELEMETRY_RATE = 1.0
+
+# Position-only mask for SET_POSITION_TARGET_GLOBAL_INT
+POSITION_TARGET_TYPEMASK = 0b110111111000
+
+class CommandRejected(Exception):
+    pass
+
+class MAVLinkController:
+    def __init__(self, connection_strings=None, baud=57600, telemetry_rate=TELEMETRY_RATE,
+                 geofence=None):
+        self.connection_strings = connection_strings or CONNECTION_STRINGS
+        self.baud = baud
+        self.master = None
+        self.vehicle_component = None
+        self.udp_socket = None
+        self.is_running = True
+        self.cancel_requested = False
+        self.event_callback = None
+        self.fence_monitor = GeofenceMonitor(geofence, self.on_fence_event) if geofence else None
+        self.messages = {}
+        self.pending_acks = {}
+        self.ack_lock = threading.Lock()
+        self.message_count = 0
+        self.publisher = TelemetryPublisher(self.send_telemetry, telemetry_rate, {
+            'connected': False,
+            'armed': False,
+            'mode': 'UNKNOWN',
+            'altitude': 0,
+            'latitude': 0,
+            'longitude': 0,
+            'battery': 0,
+            'groundspeed': 0,
+            'heading': 0,
+            'status': 'Initializing'
+        })
+        self.handlers = {
+            'HEARTBEAT': self.on_heartbeat,
+            'GLOBAL_POSITION_INT': self.on_global_position,
+            'VFR_HUD': self.on_vfr_hud,
+            'SYS_STATUS': self.on_sys_status,
+            'COMMAND_ACK': self.on_command_ack,
+        }
+
+    def setup_udp_connection(self):
+        """Setup UDP socket for telemetry to the Electron app"""
+        try:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            print("UDP socket created for telemetry")
+            return True
+        except Exception as e:
+            print(f"Error setting up UDP connection: {e}")
+            return False
+
+    def send_telemetry(self, data):
+        """Send telemetry data to Electron app"""
+        if self.udp_socket:
+            try:
+                self.udp_socket.sendto(json.dumps(data).encode(), ('localhost', 14551))
+            except Exception as e:
+                print(f"Error sending telemetry: {e}")
+
+    def report_event(self, event, **data):
+        """Pass a structured mission event to the registered callback"""
+        if self.event_callback:
+            try:
+                self.event_callback(event, data)
+            except Exception as e:
+                print(f"Error reporting event: {e}")
+        if event == 'phase':
+            self.publisher.update(status=data['phase'])
+
+    def mission_active(self):
+        """Whether the current mission should keep running"""
+        return self.is_running and not self.cancel_requested
+
+    def on_fence_event(self, event, data):
+        """Report geofence transitions and return to launch on a breach"""
+        self.report_event(event, **data)
+        self.publisher.update(geofence=data['status'])
+        if event == 'geofence_breach' and self.mission_active():
+            print(f"Geofence breach at {data['fence']} ({data['distance']:.1f}m) - returning to launch")
+            self.cancel_requested = True
+
+    def connect_to_vehicle(self, timeout=10):
+        """Open the MAVLink connection and wait for the first heartbeat"""
+        if not MAVLINK_AVAILABLE:
+            print("Error: pymavlink is required for this backend")
+            return False
+
+        for connection_string in self.connection_strings:
+            try:
+                print(f"Attempting to connect to vehicle via {connection_string}...")
+                master = mavutil.mavlink_connection(connection_string, baud=self.baud,
+                                                    source_system=255)
+                heartbeat = master.wait_heartbeat(timeout=timeout)
+                if heartbeat is None:
+                    print(f"No heartbeat on {connection_string}")
+                    master.close()
+                    continue
+                self.master = master
+                self.vehicle_component = heartbeat.get_srcComponent()
+                print(f"Connected to vehicle {master.target_system} via {connection_string}")
+                self.request_data_streams()
+                return True
+            except Exception as e:
+                print(f"Failed to connect via {connection_string}: {e}")
+        print("Failed to connect to vehicle with all connection methods")
+        return False
+
+    def request_data_streams(self, rate=4):
+        """Ask the autopilot to stream telemetry messages"""
+        self.master.mav.request_data_stream_send(
+            self.master.target_system, self.master.target_component,
+            mavutil.mavlink.MAV_DATA_STREAM_ALL, rate, 1)
+
+    def receive_thread(self):
+        """Receive messages, cache the latest of each type and dispatch handlers"""
+        while self.is_running and self.master:
+            try:
+                msg = self.master.recv_match(blocking=True, timeout=1.0)
+            except Exception as e:
+                if self.is_running:
+                    print(f"Error receiving message: {e}")
+                    time.sleep(1)
+                continue
+            if msg is None:
+                continue
+            msg_type = msg.get_type()
+            if msg_type == 'BAD_DATA' or msg.get_srcSystem() != self.master.target_system:
+                continue
+            self.message_count += 1
+            self.messages[msg_type] = msg
+            handler = self.handlers.get(msg_type)
+            if handler:
+                try:
+                    handler(msg)
+                except Exception as e:
+                    print(f"Error handling {msg_type}: {e}")
+
+    def on_heartbeat(self, msg):
+        """Mode and armed state from the vehicle heartbeat"""
+        if msg.get_srcComponent() != self.vehicle_component:
+            return
+        mode = mavutil.mode_string_v10(msg)
+        if mode != self.publisher.get('mode'):
+            self.report_event('mode', mode=mode)
+        armed = (msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED) != 0
+        self.publisher.update(connected=True, mode=mode, armed=armed)
+
+    def on_global_position(self, msg):
+        self.publisher.update(
+            latitude=msg.lat / 1e7,
+            longitude=msg.lon / 1e7,
+            altitude=msg.relative_alt / 1000.0,
+            heading=msg.hdg / 100.0 if msg.hdg != 65535 else 0
+        )
+        if self.fence_monitor and msg.lat:
+            self.fence_monitor.update(msg.lat / 1e7, msg.lon / 1e7, msg.relative_alt / 1000.0)
+
+    def on_vfr_hud(self, msg):
+        self.publisher.update(groundspeed=msg.groundspeed)
+
+    def on_sys_status(self, msg):
+        self.publisher.update(battery=msg.battery_remaining)
+
+    def on_command_ack(self, msg):
+        """Resolve the command waiting for this acknowledgement"""
+        if msg.result == mavutil.mavlink.MAV_RESULT_IN_PROGRESS:
+            return
+        with self.ack_lock:
+            pending = self.pending_acks.get(msg.command)
+        if pending:
+            pending['result'] = msg.result
+            pending['event'].set()
+
+    def latest(self, msg_type):
+        """Latest cached message of a type, or None"""
+        return self.messages.get(msg_type)
+
+    def send_command(self, command, params=(), timeout=3.0, retries=3):
+        """Send a COMMAND_LONG and wait for its COMMAND_ACK"""
+        params = list(params) + [0] * (7 - len(params))
+        pending = {'event': threading.Event(), 'result': None}
+        with self.ack_lock:
+            self.pending_acks[command] = pending
+        try:
+            for attempt in range(retries):
+                self.master.mav.command_long_send(
+                    self.master.target_system, self.master.target_component,
+                    command, attempt, *params)
+                if pending['event'].wait(timeout):
+                    break
+            else:
+                raise CommandRejected(f"No COMMAND_ACK for command {command}")
+        finally:
+            with self.ack_lock:
+                self.pending_acks.pop(command, None)
+
+        result = pending['result']
+        if result != mavutil.mavlink.MAV_RESULT_ACCEPTED:
+            name = mavutil.mavlink.enums['MAV_RESULT'][result].name
+            raise CommandRejected(f"Command {command} rejected: {name}")
+        return result
+
+    def set_mode(self, mode, timeout=10):
+        """Switch flight mode and wait for the heartbeat to confirm it"""
+        mode_id = self.master.mode_mapping().get(mode)
+        if mode_id is None:
+            raise CommandRejected(f"Unknown mode {mode}")
+        self.send_command(mavutil.mavlink.MAV_CMD_DO_SET_MODE,
+                          [mavutil.mavlink.MAV_MODE_FLAG_CUSTOM_MODE_ENABLED, mode_id])
+        return self.wait_for(lambda: self.publisher.get('mode') == mode, timeout)
+
+    def arm(self, timeout=10):
+        """Arm the motors"""
+        self.send_command(mavutil.mavlink.MAV_CMD_COMPONENT_ARM_DISARM, [1])
+        return self.wait_for(lambda: self.publisher.get('armed'), timeout)
+
+    def takeoff(self, altitude):
+        """Command a GUIDED takeoff to the given relative altitude"""
+        self.send_command(mavutil.mavlink.MAV_CMD_NAV_TAKEOFF, [0, 0, 0, 0, 0, 0, altitude])
+
+    def goto(self, latitude, longitude, altitude):
+        """Send a guided position target (no ACK for this message)"""
+        self.master.mav.set_position_target_global_int_send(
+            0, self.master.target_system, self.master.target_component,
+            mavutil.mavlink.MAV_FRAME_GLOBAL_RELATIVE_ALT_INT, POSITION_TARGET_TYPEMASK,
+            int(latitude * 1e7), int(longitude * 1e7), altitude,
+            0, 0, 0, 0, 0, 0, 0, 0)
+
+    def set_speed(self, speed):
+        """Set the GUIDED groundspeed for the following position targets"""
+        try:
+            self.send_command(mavutil.mavlink.MAV_CMD_DO_CHANGE_SPEED, [1, speed, -1])
+        except CommandRejected as e:
+            print(f"Warning: Could not set speed {speed}m/s: {e}")
+
+    def return_to_launch(self):
+        """Switch the vehicle to RTL"""
+        print("Changing mode to RTL (Return To Launch).")
+        self.report_event('phase', phase='Returning to launch', mode='RTL')
+        try:
+            self.set_mode('RTL')
+        except CommandRejected as e:
+            print(f"Error setting RTL mode: {e}")
+
+    def wait_for(self, condition, timeout):
+        """Poll a condition on the cached state until it holds or timeout"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if condition():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def hold_position(self, seconds):
+        """Wait at the current waypoint unless the mission stops"""
+        wait_end = time.time() + seconds
+        while self.mission_active() and time.time() < wait_end:
+            time.sleep(min(1, max(0, wait_end - time.time())))
+
+    def execute_mission(self, latitude, longitude, altitude, wait_time=None):
+        """Fly one mission: GUIDED, arm, takeoff, goto, wait, RTL"""
+        if wait_time is None:
+            wait_time = WAIT_TIME_AT_TARGET
+        print(f"Mission target: {latitude}, {longitude} at {altitude}m altitude")
+        return self.execute_waypoint_mission(
+            Mission.single_target(latitude, longitude, altitude, wait_time))
+
+    def execute_waypoint_mission(self, mission):
+        """Fly a waypoint mission: GUIDED, arm, takeoff, every leg, RTL"""
+        self.cancel_requested = False
+        waypoints = mission.waypoints
+        if len(waypoints) > 1:
+            print(f"Mission: {len(waypoints)} waypoints, {mission.total_distance:.0f}m route")
+
+        try:
+            print("Setting mode to GUIDED.")
+            if not self.set_mode('GUIDED'):
+                raise CommandRejected("Vehicle did not switch to GUIDED")
+            self.report_event('phase', phase='Guided', mode='GUIDED')
+
+            print("Arming motors")
+            if not self.arm():
+                raise CommandRejected("Vehicle did not report armed")
+            self.report_event('phase', phase='Armed', armed=True)
+
+            takeoff_altitude = waypoints[0].alt
+            print(f"Taking off to {takeoff_altitude}m")
+            self.report_event('phase', phase='Taking off')
+            self.takeoff(takeoff_altitude)
+            while self.mission_active():
+                current_alt = self.publisher.get('altitude', 0)
+                print(f"Altitude: {current_alt:.1f}m")
+                self.report_event('altitude', altitude=current_alt)
+                if current_alt >= takeoff_altitude * 0.95:
+                    break
+                time.sleep(1)
+
+            progress = MissionProgress(mission)
+            if self.mission_active():
+                self.report_event('phase', phase='Flying to target')
+
+            for index, waypoint in enumerate(waypoints):
+                if not self.mission_active():
+                    break
+                last = index == len(waypoints) - 1
+                print(f"Going to waypoint {index + 1}/{len(waypoints)}: "
+                      f"{waypoint.lat}, {waypoint.lon} at {waypoint.alt}m")
+                if waypoint.speed:
+                    self.set_speed(waypoint.speed)
+                self.goto(waypoint.lat, waypoint.lon, waypoint.alt)
+
+                arrived = False
+                while self.mission_active():
+                    position = self.latest('GLOBAL_POSITION_INT')
+                    if position and position.lat:
+                        arrived = progress.update(position.lat / 1e7, position.lon / 1e7,
+                                                  self.publisher.get('groundspeed', 0))
+                        state = progress.state()
+                        print(f"Distance to target: {progress.distance_to_waypoint:.1f} meters "
+                              f"(ETA {state['eta_waypoint']:.0f}s)")
+                        self.report_event('distance', distance=state['distance_to_waypoint'], **state)
+                    if arrived:
+                        break
+                    time.sleep(1)
+
+                if not arrived:
+                    break
+                if last:
+                    print("Reached target location!")
+                    self.report_event('phase', phase='At target location')
+                else:
+                    print(f"Reached waypoint {index + 1}")
+                    self.report_event('waypoint_reached', waypoint=index)
+                if waypoint.hold_time:
+                    print(f"Waiting for {waypoint.hold_time:g} seconds at the waypoint...")
+                    self.hold_position(waypoint.hold_time)
+                progress.advance()
+
+            if self.is_running:
+                self.return_to_launch()
+
+            if self.cancel_requested:
+                print("Mission cancelled - returning to launch")
+                self.report_event('phase', phase='Mission cancelled')
+                return False
+
+            print("Mission completed successfully!")
+            self.report_event('phase', phase='Mission completed')
+            return True
+
+        except CommandRejected as e:
+            print(f"Mission error: {e}")
+            raise
+
+    def prepare(self):
+        """Connect to the vehicle and start the receive and telemetry threads"""
+        if not self.setup_udp_connection():
+            print("Warning: Could not setup UDP connection for telemetry")
+
+        if not self.connect_to_vehicle():
+            print("Error: Could not connect to vehicle")
+            return False
+
+        for target in (self.receive_thread, self.telemetry_thread):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+        return True
+
+    def telemetry_thread(self):
+        """Background thread sending telemetry at the telemetry rate and on changes"""
+        self.publisher.run()
+
+    def run_mission(self, mission=None):
+        """Main mission execution function"""
+        try:
+            if not self.prepare():
+                return False
+            if mission:
+                return self.execute_waypoint_mission(mission)
+            return self.execute_mission(LATITUDE, LONGITUDE, ALTITUDE)
+        except KeyboardInterrupt:
+            print("Mission interrupted by user")
+            return False
+        except Exception as e:
+            print(f"Mission failed: {e}")
+            return False
+        finally:
+            self.cleanup()
+
+    def cleanup(self):
+        """Clean up resources"""
+        self.is_running = False
+        self.publisher.stop()
+
+        if self.master:
+            try:
+                print("Closing vehicle connection...")
+                self.master.close()
+            except Exception as e:
+                print(f"Error closing vehicle: {e}")
+
+        if self.udp_socket:
+            try:
+                print("Closing UDP socket...")
+                self.udp_socket.close()
+            except Exception as e:
+                print(f"Error closing UDP socket: {e}")
+
+        print("Cleanup completed")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='PyMAVLink mission controller')
+    parser.add_argument('--connection', action='append',
+                        help='Connection string (repeatable, tried in order)')
+    parser.add_argument('--telemetry-rate', type=float, default=TELEMETRY_RATE,
+                        help='Periodic telemetry rate in Hz')
+    parser.add_argument('--mission', default=None,
+                        help='Waypoint mission JSON file (e.g. from survey_planner.py)')
+    parser.add_argument('--fence', default=None, help='Geofence JSON file')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help='Write stack samples, allocations and timings to DIR on exit '
+                             '(default: $DRONE_PROFILE, off if unset)')
+    args = parser.parse_args()
+    mission = Mission.from_json(args.mission) if args.mission else None
+    geofence = Geofence.from_json(args.fence) if args.fence else None
+
+    print("=== PyMAVLink Mission Controller ===")
+    print(f"Target coordinates: {LATITUDE}, {LONGITUDE}")
+    print(f"Target altitude: {ALTITUDE}m")
+    print("====================================")
+
+    controller = MAVLinkController(args.connection, telemetry_rate=args.telemetry_rate,
+                                   geofence=geofence)
+
+    profiler = start_profiler('mavlink_backend', args.profile)
+    if profiler:
+        # telemetry_thread runs for the whole flight; time each send it makes
+        controller.publisher.send = profiler.time_function(
+            controller.publisher.send, 'MAVLinkController.telemetry_thread:send')
+
+    event_stream = open_event_stream()
+    if event_stream:
+        controller.event_callback = event_stream.write_event
+
+    try:
+        success = controller.run_mission(mission)
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\nMission interrupted by user")
+        controller.cleanup()
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+MAVLink Frame Encoding
+Batch encoder (and a small decoder) for the handful of MAVLink 2
+messages the ground station uses. Payloads are NumPy structured arrays in
+wire order, so a whole batch of frames (one per vehicle) is packed and
+checksummed with array operations instead of one pymavlink object per
+message.
+"""
+
+import numpy as np
+
+MAVLINK2_MAGIC = 0xFD
+MAVLINK2_HEADER_LEN = 10
+MAVLINK1_HEADER_LEN = 6
+CHECKSUM_LEN = 2
+
+class MessageSpec:
+    def __init__(self, name, msgid, crc_extra, fields):
+        self.name = name
+        self.msgid = msgid
+        self.crc_extra = crc_extra
+        # Fields are listed in MAVLink wire order (sorted by type size)
+        self.dtype = np.dtype([(field, '<' + kind) for field, kind in fields])
+        self.length = self.dtype.itemsize
+        self.frame_length = MAVLINK2_HEADER_LEN + self.length + CHECKSUM_LEN
+
+    def empty(self, count):
+        """Zeroed payload array for count messages"""
+        return np.zeros(count, dtype=self.dtype)
+
+HEARTBEAT = MessageSpec('HEARTBEAT', 0, 50, [
+    ('custom_mode', 'u4'),
+    ('type', 'u1'),
+    ('autopilot', 'u1'),
+    ('base_mode', 'u1'),
+    ('system_status', 'u1'),
+    ('mavlink_version', 'u1'),
+])
+
+SYS_STATUS = MessageSpec('SYS_STATUS', 1, 124, [
+    ('onboard_control_sensors_present', 'u4'),
+    ('onboard_control_sensors_enabled', 'u4'),
+    ('onboard_control_sensors_health', 'u4'),
+    ('load', 'u2'),
+    ('voltage_battery', 'u2'),
+    ('current_battery', 'i2'),
+    ('drop_rate_comm', 'u2'),
+    ('errors_comm', 'u2'),
+    ('errors_count1', 'u2'),
+    ('errors_count2', 'u2'),
+    ('errors_count3', 'u2'),
+    ('errors_count4', 'u2'),
+    ('battery_remaining', 'i1'),
+])
+
+GLOBAL_POSITION_INT = MessageSpec('GLOBAL_POSITION_INT', 33, 104, [
+    ('time_boot_ms', 'u4'),
+    ('lat', 'i4'),
+    ('lon', 'i4'),
+    ('alt', 'i4'),
+    ('relative_alt', 'i4'),
+    ('vx', 'i2'),
+    ('vy', 'i2'),
+    ('vz', 'i2'),
+    ('hdg', 'u2'),
+])
+
+VFR_HUD = MessageSpec('VFR_HUD', 74, 20, [
+    ('airspeed', 'f4'),
+    ('groundspeed', 'f4'),
+    ('alt', 'f4'),
+    ('climb', 'f4'),
+    ('heading', 'i2'),
+    ('throttle', 'u2'),
+])
+
+TIMESYNC = MessageSpec('TIMESYNC', 111, 34, [
+    ('tc1', 'i8'),
+    ('ts1', 'i8'),
+    ('target_system', 'u1'),
+    ('target_component', 'u1'),
+])
+
+MESSAGES = {spec.name: spec for spec in (HEARTBEAT, SYS_STATUS, GLOBAL_POSITION_INT, VFR_HUD,
+                                         TIMESYNC)}
+MESSAGES_BY_ID = {spec.msgid: spec for spec in MESSAGES.values()}
+
+def x25_crc(rows, crc_extra):
+    """CRC-16/MCRF4XX of every row of a (N, L) uint8 array, plus crc_extra"""
+    crc = np.full(rows.shape[0], 0xFFFF, dtype=np.uint32)
+    columns = [rows[:, i].astype(np.uint32) for i in range(rows.shape[1])]
+    columns.append(np.full(rows.shape[0], crc_extra, dtype=np.uint32))
+    for byte in columns:
+        tmp = (byte ^ crc) & 0xFF
+        tmp = (tmp ^ (tmp << 4)) & 0xFF
+        crc = ((crc >> 8) ^ (tmp << 8) ^ (tmp << 3) ^ (tmp >> 4)) & 0xFFFF
+    return crc.astype(np.uint16)
+
+def frame_crc_ok(data, start, crc_extra):
+    """True if the MAVLink 1 or 2 frame starting at data[start] has a valid checksum"""
+    header = MAVLINK2_HEADER_LEN if data[start] == MAVLINK2_MAGIC else MAVLINK1_HEADER_LEN
+    crc_at = start + header + data[start + 1]
+    crc = 0xFFFF
+    for byte in bytes(data[start + 1:crc_at]) + bytes((crc_extra,)):
+        tmp = (byte ^ crc) & 0xFF
+        tmp = (tmp ^ (tmp << 4)) & 0xFF
+        crc = ((crc >> 8) ^ (tmp << 8) ^ (tmp << 3) ^ (tmp >> 4)) & 0xFFFF
+    return crc == data[crc_at] | (data[crc_at + 1] << 8)
+
+def decode_payload(spec, data, start):
+    """Decode the payload of the MAVLink 1 or 2 frame starting at data[start]
+
+    MAVLink 2 senders drop trailing zero bytes, so short payloads are padded.
+    """
+    header = MAVLINK2_HEADER_LEN if data[start] == MAVLINK2_MAGIC else MAVLINK1_HEADER_LEN
+    payload = bytes(data[start + header:start + header + data[start + 1]])
+    return np.frombuffer(payload[:spec.length].ljust(spec.length, b'\0'), dtype=spec.dtype)[0]
+
+def encode_frames(spec, payloads, seq, sysid, compid=1):
+    """Encode MAVLink 2 frames, one row of the returned (N, L) uint8 array each"""
+    count = len(payloads)
+    frames = np.empty((count, spec.frame_length), dtype=np.uint8)
+    frames[:, 0] = MAVLINK2_MAGIC
+    frames[:, 1] = spec.length
+    frames[:, 2] = 0  # incompat_flags
+    frames[:, 3] = 0  # compat_flags
+    frames[:, 4] = seq
+    frames[:, 5] = sysid
+    frames[:, 6] = compid
+    frames[:, 7] = spec.msgid & 0xFF
+    frames[:, 8] = (spec.msgid >> 8) & 0xFF
+    frames[:, 9] = (spec.msgid >> 16) & 0xFF
+
+    payload_end = MAVLINK2_HEADER_LEN + spec.length
+    frames[:, MAVLINK2_HEADER_LEN:payload_end] = payloads.view(np.uint8).reshape(count, spec.length)
+
+    crc = x25_crc(frames[:, 1:payload_end], spec.crc_extra)
+    frames[:, payload_end] = crc & 0xFF
+    frames[:, payload_end + 1] = crc >> 8
+    return frames
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Redundant MAVLink Links
+Ingest the same vehicle over several links at once (e.g. Herelink and a
+backup telemetry radio bridged to UDP). Every frame is identified by
+(sysid, compid, seq, msgid); the first copy to arrive on any link is
+forwarded and later copies from the other links are dropped, so losing a
+link leaves no gap as long as another one still delivers.
+
+Per link we track how many frames it delivered first, its average delay
+behind the fastest link (lag) and sequence gaps (loss).
+"""
+
+import socket
+import time
+from collections import OrderedDict
+
+from mavlink_router import scan_frames
+
+DEDUP_WINDOW = 128    # Recent frames remembered per component (half the seq space)
+LINK_TIMEOUT = 3.0    # Seconds without data before a link counts as down
+LAG_SMOOTHING = 0.05  # Weight of a new sample in the lag average
+
+class Link:
+    def __init__(self, name, port, host='0.0.0.0'):
+        self.name = name
+        self.port = port
+        self.host = host
+        self.socket = None
+        self.datagrams = 0
+        self.frames = 0
+        self.first = 0
+        self.duplicates = 0
+        self.lost = 0
+        self.lag = None
+        self.last_receive = 0.0
+        self.last_seq = {}
+
+    def open(self, buffer_size=None):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if buffer_size:
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buffer_size)
+        self.socket.bind((self.host, self.port))
+        return self.socket
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def count_sequence(self, sysid, compid, seq):
+        """Count frames a component sent that never reached this link"""
+        key = (sysid, compid)
+        last = self.last_seq.get(key)
+        if last is not None:
+            gap = (seq - last - 1) & 0xFF
+            # A large jump backwards is a reordered or repeated frame, not loss
+            if gap < 128:
+                self.lost += gap
+        self.last_seq[key] = seq
+
+    def add_lag(self, lag):
+        self.lag = lag if self.lag is None else self.lag + LAG_SMOOTHING * (lag - self.lag)
+
+    def is_up(self, now=None):
+        return (now or time.time()) - self.last_receive < LINK_TIMEOUT
+
+    def stats(self, now=None):
+        received = self.frames
+        return {
+            'link': self.name,
+            'port': self.port,
+            'up': self.is_up(now),
+            'frames': received,
+            'first': self.first,
+            'duplicates': self.duplicates,
+            'loss': round(self.lost / (self.lost + received), 4) if self.lost + received else 0.0,
+            'lag_ms': round(self.lag * 1000, 1) if self.lag is not None else None,
+        }
+
+class FrameDeduplicator:
+    """Remembers the most recent frames of each component and when they first arrived
+
+    The window is kept per (sysid, compid) and below 256 frames, so a
+    sequence number that has wrapped around is never mistaken for a copy.
+    """
+
+    def __init__(self, links, window=DEDUP_WINDOW):
+        self.links = list(links)
+        self.window = window
+        self.seen = {}
+        self.last_first_link = None
+
+    def filter(self, link, data, now):
+        """Frames of a datagram not yet seen on any link
+
+        Returns (frames, all_new) where frames is the list of new
+        (start, end, sysid, compid, seq, msgid) tuples.
+        """
+        frames = scan_frames(data)
+        link.datagrams += 1
+        link.last_receive = now
+        new = []
+        for frame in frames:
+            _, _, sysid, compid, seq, msgid = frame
+            link.frames += 1
+            link.count_sequence(sysid, compid, seq)
+            seen = self.seen.get((sysid, compid))
+            if seen is None:
+                seen = self.seen[(sysid, compid)] = OrderedDict()
+            key = (seq, msgid)
+            first_seen = seen.get(key)
+            if first_seen is None:
+                seen[key] = now
+                if len(seen) > self.window:
+                    seen.popitem(last=False)
+                link.first += 1
+                link.add_lag(0.0)
+                new.append(frame)
+            else:
+                link.duplicates += 1
+                link.add_lag(now - first_seen)
+        if new:
+            self.last_first_link = link
+        return new, len(new) == len(frames)
+
+    def stats(self):
+        now = time.time()
+        return [link.stats(now) for link in self.links]
@@ -1,14 +1,28 @@
 #!/usr/bin/env python3
 """
 MAVLink Parser for Herelink UDP Data
-This script properly parses MAVLink messages from Herelink and converts them to readable format
+This script properly parses MAVLink messages from Herelink and converts them to readable format.
+With --route it also acts as a MAVLink router (see mavlink_router.py), so
+QGroundControl and mission scripts can share the vehicle link with the app.
+With --ws-port it also serves the telemetry to other viewers over WebSocket
+(see telemetry_gateway.py).
+
+Forwarded telemetry carries a latency trace: an id and the times the
+datagram was received, decoded and forwarded. The Electron app adds its own
+stages up to the rendered frame (see src/latency-trace.js). Times are
+milliseconds on a monotonic clock anchored to the wall clock once at start,
+the same scheme as performance.timeOrigin + performance.now() in Node and
+the renderer, so stamps from the different processes on one host compare.
 """
 
 import socket
+import select
 import json
 import time
 import threading
 import sys
+import math
+import argparse
 from datetime import datetime
 
 try:
@@ -18,8 +32,30 @@ except ImportError:
     print("PyMAVLink not available. Install with: pip install pymavlink")
     MAVLINK_AVAILABLE = False
 
+from geofence import Geofence, GeofenceMonitor
+from mavlink_router import MAVLinkRouter, Endpoint, RECEIVE_BUFFER, scan_frames
+from mavlink_links import Link, FrameDeduplicator
+from mavlink_frames import TIMESYNC, decode_payload
+from timesync import TimeSync
+from geo_utils import METERS_PER_DEG_LAT
+from profiler import start_profiler
+from flight_log import TlogWriter
+from flight_metrics import FlightMetrics, BATTERY_RESERVE
+from telemetry_gateway import TelemetryGateway
+
+SOCKET_BUFFER = 1 << 20  # Kernel receive buffer when routing
+POSITION_TARGET_IGNORE_POSITION = 0x7  # type_mask bits that mark the position as unused
+TRACE_EPOCH_NS = time.time_ns() - time.monotonic_ns()
+FORWARD_STAMP = '@forward'  # Placeholder for the forward stamp, replaced once the message is encoded
+FORWARD_PLACEHOLDER = json.dumps(FORWARD_STAMP).encode('utf-8')
+
+def trace_clock_ms():
+    """Monotonic time in ms, anchored to the wall clock at start"""
+    return (time.monotonic_ns() + TRACE_EPOCH_NS) / 1e6
+
 class MAVLinkParser:
-    def __init__(self, listen_port=14550, forward_port=14551):
+    def __init__(self, listen_port=14550, forward_port=14551, geofence=None, endpoints=None,
+                 backup_ports=None, timesync=True, trace=True, tlog=None, metrics=None, gateway=None):
         self.listen_port = listen_port
         self.forward_port = forward_port
         self.listen_socket = None
@@ -27,6 +63,27 @@ class MAVLinkParser:
         self.is_running = False
         self.message_count = 0
         self.mav_connection = None
+        self.fence_monitor = GeofenceMonitor(geofence, self.on_fence_event) if geofence else None
+        self.fence_events = []
+        self.router = MAVLinkRouter(endpoints) if endpoints else None
+        self.receive_buffer = bytearray(RECEIVE_BUFFER)
+        # Redundant links to the same vehicle; the first copy of each frame wins
+        self.links = [Link('primary', listen_port)]
+        self.links += [Link(f'backup{i + 1}', port) for i, port in enumerate(backup_ports or [])]
+        self.dedup = FrameDeduplicator(self.links) if len(self.links) > 1 else None
+        self.next_link_report = 0
+        # Vehicle clock offset from TIMESYNC, for the age of forwarded data
+        self.timesync = TimeSync() if timesync else None
+        self.vehicle_link = None
+        self.position_time_boot_ms = None
+        self.trace = trace
+        self.trace_id = 0
+        # Vehicle frames recorded for post-flight analysis (flight_analytics.py)
+        self.tlog = TlogWriter(tlog) if tlog else None
+        # Climb rate, home/target distance, ETA and battery estimates, forwarded as 'derived'
+        self.metrics = metrics or FlightMetrics()
+        # WebSocket viewers; publishing only hands over the latest telemetry
+        self.gateway = gateway
         
         # Drone status data
         self.drone_status = {
@@ -46,24 +103,38 @@ class MAVLinkParser:
     def setup_sockets(self):
         """Setup UDP sockets for listening and forwarding"""
         try:
-            # Setup listening socket
-            self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            self.listen_socket.bind(('0.0.0.0', self.listen_port))
-            self.listen_socket.settimeout(1.0)
+            # Setup listening sockets, one per link
+            buffer_size = SOCKET_BUFFER if self.router or self.dedup else None
+            for link in self.links:
+                link.open(buffer_size)
+            self.listen_socket = self.links[0].socket
             
             # Setup forwarding socket
             self.forward_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             
             print(f"MAVLink Parser setup complete:")
             print(f"  Listening on: 0.0.0.0:{self.listen_port}")
+            for link in self.links[1:]:
+                print(f"  Backup link {link.name} on: 0.0.0.0:{link.port}")
             print(f"  Forwarding to: localhost:{self.forward_port}")
             
+            if self.router:
+                self.router.open(self.listen_socket)
+                for endpoint in self.router.endpoints:
+                    print(f"  Routing raw frames to: {endpoint.host}:{endpoint.port}"
+                          f"{' (filtered)' if endpoint.filtered else ''}")
+            
             return True
             
         except Exception as e:
             print(f"Error setting up sockets: {e}")
             return False
     
+    def on_fence_event(self, event, data):
+        """Queue a geofence transition for the next forwarded telemetry"""
+        print(f"Geofence {data['status']}: {data['fence']} ({data['distance']}m)")
+        self.fence_events.append(dict(data, event=event))
+    
     def parse_mavlink_message(self, data, addr):
         """Parse MAVLink message and update drone status"""
         if not MAVLINK_AVAILABLE:
@@ -98,12 +169,23 @@ class MAVLinkParser:
             self.drone_status['mode'] = mavutil.mode_string_v10(msg)
             self.drone_status['system_status'] = mavutil.mavlink.enums['MAV_STATE'][msg.system_status].name
             self.drone_status['last_heartbeat'] = time.time()
+            self.metrics.update_armed(self.drone_status['armed'])
             
         elif msg.get_type() == 'GLOBAL_POSITION_INT':
             self.drone_status['latitude'] = msg.lat / 1e7
             self.drone_status['longitude'] = msg.lon / 1e7
             self.drone_status['altitude'] = msg.alt / 1000.0  # Convert mm to m
             self.drone_status['heading'] = msg.hdg / 100.0
+            self.drone_status['velocity_north'] = msg.vx / 100.0  # cm/s to m/s
+            self.drone_status['velocity_east'] = msg.vy / 100.0
+            self.position_time_boot_ms = msg.time_boot_ms
+            self.metrics.update_position(msg.time_boot_ms / 1000.0, msg.lat / 1e7, msg.lon / 1e7,
+                                         msg.relative_alt / 1000.0, msg.vx / 100.0, msg.vy / 100.0)
+            if self.fence_monitor and msg.lat:
+                fence = self.fence_monitor.update(msg.lat / 1e7, msg.lon / 1e7, msg.relative_alt / 1000.0)
+                self.drone_status['geofence'] = fence['status']
+                self.drone_status['fence_name'] = fence['fence']
+                self.drone_status['fence_distance'] = fence['distance']
             
         elif msg.get_type() == 'VFR_HUD':
             self.drone_status['groundspeed'] = msg.groundspeed
@@ -111,6 +193,15 @@ class MAVLinkParser:
             
         elif msg.get_type() == 'SYS_STATUS':
             self.drone_status['battery'] = msg.battery_remaining
+            self.metrics.update_battery(time.monotonic(), msg.battery_remaining)
+            
+        elif msg.get_type() == 'HOME_POSITION':
+            self.metrics.set_home(msg.latitude / 1e7, msg.longitude / 1e7)
+            
+        elif msg.get_type() == 'POSITION_TARGET_GLOBAL_INT':
+            # Guided-mode setpoint the vehicle is flying to
+            if not msg.type_mask & POSITION_TARGET_IGNORE_POSITION and msg.lat_int:
+                self.metrics.set_target(msg.lat_int / 1e7, msg.lon_int / 1e7)
             
         # Create telemetry object
         telemetry = {
@@ -120,11 +211,59 @@ class MAVLinkParser:
             'source_ip': addr[0],
             'source_port': addr[1],
             'message_id': self.message_count,
-            'drone_status': self.drone_status.copy()
+            'drone_status': self.drone_status.copy(),
+            'derived': self.metrics.snapshot()
         }
+        if self.fence_events:
+            telemetry['geofence_events'] = self.fence_events
+            self.fence_events = []
+        if self.timesync:
+            self.stamp_data_age(telemetry)
         
         return telemetry
     
+    def stamp_data_age(self, telemetry):
+        """Add the vehicle-time age of the position and a latency-corrected position"""
+        telemetry['timesync'] = self.timesync.stats()
+        if self.position_time_boot_ms is None:
+            return
+        age = self.timesync.age_ms(self.position_time_boot_ms)
+        if age is None:
+            return
+        status = self.drone_status
+        telemetry['position_age_ms'] = round(age, 1)
+        # Dead-reckon the position forward by its age
+        seconds = max(age, 0.0) / 1000.0
+        north = status.get('velocity_north', 0.0) * seconds
+        east = status.get('velocity_east', 0.0) * seconds
+        telemetry['latency_corrected'] = {
+            'latitude': status['latitude'] + north / METERS_PER_DEG_LAT,
+            'longitude': status['longitude'] + east / (
+                METERS_PER_DEG_LAT * max(math.cos(math.radians(status['latitude'])), 1e-6)),
+        }
+    
+    def handle_timesync(self, data, sock, addr):
+        """Feed TIMESYNC frames to the estimator and answer the vehicle's own requests"""
+        for start, _, _, _, _, msgid in scan_frames(data):
+            if msgid != TIMESYNC.msgid:
+                continue
+            message = decode_payload(TIMESYNC, data, start)
+            reply = self.timesync.handle(int(message['tc1']), int(message['ts1']))
+            if reply:
+                sock.sendto(reply, addr)
+    
+    def send_timesync(self):
+        """Send a TIMESYNC request to the vehicle when one is due"""
+        if not self.vehicle_link:
+            return
+        frame = self.timesync.request()
+        if frame:
+            sock, addr = self.vehicle_link
+            try:
+                sock.sendto(frame, addr)
+            except OSError as e:
+                print(f"Error sending TIMESYNC: {e}")
+    
     def create_basic_telemetry(self, data, addr):
         """Create basic telemetry when MAVLink parsing is not available"""
         timestamp = datetime.now().isoformat()
@@ -159,11 +298,18 @@ class MAVLinkParser:
         """Forward processed telemetry to Electron app"""
         if self.forward_socket:
             try:
-                json_message = json.dumps(telemetry_data, indent=2)
-                self.forward_socket.sendto(
-                    json_message.encode('utf-8'), 
-                    ('localhost', self.forward_port)
-                )
+                trace = telemetry_data.pop('trace', None)
+                if trace is not None:
+                    # Encoded last, so the placeholder is the last string in the message
+                    trace['forward'] = FORWARD_STAMP
+                    telemetry_data['trace'] = trace
+                message = json.dumps(telemetry_data, indent=2).encode('utf-8')
+                if trace is not None:
+                    # Stamped after encoding, so only the send falls after it
+                    at = message.rindex(FORWARD_PLACEHOLDER)
+                    message = (message[:at] + repr(trace_clock_ms()).encode() +
+                               message[at + len(FORWARD_PLACEHOLDER):])
+                self.forward_socket.sendto(message, ('localhost', self.forward_port))
                 
             except Exception as e:
                 print(f"Error forwarding message: {e}")
@@ -175,26 +321,92 @@ class MAVLinkParser:
         
         last_status_print = 0
         
+        view = memoryview(self.receive_buffer)
+        
+        link_sockets = {link.socket: link for link in self.links}
+        
         while self.is_running:
             try:
-                # Receive data
-                data, addr = self.listen_socket.recvfrom(1024)
-                self.message_count += 1
+                if self.timesync:
+                    self.send_timesync()
                 
-                # Parse the MAVLink message
-                telemetry = self.parse_mavlink_message(data, addr)
+                # Wait for the vehicle links and for uplink traffic from routed endpoints
+                sockets = list(link_sockets) + (self.router.sockets if self.router else [])
+                readable, _, _ = select.select(sockets, [], [], 1.0)
+                if not readable:
+                    raise socket.timeout()
                 
-                if telemetry:
-                    # Forward to Electron app
-                    self.forward_message(telemetry)
+                for sock in readable:
+                    link = link_sockets.get(sock)
+                    if link is None:
+                        self.router.route_from_endpoint(sock)
+                        continue
+                    
+                    # Receive data
+                    size, addr = sock.recvfrom_into(self.receive_buffer)
+                    received = trace_clock_ms() if self.trace else None
+                    data = view[:size]
                     
-                    # Print status occasionally
-                    current_time = time.time()
-                    if current_time - last_status_print > 5:  # Every 5 seconds
-                        print(f"Messages received: {self.message_count} | "
-                              f"Status: {telemetry['drone_status']['system_status']} | "
-                              f"Mode: {telemetry['drone_status']['mode']}")
-                        last_status_print = current_time
+                    if self.dedup:
+                        # Copies of frames already received on another link are dropped
+                        frames, all_new = self.dedup.filter(link, data, time.time())
+                        if not frames:
+                            continue
+                        # Frame offsets point into the received datagram, so record first
+                        if self.tlog:
+                            self.tlog.write(data, frames)
+                        if not all_new:
+                            data = memoryview(b''.join(data[start:end] for start, end, *_ in frames))
+                    elif self.tlog:
+                        self.tlog.write(data, scan_frames(data))
+                    self.message_count += 1
+                    self.vehicle_link = (sock, addr)
+                    
+                    if self.timesync:
+                        self.handle_timesync(data, sock, addr)
+                    
+                    # Raw frames go out to the routed endpoints before any parsing
+                    if self.router:
+                        self.router.route_from_vehicle(data, addr, sock)
+                    
+                    # Parse the MAVLink message
+                    telemetry = self.parse_mavlink_message(bytes(data), addr)
+                    
+                    if telemetry:
+                        if self.trace:
+                            self.trace_id += 1
+                            telemetry['trace'] = {'id': self.trace_id, 'receive': received,
+                                                  'decode': trace_clock_ms()}
+                        current_time = time.time()
+                        if self.dedup and current_time >= self.next_link_report:
+                            telemetry['links'] = self.dedup.stats()
+                            self.next_link_report = current_time + 1.0
+                        
+                        # Forward to Electron app
+                        self.forward_message(telemetry)
+                        if self.gateway:
+                            self.gateway.publish(telemetry)
+                        
+                        # Print status occasionally
+                        if current_time - last_status_print > 5:  # Every 5 seconds
+                            print(f"Messages received: {self.message_count} | "
+                                  f"Status: {telemetry['drone_status']['system_status']} | "
+                                  f"Mode: {telemetry['drone_status']['mode']}")
+                            if self.router:
+                                stats = self.router.stats()
+                                print(f"Routed frames: {stats['frames_routed']} | "
+                                      f"Uplink datagrams: {stats['uplink_datagrams']}")
+                            if self.timesync and self.timesync.synced:
+                                stats = self.timesync.stats()
+                                print(f"Vehicle clock offset: {stats['offset_ms']:.1f}ms | "
+                                      f"RTT: {stats['rtt_ms']:.1f}ms")
+                            if self.dedup:
+                                for stats in self.dedup.stats():
+                                    lag = f"{stats['lag_ms']}ms" if stats['lag_ms'] is not None else '-'
+                                    print(f"Link {stats['link']}: {'up' if stats['up'] else 'DOWN'} | "
+                                          f"first {stats['first']}/{stats['frames']} | "
+                                          f"loss {stats['loss'] * 100:.1f}% | lag {lag}")
+                            last_status_print = current_time
                     
             except socket.timeout:
                 # Check for connection timeout
@@ -211,6 +423,13 @@ class MAVLinkParser:
         if not self.setup_sockets():
             return False
         
+        if self.gateway:
+            try:
+                self.gateway.start()
+            except OSError as e:
+                print(f"Error starting telemetry gateway: {e}")
+                self.gateway = None
+        
         self.is_running = True
         
         try:
@@ -227,43 +446,105 @@ class MAVLinkParser:
         self.is_running = False
         
         if self.listen_socket:
-            self.listen_socket.close()
+            for link in self.links:
+                link.close()
+            self.listen_socket = None
             print("Listen socket closed")
         
         if self.forward_socket:
             self.forward_socket.close()
             print("Forward socket closed")
         
+        if self.gateway:
+            self.gateway.stop()
+            stats = self.gateway.stats()
+            print(f"Telemetry gateway: {stats['frames_encoded']} frames encoded, "
+                  f"{stats['frames_dropped']} dropped for slow clients")
+        
+        if self.tlog:
+            self.tlog.close()
+            print(f"Recorded {self.tlog.frames} frames to {self.tlog.path}")
+            if self.tlog.bad_crc:
+                print(f"Dropped {self.tlog.bad_crc} frames with bad checksums from the tlog")
+        
+        if self.router:
+            self.router.close()
+            for stats in self.router.stats()['endpoints']:
+                print(f"Endpoint {stats['endpoint']}: {stats['frames_sent']} frames sent, "
+                      f"{stats['frames_filtered']} filtered, {stats['datagrams_received']} uplink")
+        
         print(f"Total messages processed: {self.message_count}")
 
 def main():
     """Main function"""
     print("=== MAVLink Parser for Herelink ===")
     
-    # Default ports
-    listen_port = 14550  # Listen for Herelink data
-    forward_port = 14551  # Forward to Electron app
+    parser = argparse.ArgumentParser(description='MAVLink parser for Herelink UDP data')
+    parser.add_argument('listen_port', type=int, nargs='?', default=14550,
+                        help='Port to listen for Herelink data (default: 14550)')
+    parser.add_argument('forward_port', type=int, nargs='?', default=14551,
+                        help='Port to forward telemetry to the Electron app (default: 14551)')
+    parser.add_argument('--fence', default=None,
+                        help='Geofence JSON file checked against every position update')
+    parser.add_argument('--route', action='append', default=[], metavar='HOST:PORT[:allow=..|:block=..]',
+                        help='Forward raw MAVLink frames to this endpoint and its commands to the vehicle '
+                             '(repeatable, e.g. 127.0.0.1:14552 for QGroundControl)')
+    parser.add_argument('--backup-port', type=int, action='append', default=[],
+                        help='Also listen for the same vehicle on this port, e.g. a backup radio '
+                             '(repeatable; duplicate frames are dropped)')
+    parser.add_argument('--no-timesync', action='store_true',
+                        help='Do not send TIMESYNC requests or stamp telemetry with the data age')
+    parser.add_argument('--no-trace', action='store_true',
+                        help='Do not stamp forwarded telemetry with latency trace times')
+    parser.add_argument('--home', type=float, nargs=2, default=None, metavar=('LAT', 'LON'),
+                        help='Home for distance/bearing (default: HOME_POSITION, else where the vehicle arms)')
+    parser.add_argument('--target', type=float, nargs=2, default=None, metavar=('LAT', 'LON'),
+                        help='Target for distance and ETA (updated from guided-mode setpoints)')
+    parser.add_argument('--reserve', type=float, default=BATTERY_RESERVE,
+                        help='Battery percent excluded from the estimated flight time left')
+    parser.add_argument('--tlog', default=None, metavar='PATH',
+                        help='Record vehicle frames to a .tlog for flight_analytics.py')
+    parser.add_argument('--ws-port', type=int, default=None,
+                        help='Serve telemetry to WebSocket viewers on this port, e.g. 8765 '
+                             '(ws://HOST:PORT/?topics=status,derived&rate=5)')
+    parser.add_argument('--ws-host', default='0.0.0.0',
+                        help='Address the WebSocket gateway listens on (default: all interfaces)')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help='Write stack samples, allocations and timings to DIR on exit '
+                             '(default: $DRONE_PROFILE, off if unset)')
+    args = parser.parse_args()
     
-    # Parse command line arguments
-    if len(sys.argv) > 1:
+    geofence = None
+    if args.fence:
         try:
-            listen_port = int(sys.argv[1])
-        except ValueError:
-            print(f"Invalid listen port: {sys.argv[1]}")
+            geofence = Geofence.from_json(args.fence)
+            print(f"Geofence: {len(geofence)} fences")
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Error loading geofence: {e}")
             sys.exit(1)
     
-    if len(sys.argv) > 2:
-        try:
-            forward_port = int(sys.argv[2])
-        except ValueError:
-            print(f"Invalid forward port: {sys.argv[2]}")
-            sys.exit(1)
+    try:
+        endpoints = [Endpoint.parse(spec) for spec in args.route]
+    except ValueError as e:
+        print(f"Error in --route: {e}")
+        sys.exit(1)
+    
+    metrics = FlightMetrics(tuple(args.home) if args.home else None,
+                            tuple(args.target) if args.target else None, args.reserve)
+    
+    gateway = TelemetryGateway(args.ws_host, args.ws_port) if args.ws_port else None
     
     # Create and start parser
-    parser = MAVLinkParser(listen_port, forward_port)
+    mavlink_parser = MAVLinkParser(args.listen_port, args.forward_port, geofence, endpoints,
+                                   args.backup_port, not args.no_timesync, not args.no_trace, args.tlog,
+                                   metrics, gateway)
+    
+    profiler = start_profiler('mavlink_parser', args.profile)
+    if profiler:
+        profiler.time_methods(mavlink_parser, 'parse_mavlink_message', 'forward_message')
     
     try:
-        parser.start()
+        mavlink_parser.start()
     except Exception as e:
         print(f"Error starting parser: {e}")
         sys.exit(1)
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+MAVLink Router
+Fans raw MAVLink frames received from the vehicle out to any number of UDP
+endpoints (QGroundControl, a mission script, the Electron app's parser) and
+sends whatever those endpoints transmit back to the vehicle.
+
+Nothing is decoded or re-encoded: each datagram is scanned for frame
+boundaries and header fields only (sysid, compid, seq, msgid), and frames
+are forwarded as slices of the receive buffer. An endpoint whose filter
+passes every frame of a datagram gets the datagram as one send; otherwise
+only its passing frames are gathered into one send (sendmsg where
+available).
+
+Each endpoint has its own socket, so replies from it arrive there and are
+routed to the vehicle's last known address.
+
+Endpoint spec: HOST:PORT[:allow=MSG,MSG|:block=MSG,MSG]
+  127.0.0.1:14552                         everything
+  127.0.0.1:14553:allow=HEARTBEAT,GLOBAL_POSITION_INT
+  127.0.0.1:14554:block=33,74             message names or numeric ids
+"""
+
+import socket
+
+try:
+    from pymavlink import mavutil
+except ImportError:
+    mavutil = None
+
+from mavlink_frames import MESSAGES, MESSAGES_BY_ID
+
+MAVLINK1_MAGIC = 0xFE
+MAVLINK2_MAGIC = 0xFD
+MAVLINK2_SIGNED = 0x01
+SIGNATURE_LEN = 13
+RECEIVE_BUFFER = 65535
+
+SENDMSG_AVAILABLE = hasattr(socket.socket, 'sendmsg')
+
+def scan_frames(data):
+    """Header fields of every complete frame in a datagram
+
+    Returns a list of (start, end, sysid, compid, seq, msgid). Bytes that do
+    not start a frame are skipped; a truncated last frame is dropped.
+    """
+    frames = []
+    size = len(data)
+    i = 0
+    while i < size:
+        magic = data[i]
+        if magic == MAVLINK2_MAGIC and i + 10 <= size:
+            end = i + 12 + data[i + 1]
+            if data[i + 2] & MAVLINK2_SIGNED:
+                end += SIGNATURE_LEN
+            if end > size:
+                break
+            msgid = data[i + 7] | (data[i + 8] << 8) | (data[i + 9] << 16)
+            frames.append((i, end, data[i + 5], data[i + 6], data[i + 4], msgid))
+            i = end
+        elif magic == MAVLINK1_MAGIC and i + 6 <= size:
+            end = i + 8 + data[i + 1]
+            if end > size:
+                break
+            frames.append((i, end, data[i + 3], data[i + 4], data[i + 2], data[i + 5]))
+            i = end
+        else:
+            i += 1
+    return frames
+
+def message_id(name):
+    """Numeric id of a MAVLink message given by name or number"""
+    name = name.strip()
+    if name.isdigit():
+        return int(name)
+    name = name.upper()
+    if mavutil:
+        msgid = getattr(mavutil.mavlink, 'MAVLINK_MSG_ID_' + name, None)
+        if msgid is not None:
+            return msgid
+    if name in MESSAGES:
+        return MESSAGES[name].msgid
+    raise ValueError(f"Unknown MAVLink message: {name}")
+
+def message_crc_extra(msgid):
+    """Checksum seed of a message type, or None if it is not known"""
+    spec = MESSAGES_BY_ID.get(msgid)
+    if spec is not None:
+        return spec.crc_extra
+    if mavutil:
+        message_class = mavutil.mavlink.mavlink_map.get(msgid)
+        if message_class is not None:
+            return message_class.crc_extra
+    return None
+
+class Endpoint:
+    def __init__(self, host, port, allow=None, block=None):
+        self.host = host
+        self.port = port
+        self.address = (host, port)
+        self.allow = frozenset(allow) if allow else None
+        self.block = frozenset(block) if block else frozenset()
+        self.socket = None
+        self.frames_sent = 0
+        self.frames_filtered = 0
+        self.bytes_sent = 0
+        self.datagrams_received = 0
+        self.send_errors = 0
+
+    @classmethod
+    def parse(cls, spec):
+        """Build an endpoint from HOST:PORT[:allow=...|:block=...]"""
+        parts = spec.split(':')
+        if len(parts) < 2:
+            raise ValueError(f"Endpoint must be HOST:PORT, got {spec}")
+        allow = block = None
+        for option in parts[2:]:
+            key, _, names = option.partition('=')
+            ids = [message_id(name) for name in names.split(',') if name.strip()]
+            if key == 'allow':
+                allow = ids
+            elif key == 'block':
+                block = ids
+            else:
+                raise ValueError(f"Unknown endpoint option: {key}")
+        return cls(parts[0] or '127.0.0.1', int(parts[1]), allow, block)
+
+    def passes(self, msgid):
+        """True if the filter lets this message through"""
+        if self.allow is not None and msgid not in self.allow:
+            return False
+        return msgid not in self.block
+
+    @property
+    def filtered(self):
+        return self.allow is not None or bool(self.block)
+
+    def open(self):
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(('0.0.0.0', 0))
+        self.socket.setblocking(False)
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+
+    def send(self, buffers, frame_count):
+        """Send one datagram made of one or more buffer slices"""
+        try:
+            if len(buffers) == 1:
+                sent = self.socket.sendto(buffers[0], self.address)
+            elif SENDMSG_AVAILABLE:
+                sent = self.socket.sendmsg(buffers, [], 0, self.address)
+            else:
+                sent = self.socket.sendto(b''.join(buffers), self.address)
+        except OSError:
+            # A GCS that is not running yet must not stall the others
+            self.send_errors += 1
+            return
+        self.frames_sent += frame_count
+        self.bytes_sent += sent
+
+    def stats(self):
+        return {
+            'endpoint': f"{self.host}:{self.port}",
+            'frames_sent': self.frames_sent,
+            'frames_filtered': self.frames_filtered,
+            'bytes_sent': self.bytes_sent,
+            'datagrams_received': self.datagrams_received,
+            'send_errors': self.send_errors,
+        }
+
+class MAVLinkRouter:
+    def __init__(self, endpoints):
+        self.endpoints = list(endpoints)
+        # Frame boundaries are only needed when some endpoint filters
+        self.needs_scan = any(endpoint.filtered for endpoint in self.endpoints)
+        self.vehicle_socket = None
+        self.vehicle_address = None
+        self.frames_routed = 0
+        self.uplink_datagrams = 0
+        self.receive_buffer = bytearray(RECEIVE_BUFFER)
+
+    def open(self, vehicle_socket):
+        """Open the endpoint sockets; uplink traffic leaves through vehicle_socket"""
+        self.vehicle_socket = vehicle_socket
+        for endpoint in self.endpoints:
+            endpoint.open()
+
+    def close(self):
+        for endpoint in self.endpoints:
+            endpoint.close()
+
+    @property
+    def sockets(self):
+        """Endpoint sockets to wait on for uplink traffic"""
+        return [endpoint.socket for endpoint in self.endpoints if endpoint.socket]
+
+    def route_from_vehicle(self, data, addr, sock=None, frames=None):
+        """Forward a vehicle datagram (bytes or memoryview) to every endpoint
+
+        Uplink traffic follows the link (sock, addr) the vehicle was last heard on.
+        """
+        self.vehicle_address = addr
+        if sock is not None:
+            self.vehicle_socket = sock
+        if frames is None and self.needs_scan:
+            frames = scan_frames(data)
+        frame_count = len(frames) if frames is not None else 1
+        self.frames_routed += frame_count
+
+        for endpoint in self.endpoints:
+            if not endpoint.filtered:
+                endpoint.send([data], frame_count)
+                continue
+            passing = [(start, end) for start, end, _, _, _, msgid in frames if endpoint.passes(msgid)]
+            endpoint.frames_filtered += len(frames) - len(passing)
+            if not passing:
+                continue
+            if len(passing) == len(frames):
+                endpoint.send([data], frame_count)
+            else:
+                endpoint.send([data[start:end] for start, end in passing], len(passing))
+
+    def route_from_endpoint(self, sock):
+        """Read everything queued on an endpoint socket and send it to the vehicle"""
+        endpoint = next(e for e in self.endpoints if e.socket is sock)
+        view = memoryview(self.receive_buffer)
+        while True:
+            try:
+                size, _ = sock.recvfrom_into(self.receive_buffer)
+            except BlockingIOError:
+                return
+            except OSError:
+                # ICMP port unreachable from an earlier send shows up here on some platforms
+                endpoint.send_errors += 1
+                return
+            if not self.vehicle_address:
+                continue
+            endpoint.datagrams_received += 1
+            self.uplink_datagrams += 1
+            try:
+                self.vehicle_socket.sendto(view[:size], self.vehicle_address)
+            except OSError as e:
+                print(f"Error sending to vehicle: {e}")
+
+    def stats(self):
+        return {
+            'frames_routed': self.frames_routed,
+            'uplink_datagrams': self.uplink_datagrams,
+            'endpoints': [endpoint.stats() for endpoint in self.endpoints],
+        }
@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+"""
+Mission Daemon
+Keeps one mission controller (and its vehicle connection) alive and accepts
+mission jobs over a local TCP socket, so a new mission does not have to pay
+for Python startup, imports and reconnecting to the vehicle.
+
+Protocol: newline-delimited JSON in both directions.
+  -> {"command": "start_mission", "request_id": 1, "job_id": "m1",
+      "latitude": 34.0173, "longitude": 74.7179, "altitude": 30, "wait_time": 30}
+  -> {"command": "start_mission", "request_id": 1, "job_id": "m2",
+      "waypoints": [{"latitude": 34.01, "longitude": 74.71, "altitude": 30,
+                     "speed": 8, "hold_time": 5}, ...]}
+  -> {"command": "cancel", "request_id": 2}
+  -> {"command": "status", "request_id": 3}
+  -> {"command": "shutdown", "request_id": 4}
+  <- {"type": "response", "request_id": 1, "ok": true, "message": "..."}
+  <- {"type": "event", "event": "job_started", "job_id": "m1", ...}
+"""
+
+import socket
+import json
+import time
+import threading
+import sys
+from collections import deque
+import argparse
+from mission_events import open_event_stream
+from profiler import start_profiler
+from sim_clock import create_clock
+from waypoint_mission import Mission
+from geofence import Geofence
+from terrain import TerrainService, MIN_CLEARANCE
+from path_planner import PathPlanner
+
+DAEMON_HOST = '127.0.0.1'
+DAEMON_PORT = 14560
+
+def create_controller(backend, clock=None, seed=None, telemetry_rate=1.0, geofence=None,
+                      terrain=None):
+    """Create the mission controller for the requested backend"""
+    if backend == 'dronekit':
+        from drone_mission import DroneController
+        return DroneController(telemetry_rate=telemetry_rate, geofence=geofence)
+    if backend == 'mavlink':
+        from mavlink_backend import MAVLinkController
+        return MAVLinkController(telemetry_rate=telemetry_rate, geofence=geofence)
+    from udp_listener import SimpleUDPController
+    return SimpleUDPController(clock=clock, seed=seed, telemetry_rate=telemetry_rate,
+                               geofence=geofence, terrain=terrain)
+
+class MissionDaemon:
+    def __init__(self, backend='simple', host=DAEMON_HOST, port=DAEMON_PORT,
+                 clock=None, seed=None, telemetry_rate=1.0, geofence=None,
+                 terrain=None, min_clearance=MIN_CLEARANCE, planner=None, profiler=None):
+        self.backend = backend
+        self.profiler = profiler
+        self.geofence = geofence
+        self.planner = planner
+        self.terrain = terrain
+        self.min_clearance = min_clearance
+        self.clock = clock
+        self.seed = seed
+        self.telemetry_rate = telemetry_rate
+        self.host = host
+        self.port = port
+        self.controller = None
+        self.server_socket = None
+        self.is_running = False
+        self.clients = []
+        self.clients_lock = threading.Lock()
+        # Submit, cancel and the worker's dequeue all hold this, so the
+        # one-mission-at-a-time check and the job it admits cannot race
+        self.jobs_condition = threading.Condition()
+        self.jobs = deque()
+        self.current_job = None
+        self.job_counter = 0
+        self.event_stream = open_event_stream()
+
+    def setup_controller(self):
+        """Create the controller and bring its vehicle connection up once"""
+        print(f"Preparing {self.backend} mission controller...")
+        start_time = time.time()
+        self.controller = create_controller(self.backend, self.clock, self.seed,
+                                            self.telemetry_rate, self.geofence, self.terrain)
+        self.controller.event_callback = self.on_controller_event
+        if self.profiler:
+            # telemetry_thread runs for the daemon's whole life; time each send it makes
+            self.controller.publisher.send = self.profiler.time_function(
+                self.controller.publisher.send, f"{type(self.controller).__name__}.telemetry_thread:send")
+        if not self.controller.prepare():
+            return False
+        print(f"Controller ready in {time.time() - start_time:.2f}s")
+        return True
+
+    def setup_server(self):
+        """Bind the local job socket"""
+        try:
+            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.server_socket.bind((self.host, self.port))
+            self.server_socket.listen(5)
+            self.server_socket.settimeout(1.0)
+            print(f"Mission daemon listening on {self.host}:{self.port}")
+            return True
+        except Exception as e:
+            print(f"Error setting up daemon socket: {e}")
+            return False
+
+    def send_line(self, client, message):
+        """Send one JSON line to a client, dropping it if the client is gone"""
+        try:
+            client.sendall((json.dumps(message) + '\n').encode('utf-8'))
+            return True
+        except OSError:
+            self.remove_client(client)
+            return False
+
+    def broadcast(self, message):
+        """Send a JSON line to every connected client"""
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            self.send_line(client, message)
+
+    def emit(self, event, **data):
+        """Broadcast a daemon event"""
+        message = {'type': 'event', 'event': event, 'timestamp': time.time()}
+        message.update(data)
+        self.broadcast(message)
+        if self.event_stream:
+            self.event_stream.write_event(event, data)
+
+    def on_controller_event(self, event, data):
+        """Forward controller events tagged with the running job"""
+        job_id = self.current_job['job_id'] if self.current_job else None
+        self.emit(event, job_id=job_id, **data)
+
+    def remove_client(self, client):
+        """Forget a disconnected client"""
+        with self.clients_lock:
+            if client in self.clients:
+                self.clients.remove(client)
+        try:
+            client.close()
+        except OSError:
+            pass
+
+    def accept_loop(self):
+        """Accept client connections"""
+        while self.is_running:
+            try:
+                client, addr = self.server_socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self.clients_lock:
+                self.clients.append(client)
+            print(f"Client connected from {addr[0]}:{addr[1]}")
+            reader = threading.Thread(target=self.client_loop, args=(client,))
+            reader.daemon = True
+            reader.start()
+
+    def client_loop(self, client):
+        """Read newline-delimited commands from one client"""
+        buffer = b''
+        while self.is_running:
+            try:
+                data = client.recv(4096)
+            except OSError:
+                break
+            if not data:
+                break
+            buffer += data
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                if not line.strip():
+                    continue
+                try:
+                    self.handle_line(client, line)
+                except Exception as e:
+                    # A bad command must not end this client's reader
+                    print(f"Error handling command: {e}")
+                    self.send_error(client, None, f"Error handling command: {e}")
+        self.remove_client(client)
+
+    def handle_line(self, client, line):
+        """Decode and dispatch one command line"""
+        try:
+            command = json.loads(line)
+        except ValueError as e:
+            self.send_error(client, None, f"Invalid JSON: {e}")
+            return
+        if not isinstance(command, dict):
+            self.send_error(client, None, 'A command must be a JSON object')
+            return
+
+        ok, message, extra = self.handle_command(command)
+        response = {
+            'type': 'response',
+            'request_id': command.get('request_id'),
+            'command': command.get('command'),
+            'ok': ok,
+            'message': message
+        }
+        response.update(extra)
+        self.send_line(client, response)
+
+    def send_error(self, client, request_id, message):
+        self.send_line(client, {'type': 'response', 'request_id': request_id, 'ok': False,
+                                'message': message, 'error': message})
+
+    def handle_command(self, command):
+        """Execute a command, returning (ok, message, extra fields)"""
+        name = command.get('command')
+
+        if name == 'start_mission':
+            return self.submit_job(command)
+
+        if name == 'cancel':
+            return self.cancel_job(command.get('job_id'))
+
+        if name == 'status':
+            return True, 'ok', {
+                'backend': self.backend,
+                'job': self.current_job,
+                'queued': len(self.jobs)
+            }
+
+        if name == 'ping':
+            return True, 'pong', {}
+
+        if name == 'shutdown':
+            self.is_running = False
+            self.cancel_job(None)
+            return True, 'Shutting down', {}
+
+        return False, f"Unknown command: {name}", {}
+
+    def busy(self):
+        """True while a job is running or waiting for the worker"""
+        return self.current_job is not None or bool(self.jobs)
+
+    def submit_job(self, command):
+        """Validate mission parameters and hand the job to the worker"""
+        if self.busy():
+            return False, 'A mission is already running', {}
+
+        try:
+            if 'waypoints' in command:
+                job = {'mission': Mission.from_dict(command)}
+            else:
+                job = {
+                    'latitude': float(command['latitude']),
+                    'longitude': float(command['longitude']),
+                    'altitude': float(command['altitude']),
+                    'wait_time': float(command.get('wait_time', 30))
+                }
+        except (KeyError, TypeError, ValueError) as e:
+            return False, f"Invalid mission parameters: {e}", {}
+
+        if self.planner:
+            error = self.plan_route(job)
+            if error:
+                return False, error, {}
+
+        if self.terrain:
+            error = self.check_terrain(job)
+            if error:
+                return False, error, {}
+
+        with self.jobs_condition:
+            # Checked again: another client may have submitted while this one was planned
+            if self.busy():
+                return False, 'A mission is already running', {}
+            self.job_counter += 1
+            job['job_id'] = str(command.get('job_id') or f"job-{self.job_counter}")
+            job['submitted'] = time.time()
+            self.jobs.append(job)
+            self.jobs_condition.notify()
+        return True, 'Mission accepted', {'job_id': job['job_id']}
+
+    def launch_point(self):
+        """Position the mission altitudes are relative to, or None if unknown"""
+        if self.backend == 'simple':
+            from udp_listener import START_LATITUDE, START_LONGITUDE
+            return START_LATITUDE, START_LONGITUDE
+        status = self.controller.drone_status
+        if status.get('latitude') or status.get('longitude'):
+            return status['latitude'], status['longitude']
+        return None
+
+    def plan_route(self, job):
+        """Route the mission around keep-out areas, adding detour waypoints"""
+        start = self.launch_point()
+        if not start:
+            print("Route planning skipped: vehicle position unknown")
+            return None
+        mission = job.get('mission') or Mission.single_target(
+            job['latitude'], job['longitude'], job['altitude'], job['wait_time'])
+        start_time = time.perf_counter()
+        try:
+            planned = self.planner.plan_mission(mission, start[0], start[1])
+        except ValueError as e:
+            return f"Route planning failed: {e}"
+        if planned is not mission:
+            print(f"Route planned around fences in {(time.perf_counter() - start_time) * 1000:.1f} ms: "
+                  f"{len(planned) - len(mission)} detour waypoints")
+            job.clear()
+            job['mission'] = planned
+        return None
+
+    def check_terrain(self, job):
+        """Reject missions that pass below the required height above ground"""
+        home = self.launch_point()
+        if not home:
+            print("Terrain check skipped: vehicle position unknown")
+            return None
+        mission = job.get('mission') or Mission.single_target(
+            job['latitude'], job['longitude'], job['altitude'])
+        try:
+            report = self.terrain.check_mission(mission, home[0], home[1], self.min_clearance)
+        except ValueError as e:
+            print(f"Terrain check skipped: {e}")
+            return None
+        if report['unknown_legs']:
+            print(f"Terrain check: no elevation data for {len(report['unknown_legs'])} legs")
+        if report['violations']:
+            worst = min(report['violations'], key=lambda v: v['clearance'])
+            return (f"Terrain clearance {worst['clearance']}m on the leg to waypoint "
+                    f"{worst['to_waypoint'] + 1} (minimum {self.min_clearance:g}m)")
+        return None
+
+    def cancel_job(self, job_id):
+        """Remove a queued job, or request cancellation of the running one"""
+        with self.jobs_condition:
+            for job in self.jobs:
+                if not job_id or job_id == job['job_id']:
+                    self.jobs.remove(job)
+                    break
+            else:
+                job = self.current_job
+                if not job or (job_id and job_id != job['job_id']):
+                    return False, 'No matching mission running', {}
+                self.controller.cancel_requested = True
+                return True, 'Cancel requested', {'job_id': job['job_id']}
+        self.emit('job_finished', job_id=job['job_id'], success=False, cancelled=True, duration=0.0)
+        return True, 'Queued mission cancelled', {'job_id': job['job_id']}
+
+    def next_job(self, timeout=1.0):
+        """Take the next queued job and make it current, or None after timeout"""
+        with self.jobs_condition:
+            if not self.jobs:
+                self.jobs_condition.wait(timeout)
+            if not self.jobs:
+                return None
+            job = self.jobs.popleft()
+            self.current_job = job
+            self.controller.cancel_requested = False
+            return job
+
+    def worker_loop(self):
+        """Run queued jobs one at a time on the warm controller"""
+        while self.is_running:
+            job = self.next_job()
+            if job is None:
+                continue
+
+            start_time = time.time()
+            self.emit('job_started', job_id=job['job_id'],
+                      start_latency=start_time - job['submitted'])
+            mission = job.get('mission')
+            if mission:
+                print(f"Starting mission {job['job_id']}: {len(mission)} waypoints, "
+                      f"{mission.total_distance:.0f}m route")
+            else:
+                print(f"Starting mission {job['job_id']}: {job['latitude']}, "
+                      f"{job['longitude']} at {job['altitude']}m")
+
+            try:
+                if mission:
+                    success = self.controller.execute_waypoint_mission(mission)
+                else:
+                    success = self.controller.execute_mission(
+                        job['latitude'], job['longitude'], job['altitude'], job['wait_time'])
+                self.emit('job_finished', job_id=job['job_id'], success=bool(success),
+                          cancelled=self.controller.cancel_requested,
+                          duration=time.time() - start_time)
+            except Exception as e:
+                print(f"Mission {job['job_id']} failed: {e}")
+                self.emit('job_failed', job_id=job['job_id'], error=str(e),
+                          duration=time.time() - start_time)
+            finally:
+                self.current_job = None
+
+    def start(self):
+        """Start the daemon and block until shutdown"""
+        if not self.setup_server():
+            return False
+        if not self.setup_controller():
+            self.stop()
+            return False
+
+        self.is_running = True
+        for target in (self.accept_loop, self.worker_loop):
+            thread = threading.Thread(target=target)
+            thread.daemon = True
+            thread.start()
+
+        print("Mission daemon ready")
+        sys.stdout.flush()
+
+        try:
+            while self.is_running:
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            print("\nStopping mission daemon...")
+        finally:
+            self.stop()
+        return True
+
+    def stop(self):
+        """Stop the daemon and release the controller"""
+        self.is_running = False
+
+        if self.controller:
+            self.controller.cancel_requested = True
+            self.controller.cleanup()
+
+        with self.clients_lock:
+            clients = list(self.clients)
+        for client in clients:
+            self.remove_client(client)
+
+        if self.server_socket:
+            self.server_socket.close()
+            self.server_socket = None
+
+        print("Mission daemon stopped")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Resident mission controller daemon')
+    parser.add_argument('--backend', choices=['simple', 'dronekit', 'mavlink'], default='simple',
+                        help='Mission controller backend (default: simple)')
+    parser.add_argument('--host', default=DAEMON_HOST, help='Address to bind the job socket to')
+    parser.add_argument('--port', type=int, default=DAEMON_PORT, help='Port for the job socket')
+    parser.add_argument('--speedup', type=float, default=None,
+                        help='Simple backend: run missions N times faster than real time')
+    parser.add_argument('--fast', action='store_true',
+                        help='Simple backend: run missions as fast as possible')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Simple backend: random seed for repeatable missions')
+    parser.add_argument('--telemetry-rate', type=float, default=1.0,
+                        help='Periodic telemetry rate in Hz (changes are sent immediately)')
+    parser.add_argument('--fence', default=None,
+                        help='Geofence JSON file; a breach aborts the mission and returns to launch')
+    parser.add_argument('--terrain', default=None,
+                        help='Directory of .hgt / .raw elevation tiles; missions are checked for clearance')
+    parser.add_argument('--min-clearance', type=float, default=MIN_CLEARANCE,
+                        help='Required height above ground in meters with --terrain')
+    parser.add_argument('--avoid-margin', type=float, default=None,
+                        help='Meters to keep clear of keep-out fences when routing (default: near-breach distance + 10)')
+    parser.add_argument('--no-route-planning', action='store_true',
+                        help='Fly straight legs even when a geofence is loaded')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help='Write stack samples, allocations and timings to DIR on exit '
+                             '(default: $DRONE_PROFILE, off if unset)')
+    args = parser.parse_args()
+
+    print("=== Mission Daemon ===")
+    if not args.telemetry_rate > 0:
+        print(f"Error: --telemetry-rate must be positive, got {args.telemetry_rate}")
+        sys.exit(1)
+    try:
+        geofence = Geofence.from_json(args.fence) if args.fence else None
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error loading geofence: {e}")
+        sys.exit(1)
+    if geofence:
+        print(f"Geofence: {len(geofence)} fences")
+
+    planner = None
+    if geofence and not args.no_route_planning:
+        planner = PathPlanner(geofence, args.avoid_margin)
+        print(f"Route planning around {len(planner.obstacles)} keep-out fences "
+              f"(margin {planner.margin:g}m)")
+
+    terrain = TerrainService(args.terrain) if args.terrain else None
+    if terrain:
+        print(f"Terrain: {args.terrain} (minimum clearance {args.min_clearance:g}m)")
+
+    profiler = start_profiler('mission_daemon', args.profile)
+
+    daemon = MissionDaemon(args.backend, args.host, args.port,
+                           create_clock(args.speedup, args.fast), args.seed,
+                           args.telemetry_rate, geofence, terrain, args.min_clearance, planner,
+                           profiler)
+
+    try:
+        if not daemon.start():
+            sys.exit(1)
+    except Exception as e:
+        print(f"Error running mission daemon: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
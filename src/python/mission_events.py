@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Mission Event Stream
+Writes structured mission events as newline-delimited JSON (NDJSON) to a
+dedicated channel, separate from the human-readable prints on stdout.
+
+In the app, events reach the Electron main process over the mission
+daemon's socket, as {"type": "event", ...} lines (see mission_daemon.py).
+This channel is for running a controller or the daemon on its own: set
+MISSION_EVENT_FD to an inherited file descriptor, e.g.
+
+  MISSION_EVENT_FD=3 python drone_mission.py 3>events.ndjson
+"""
+
+import os
+import json
+import time
+import threading
+
+EVENT_FD_ENV = 'MISSION_EVENT_FD'
+
+class EventStreamWriter:
+    def __init__(self, stream):
+        self.stream = stream
+        self.lock = threading.Lock()
+        self.seq = 0
+
+    def write_event(self, event, data=None):
+        """Write one event as a single JSON line"""
+        with self.lock:
+            self.seq += 1
+            message = {'event': event, 'seq': self.seq, 'timestamp': time.time()}
+            if data:
+                message.update(data)
+            try:
+                self.stream.write(json.dumps(message, separators=(',', ':')) + '\n')
+                self.stream.flush()
+            except (OSError, ValueError):
+                # Reader went away; events are best effort
+                pass
+
+    def close(self):
+        """Close the underlying stream"""
+        with self.lock:
+            try:
+                self.stream.close()
+            except OSError:
+                pass
+
+def open_event_stream():
+    """Open the event channel given by MISSION_EVENT_FD, or return None"""
+    fd = os.environ.get(EVENT_FD_ENV)
+    if not fd:
+        return None
+
+    try:
+        return EventStreamWriter(os.fdopen(int(fd), 'w', encoding='utf-8'))
+    except (OSError, ValueError) as e:
+        print(f"Could not open event channel {fd}: {e}")
+        return None
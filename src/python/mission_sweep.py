@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Mission Parameter Sweep
+Runs the simulated SimpleUDPController mission for a grid or list of mission
+configurations on a process pool, each on a virtual clock, and collects the
+per-run metrics (duration, distance flown, time to arrive) into one CSV
+results table.
+
+Config file (JSON), either a list of runs:
+  [{"latitude": 34.01, "longitude": 74.71, "altitude": 30, "cruise_speed": 8}, ...]
+or targets plus a parameter grid:
+  {"targets": [[34.01, 74.71], [34.02, 74.70]],
+   "grid": {"altitude": [20, 40], "wait_time": [0, 30], "cruise_speed": [5, 10]}}
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from sim_clock import VirtualClock
+from udp_listener import SimpleUDPController, ALTITUDE, WAIT_TIME_AT_TARGET
+
+# Parameters a sweep can vary, with their defaults
+SWEEP_DEFAULTS = {
+    'altitude': ALTITUDE,
+    'wait_time': WAIT_TIME_AT_TARGET,
+    'arrival_radius': 2.0,
+    'cruise_speed': 5.0,
+    'climb_rate': 2.5,
+    'acceleration': 1.0,
+    'time_step': 0.1,
+}
+
+RESULT_COLUMNS = [
+    'run', 'latitude', 'longitude', 'altitude', 'wait_time', 'arrival_radius',
+    'cruise_speed', 'climb_rate', 'acceleration', 'seed', 'success',
+    'duration', 'distance_flown', 'time_to_arrive', 'wall_time', 'error'
+]
+
+def expand_grid(targets, grid):
+    """One config per target and combination of grid values"""
+    names = sorted(grid)
+    configs = []
+    for lat, lon in targets:
+        for values in itertools.product(*(grid[name] for name in names)):
+            config = {'latitude': lat, 'longitude': lon}
+            config.update(zip(names, values))
+            configs.append(config)
+    return configs
+
+def load_configs(path):
+    """Read run configs from a JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return data
+    return expand_grid(data.get('targets', []), data.get('grid', {}))
+
+def prepare_configs(configs, seed):
+    """Fill defaults, number the runs and give each a repeatable seed"""
+    prepared = []
+    for index, config in enumerate(configs):
+        run = dict(SWEEP_DEFAULTS)
+        run.update(config)
+        run['run'] = index
+        run.setdefault('seed', seed + index)
+        prepared.append(run)
+    return prepared
+
+def run_sweep_case(config):
+    """Fly one simulated mission on a virtual clock and return its metrics"""
+    result = dict(config)
+    wall_start = time.perf_counter()
+    try:
+        controller = SimpleUDPController(
+            clock=VirtualClock(),
+            seed=config['seed'],
+            cruise_speed=config['cruise_speed'],
+            climb_rate=config['climb_rate'],
+            acceleration=config['acceleration'],
+            arrival_radius=config['arrival_radius'],
+            time_step=config['time_step']
+        )
+        # The controller narrates every step; keep worker output quiet
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            success = controller.execute_mission(
+                config['latitude'], config['longitude'],
+                config['altitude'], config['wait_time'])
+        result.update(controller.mission_stats)
+        result['success'] = bool(success)
+    except Exception as e:
+        result['success'] = False
+        result['error'] = str(e)
+    result['wall_time'] = time.perf_counter() - wall_start
+    return result
+
+def run_sweep(configs, workers=None, progress_every=100):
+    """Run all configs on a process pool, returning results in run order"""
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(configs) // (workers * 8))
+    results = []
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(run_sweep_case, configs, chunksize=chunksize):
+            results.append(result)
+            if progress_every and len(results) % progress_every == 0:
+                elapsed = time.perf_counter() - start_time
+                print(f"Completed {len(results)}/{len(configs)} runs in {elapsed:.1f}s")
+
+    return results
+
+def write_results(results, path):
+    """Write the results table as CSV"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for result in results:
+            writer.writerow(result)
+
+def print_summary(results, elapsed):
+    """Print a short summary of the sweep"""
+    succeeded = [r for r in results if r.get('success')]
+    print(f"Runs: {len(results)} | Succeeded: {len(succeeded)} | "
+          f"Wall time: {elapsed:.1f}s ({len(results) / max(elapsed, 1e-9):.1f} runs/s)")
+    if succeeded:
+        durations = [r['duration'] for r in succeeded]
+        print(f"Simulated mission duration: min {min(durations):.0f}s, "
+              f"max {max(durations):.0f}s, mean {sum(durations) / len(durations):.0f}s")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Batch mission parameter sweep')
+    parser.add_argument('--config', help='JSON file with runs or targets plus grid')
+    parser.add_argument('--target', type=float, nargs=2, action='append', metavar=('LAT', 'LON'),
+                        help='Target coordinate (repeatable)')
+    parser.add_argument('--altitude', type=float, nargs='+', help='Altitudes to sweep (m)')
+    parser.add_argument('--wait-time', type=float, nargs='+', help='Wait times to sweep (s)')
+    parser.add_argument('--arrival-radius', type=float, nargs='+', help='Arrival radii to sweep (m)')
+    parser.add_argument('--cruise-speed', type=float, nargs='+', help='Cruise speeds to sweep (m/s)')
+    parser.add_argument('--seed', type=int, default=0, help='Base random seed')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: CPU count)')
+    parser.add_argument('--output', default='sweep_results.csv', help='CSV results file')
+    args = parser.parse_args()
+
+    print("=== Mission Parameter Sweep ===")
+
+    if args.config:
+        configs = load_configs(args.config)
+    else:
+        grid = {}
+        for name in ('altitude', 'wait_time', 'arrival_radius', 'cruise_speed'):
+            values = getattr(args, name)
+            if values:
+                grid[name] = values
+        configs = expand_grid(args.target or [], grid)
+
+    if not configs:
+        print("No runs to do: give --config or at least one --target")
+        sys.exit(1)
+
+    configs = prepare_configs(configs, args.seed)
+    print(f"Running {len(configs)} simulated missions...")
+
+    start_time = time.perf_counter()
+    results = run_sweep(configs, args.workers)
+    elapsed = time.perf_counter() - start_time
+
+    write_results(results, args.output)
+    print_summary(results, elapsed)
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
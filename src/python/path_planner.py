@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Obstacle-Aware Path Planner
+Shortest safe paths around keep-out areas on a visibility graph.
+
+Exclusion fences become convex obstacles in a local metric frame: polygons
+are replaced by their convex hull and cylinders by a circumscribed polygon,
+both grown by a safety margin. A shortest path around convex obstacles only
+runs along segments that are tangent to the obstacles at both ends, so the
+graph nodes are the obstacle vertices and an edge is kept only when it is
+tangent at both vertices and clear of every obstacle.
+
+Visibility is tested lazily: the neighbors of a vertex are computed the
+first time A* expands it, with one vectorized pass over the obstacles whose
+bounding boxes overlap the candidate segments, and then kept in the graph.
+Graphs are cached per set of active obstacles, so replanning mid-flight
+reuses every neighbor list already found.
+
+Fences with an altitude band only block legs flown inside the band. Keep-in
+areas are not planned around; the geofence monitor still enforces them.
+"""
+
+import math
+import json
+import heapq
+import time
+import sys
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+
+from geo_utils import LocalProjection, haversine_distance
+from geofence import Geofence, PolygonFence
+from waypoint_mission import Mission, Waypoint
+
+AVOID_MARGIN = 10.0     # Meters kept clear beyond the near-breach distance
+CIRCLE_SEGMENTS = 16    # Sides of the polygon standing in for a cylinder
+GRAPH_CACHE_SIZE = 8    # Visibility graphs kept per planner
+TOLERANCE = 1e-3        # Meters; segments may touch obstacle boundaries
+
+def convex_hull(x, y):
+    """Counter-clockwise convex hull of points (monotone chain)"""
+    points = sorted(set(zip(x.tolist(), y.tolist())))
+    if len(points) < 3:
+        return np.array([p[0] for p in points]), np.array([p[1] for p in points])
+
+    def cross(o, a, b):
+        return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+    lower = []
+    for p in points:
+        while len(lower) >= 2 and cross(lower[-2], lower[-1], p) <= 0:
+            lower.pop()
+        lower.append(p)
+    upper = []
+    for p in reversed(points):
+        while len(upper) >= 2 and cross(upper[-2], upper[-1], p) <= 0:
+            upper.pop()
+        upper.append(p)
+    hull = lower[:-1] + upper[:-1]
+    return np.array([p[0] for p in hull]), np.array([p[1] for p in hull])
+
+def inflate_convex(x, y, margin):
+    """Grow a counter-clockwise convex polygon outward by margin (mitered corners)"""
+    next_x, next_y = np.roll(x, -1), np.roll(y, -1)
+    length = np.hypot(next_x - x, next_y - y)
+    # Outward normal of each edge (right-hand side of a CCW polygon)
+    normal_x = (next_y - y) / length
+    normal_y = -(next_x - x) / length
+    prev_normal_x, prev_normal_y = np.roll(normal_x, 1), np.roll(normal_y, 1)
+    bisector_x = normal_x + prev_normal_x
+    bisector_y = normal_y + prev_normal_y
+    # cos(half angle) between the two normals; the miter length is margin / cos
+    cos_half = np.hypot(bisector_x, bisector_y) / 2
+    scale = margin / np.maximum(cos_half, 1e-6) / np.maximum(2 * cos_half, 1e-6)
+    return x + bisector_x * scale, y + bisector_y * scale
+
+class Obstacle:
+    """A convex keep-out polygon in local (x = east, y = north) meters"""
+
+    def __init__(self, name, x, y, min_alt=None, max_alt=None):
+        self.name = name
+        self.x = np.asarray(x, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.min_alt = min_alt
+        self.max_alt = max_alt
+
+    def blocks(self, low, high):
+        """True if the altitude band overlaps a leg flown between low and high"""
+        if low is None:
+            return True
+        return ((self.min_alt is None or high >= self.min_alt) and
+                (self.max_alt is None or low <= self.max_alt))
+
+class VisibilityGraph:
+    """Lazily built visibility graph over a fixed set of convex obstacles"""
+
+    def __init__(self, obstacles):
+        self.obstacles = obstacles
+        sizes = np.array([len(o.x) for o in obstacles], dtype=np.int64)
+        count = len(obstacles)
+
+        # Vertices of every obstacle, with their neighbors on the same obstacle
+        self.x = np.concatenate([o.x for o in obstacles]) if count else np.zeros(0)
+        self.y = np.concatenate([o.y for o in obstacles]) if count else np.zeros(0)
+        self.owner = np.repeat(np.arange(count), sizes)
+        offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+        local = np.arange(len(self.x)) - offsets[self.owner] if count else np.zeros(0, np.int64)
+        self.prev = offsets[self.owner] + (local - 1) % sizes[self.owner] if count else local
+        self.next = offsets[self.owner] + (local + 1) % sizes[self.owner] if count else local
+
+        # Edges padded to a fixed count per obstacle by repeating the first one,
+        # so a segment can be clipped against many obstacles in one array pass
+        width = int(sizes.max()) if count else 1
+        self.edge_x = np.zeros((count, width))
+        self.edge_y = np.zeros((count, width))
+        self.normal_x = np.zeros((count, width))
+        self.normal_y = np.zeros((count, width))
+        for i, obstacle in enumerate(obstacles):
+            x, y = obstacle.x, obstacle.y
+            dx, dy = np.roll(x, -1) - x, np.roll(y, -1) - y
+            length = np.hypot(dx, dy)
+            pad = np.arange(width) % len(x)
+            pad[len(x):] = 0
+            self.edge_x[i] = x[pad]
+            self.edge_y[i] = y[pad]
+            self.normal_x[i] = (dy / length)[pad]
+            self.normal_y[i] = (-dx / length)[pad]
+        self.min_x = np.array([o.x.min() for o in obstacles])
+        self.max_x = np.array([o.x.max() for o in obstacles])
+        self.min_y = np.array([o.y.min() for o in obstacles])
+        self.max_y = np.array([o.y.max() for o in obstacles])
+        # Bounding circles cull the obstacles a segment cannot reach
+        self.center_x = (self.min_x + self.max_x) / 2
+        self.center_y = (self.min_y + self.max_y) / 2
+        self.radius_sq = ((self.max_x - self.min_x) ** 2 + (self.max_y - self.min_y) ** 2) / 4
+
+        # Vertices swallowed by an overlapping obstacle can never be on a path
+        inside = self.containing(self.x, self.y)
+        self.usable = inside < 0
+        self.neighbors = {}
+        self.expansions = 0
+
+    def __len__(self):
+        return len(self.x)
+
+    def containing(self, x, y):
+        """Index of an obstacle strictly containing each point, or -1"""
+        x = np.atleast_1d(np.asarray(x, dtype=float))
+        y = np.atleast_1d(np.asarray(y, dtype=float))
+        result = np.full(len(x), -1, dtype=np.int64)
+        if not self.obstacles:
+            return result
+        point, obstacle = np.nonzero((x[:, None] > self.min_x) & (x[:, None] < self.max_x) &
+                                     (y[:, None] > self.min_y) & (y[:, None] < self.max_y))
+        if len(point):
+            side = ((x[point, None] - self.edge_x[obstacle]) * self.normal_x[obstacle] +
+                    (y[point, None] - self.edge_y[obstacle]) * self.normal_y[obstacle])
+            hit = np.all(side < -TOLERANCE, axis=1)
+            result[point[hit]] = obstacle[hit]
+        return result
+
+    def visible(self, ax, ay, bx, by):
+        """True for each segment a -> b that does not enter any obstacle
+
+        Cyrus-Beck clipping against every obstacle whose bounding circle the
+        segment passes through; touching a boundary is allowed.
+        """
+        ax, ay, bx, by = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float))
+                                               for v in (ax, ay, bx, by)))
+        clear = np.ones(len(ax), dtype=bool)
+        if not self.obstacles or not len(ax):
+            return clear
+        # Closest approach of each segment to each obstacle center
+        seg_x, seg_y = (bx - ax)[:, None], (by - ay)[:, None]
+        to_x, to_y = self.center_x - ax[:, None], self.center_y - ay[:, None]
+        length_sq = seg_x * seg_x + seg_y * seg_y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.clip(np.where(length_sq > 0, (to_x * seg_x + to_y * seg_y) / length_sq, 0.0), 0.0, 1.0)
+        near_x, near_y = to_x - t * seg_x, to_y - t * seg_y
+        segment, obstacle = np.nonzero(near_x * near_x + near_y * near_y < self.radius_sq)
+        if not len(segment):
+            return clear
+
+        dx = (bx - ax)[segment, None]
+        dy = (by - ay)[segment, None]
+        nx, ny = self.normal_x[obstacle], self.normal_y[obstacle]
+        # Inside the (slightly shrunk) half-plane of an edge when num + t * den < 0
+        num = ((ax[segment, None] - self.edge_x[obstacle]) * nx +
+               (ay[segment, None] - self.edge_y[obstacle]) * ny + TOLERANCE)
+        den = dx * nx + dy * ny
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = -num / den
+        enter = np.where(den < 0, t, -np.inf).max(axis=1)
+        leave = np.where(den > 0, t, np.inf).min(axis=1)
+        parallel_outside = np.any((den == 0) & (num >= 0), axis=1)
+        hits = ~parallel_outside & (np.maximum(enter, 0.0) < np.minimum(leave, 1.0))
+        clear[segment[hits]] = False
+        return clear
+
+    def tangent(self, vertices, px, py):
+        """True where the line from each point to its vertex only grazes that vertex's obstacle"""
+        vx, vy = self.x[vertices], self.y[vertices]
+        dx, dy = px - vx, py - vy
+        prev_side = dx * (self.y[self.prev[vertices]] - vy) - dy * (self.x[self.prev[vertices]] - vx)
+        next_side = dx * (self.y[self.next[vertices]] - vy) - dy * (self.x[self.next[vertices]] - vx)
+        return prev_side * next_side >= -TOLERANCE
+
+    def candidates(self, px, py, exclude=-1):
+        """Usable vertices visible from a point along a tangent, with their distances"""
+        candidates = np.nonzero(self.usable)[0]
+        candidates = candidates[candidates != exclude]
+        if exclude >= 0:
+            candidates = candidates[self.tangent(np.full(len(candidates), exclude),
+                                                 self.x[candidates], self.y[candidates])]
+        candidates = candidates[self.tangent(candidates, px, py)]
+        candidates = candidates[self.visible(px, py, self.x[candidates], self.y[candidates])]
+        distances = np.hypot(self.x[candidates] - px, self.y[candidates] - py)
+        return candidates, distances
+
+    def vertex_neighbors(self, vertex):
+        """Visible tangent neighbors of an obstacle vertex, computed once"""
+        neighbors = self.neighbors.get(vertex)
+        if neighbors is None:
+            self.expansions += 1
+            neighbors = self.candidates(self.x[vertex], self.y[vertex], vertex)
+            self.neighbors[vertex] = neighbors
+        return neighbors
+
+    def shortest_path(self, start, goal):
+        """A* from start to goal (x, y); returns the list of points, or None"""
+        sx, sy = start
+        gx, gy = goal
+        if self.visible(sx, sy, gx, gy)[0]:
+            return [start, goal]
+
+        count = len(self)
+        start_node, goal_node = count, count + 1
+
+        def point(node):
+            if node == start_node:
+                return sx, sy
+            if node == goal_node:
+                return gx, gy
+            return self.x[node], self.y[node]
+
+        def heuristic(node):
+            x, y = point(node)
+            return math.hypot(gx - x, gy - y)
+
+        cost = {start_node: 0.0}
+        parent = {start_node: None}
+        queue = [(heuristic(start_node), 0.0, start_node)]
+        closed = set()
+        while queue:
+            _, g, node = heapq.heappop(queue)
+            if node in closed:
+                continue
+            if node == goal_node:
+                path = []
+                while node is not None:
+                    path.append(point(node))
+                    node = parent[node]
+                return path[::-1]
+            closed.add(node)
+
+            if node == start_node:
+                neighbors, distances = self.candidates(sx, sy)
+            else:
+                neighbors, distances = self.vertex_neighbors(node)
+            x, y = point(node)
+            # The goal is tried directly from every expanded node
+            steps = list(zip(neighbors.tolist(), distances.tolist()))
+            if node != start_node and self.visible(x, y, gx, gy)[0]:
+                steps.append((goal_node, math.hypot(gx - x, gy - y)))
+
+            for neighbor, distance in steps:
+                if neighbor in closed:
+                    continue
+                new_cost = g + distance
+                if new_cost < cost.get(neighbor, math.inf):
+                    cost[neighbor] = new_cost
+                    parent[neighbor] = node
+                    heapq.heappush(queue, (new_cost + heuristic(neighbor), new_cost, neighbor))
+        return None
+
+class PathPlanner:
+    def __init__(self, geofence, margin=None, cache_size=GRAPH_CACHE_SIZE):
+        self.geofence = geofence
+        self.margin = geofence.near_distance + AVOID_MARGIN if margin is None else float(margin)
+        self.cache_size = cache_size
+        self.graphs = OrderedDict()
+        self.last_graph = None
+
+        fences = geofence.exclusions
+        if fences:
+            min_lat = min(f.bounds()[0] for f in fences)
+            min_lon = min(f.bounds()[1] for f in fences)
+            max_lat = max(f.bounds()[2] for f in fences)
+            max_lon = max(f.bounds()[3] for f in fences)
+            self.projection = LocalProjection((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+        else:
+            self.projection = LocalProjection(0.0, 0.0)
+        self.obstacles = [self.make_obstacle(fence) for fence in fences]
+
+    def make_obstacle(self, fence):
+        """Convex, margin-inflated obstacle for an exclusion fence"""
+        if isinstance(fence, PolygonFence):
+            north, east = self.projection.to_local(fence.lat, fence.lon)
+            x, y = convex_hull(np.asarray(east), np.asarray(north))
+        else:
+            north, east = self.projection.to_local(fence.lat, fence.lon)
+            angle = np.arange(CIRCLE_SEGMENTS) * 2 * math.pi / CIRCLE_SEGMENTS
+            # Circumscribed, so the polygon covers the whole circle
+            radius = fence.radius / math.cos(math.pi / CIRCLE_SEGMENTS)
+            x, y = east + radius * np.cos(angle), north + radius * np.sin(angle)
+        x, y = inflate_convex(x, y, self.margin)
+        return Obstacle(fence.name, x, y, fence.min_alt, fence.max_alt)
+
+    def graph_for(self, low_alt=None, high_alt=None):
+        """Visibility graph for the obstacles blocking an altitude range, cached"""
+        key = tuple(i for i, o in enumerate(self.obstacles) if o.blocks(low_alt, high_alt))
+        graph = self.graphs.get(key)
+        if graph is None:
+            graph = VisibilityGraph([self.obstacles[i] for i in key])
+            self.graphs[key] = graph
+            while len(self.graphs) > self.cache_size:
+                self.graphs.popitem(last=False)
+        else:
+            self.graphs.move_to_end(key)
+        self.last_graph = graph
+        return graph
+
+    def plan(self, start_lat, start_lon, goal_lat, goal_lon, start_alt=None, goal_alt=None):
+        """Shortest safe path as a list of (lat, lon), both end points included
+
+        Raises ValueError if the goal is inside an obstacle or cannot be reached.
+        An obstacle around the start is ignored so the vehicle can fly out of it.
+        """
+        if start_alt is None or goal_alt is None:
+            graph = self.graph_for()
+        else:
+            graph = self.graph_for(min(start_alt, goal_alt), max(start_alt, goal_alt))
+        start_north, start_east = self.projection.to_local(start_lat, start_lon)
+        goal_north, goal_east = self.projection.to_local(goal_lat, goal_lon)
+
+        inside = graph.containing([start_east, goal_east], [start_north, goal_north])
+        if inside[1] >= 0:
+            raise ValueError(f"Target is within {self.margin:g}m of fence "
+                             f"{graph.obstacles[inside[1]].name}")
+        if inside[0] >= 0:
+            keep = [o for i, o in enumerate(graph.obstacles) if i != inside[0]]
+            graph = VisibilityGraph(keep)
+
+        path = graph.shortest_path((start_east, start_north), (goal_east, goal_north))
+        if path is None:
+            raise ValueError("No safe path to the target")
+        points = [self.projection.to_global(y, x) for x, y in path]
+        # Keep the exact end points rather than their projected round trip
+        points[0] = (start_lat, start_lon)
+        points[-1] = (goal_lat, goal_lon)
+        return points
+
+    def plan_mission(self, mission, start_lat, start_lon):
+        """Mission with detour waypoints inserted wherever a leg crosses an obstacle
+
+        Detour points take the speed of the leg they belong to and the
+        altitude interpolated between its end points; they have no hold time.
+        Returns the original mission when no leg needs a detour.
+        """
+        waypoints = []
+        previous_lat, previous_lon = start_lat, start_lon
+        previous_alt = mission.waypoints[0].alt
+        for waypoint in mission.waypoints:
+            path = self.plan(previous_lat, previous_lon, waypoint.lat, waypoint.lon,
+                             previous_alt, waypoint.alt)
+            detours = path[1:-1]
+            if detours:
+                lengths = [haversine_distance(a[0], a[1], b[0], b[1])
+                           for a, b in zip(path[:-1], path[1:])]
+                total = sum(lengths)
+                travelled = 0.0
+                for (lat, lon), length in zip(detours, lengths):
+                    travelled += length
+                    alt = previous_alt + (waypoint.alt - previous_alt) * travelled / total
+                    waypoints.append(Waypoint(lat, lon, alt, waypoint.speed))
+            waypoints.append(waypoint)
+            previous_lat, previous_lon, previous_alt = waypoint.lat, waypoint.lon, waypoint.alt
+
+        if len(waypoints) == len(mission.waypoints):
+            return mission
+        return Mission(waypoints, mission.default_speed, mission.arrival_radius)
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Plan a mission around geofence keep-out areas')
+    parser.add_argument('mission', help='Waypoint mission JSON file')
+    parser.add_argument('--fence', required=True, help='Geofence JSON file')
+    parser.add_argument('--start', type=float, nargs=2, required=True, metavar=('LAT', 'LON'),
+                        help='Position the mission is flown from')
+    parser.add_argument('--margin', type=float, default=None,
+                        help='Clearance from fences in meters (default: near-breach distance + 10)')
+    parser.add_argument('--output', default=None, help='Write the planned mission JSON here')
+    args = parser.parse_args()
+
+    try:
+        mission = Mission.from_json(args.mission)
+        planner = PathPlanner(Geofence.from_json(args.fence), args.margin)
+        start_time = time.perf_counter()
+        planned = planner.plan_mission(mission, args.start[0], args.start[1])
+        elapsed = time.perf_counter() - start_time
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Obstacles: {len(planner.obstacles)} (margin {planner.margin:g}m)")
+    print(f"Waypoints: {len(mission)} -> {len(planned)}")
+    print(f"Route length: {mission.total_distance:.0f}m -> {planned.total_distance:.0f}m")
+    print(f"Planned in {elapsed * 1000:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(planned.to_dict(), f)
+        print(f"Mission written to {args.output}")
+
+if __name__ == "__main__":
+    main()
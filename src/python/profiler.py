@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Process Profiler
+Opt-in profiling for the MAVLink parser and the mission controllers, for
+when they misbehave in the field. Enabled with --profile DIR or the
+DRONE_PROFILE environment variable (a directory); costs nothing when off.
+
+While enabled:
+  - a sampler thread records the stack of every other thread 100 times a
+    second (sys._current_frames), which costs far less than cProfile's
+    per-call hooks and sees where blocked threads are waiting too
+  - tracemalloc snapshots are compared at intervals, and each interval's
+    top allocation growth is logged
+  - chosen hot functions are wrapped in timers (count, mean, p99, max)
+
+Each process writes into its own <script>-<pid> subdirectory, so the parser
+and a mission controller can share one DRONE_PROFILE. On shutdown it
+receives:
+  stacks.collapsed   one "thread;outer;...;inner count" line per stack, for
+                     flamegraph.pl, speedscope or inferno
+  allocations.txt    interval growth log and the top allocations at exit
+  timers.txt         per-function call timings
+"""
+
+import os
+import sys
+import time
+import atexit
+import signal
+import threading
+import tracemalloc
+from collections import Counter, deque
+
+PROFILE_ENV = 'DRONE_PROFILE'
+SAMPLE_INTERVAL = 0.01      # Seconds between stack samples
+ALLOCATION_INTERVAL = 30.0  # Seconds between tracemalloc snapshot diffs
+ALLOCATION_FRAMES = 8       # Traceback depth kept by tracemalloc
+TOP_ALLOCATIONS = 20        # Entries per allocation report
+TIMER_SAMPLES = 10000       # Recent durations kept per timer for the p99
+
+class StackSampler:
+    """Periodically records the collapsed stack of every thread but the profiler's own"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self.labels = {}  # Code object -> frame label, so each is formatted once
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            module = os.path.splitext(os.path.basename(code.co_filename))[0]
+            label = self.labels[code] = f"{module}:{code.co_name}"
+        return label
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, f"thread-{ident}")
+            if name.startswith('profiler-'):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self.label(frame.f_code))
+                frame = frame.f_back
+            stack.append(name)
+            self.stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.sample()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='profiler-sampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+class AllocationTracker:
+    """tracemalloc snapshot diffs at intervals and a top-N summary at exit"""
+
+    def __init__(self, interval=ALLOCATION_INTERVAL, top=TOP_ALLOCATIONS, frames=ALLOCATION_FRAMES):
+        self.interval = interval
+        self.top = top
+        self.frames = frames
+        self.log = []
+        self.baseline = None
+        self.previous = None
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.started = time.monotonic()
+
+    @staticmethod
+    def take_snapshot():
+        # The profiler's own bookkeeping is not what we are looking for
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ))
+
+    def diff(self):
+        snapshot = self.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        elapsed = time.monotonic() - self.started
+        lines = [f"--- {elapsed:.0f}s: {current / 1024:.0f} KiB traced, peak {peak / 1024:.0f} KiB"]
+        for stat in snapshot.compare_to(self.previous, 'lineno')[:self.top]:
+            if stat.size_diff:
+                lines.append(f"  {stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                             f"{stat.traceback[0]}")
+        self.log.append('\n'.join(lines))
+        self.previous = snapshot
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            self.diff()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.baseline = self.previous = self.take_snapshot()
+        self.thread = threading.Thread(target=self.run, name='profiler-allocations', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def write(self, path):
+        final = self.take_snapshot()
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('Allocation growth per interval\n')
+            f.write('\n'.join(self.log) + '\n\n' if self.log else '(none)\n\n')
+            f.write(f'Top {self.top} allocation sites still live at exit\n')
+            for stat in final.statistics('traceback')[:self.top]:
+                f.write(f"{stat.size / 1024:10.1f} KiB {stat.count:8d} blocks\n")
+                for line in stat.traceback.format(most_recent_first=True):
+                    f.write(f"    {line}\n")
+            f.write(f'\nTop {self.top} growth since start\n')
+            for stat in final.compare_to(self.baseline, 'lineno')[:self.top]:
+                f.write(f"{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  "
+                        f"{stat.traceback[0]}\n")
+        tracemalloc.stop()
+
+class FunctionTimer:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=TIMER_SAMPLES)
+        self.lock = threading.Lock()
+
+    def add(self, duration):
+        with self.lock:
+            self.count += 1
+            self.total += duration
+            self.recent.append(duration)
+            if duration > self.max:
+                self.max = duration
+
+    def wrap(self, function):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.add(time.perf_counter() - start)
+        timed.__wrapped__ = function
+        timed.__name__ = getattr(function, '__name__', self.name)
+        return timed
+
+    def summary(self):
+        with self.lock:
+            recent = sorted(self.recent)
+        if not self.count:
+            return f"{self.name:40s} {0:10d} calls"
+        p99 = recent[min(len(recent) - 1, int(len(recent) * 0.99))]
+        return (f"{self.name:40s} {self.count:10d} calls  mean {self.total / self.count * 1e3:9.3f} ms  "
+                f"p99 {p99 * 1e3:9.3f} ms  max {self.max * 1e3:9.3f} ms  "
+                f"total {self.total:9.3f} s")
+
+class Profiler:
+    def __init__(self, directory, sample_interval=SAMPLE_INTERVAL,
+                 allocation_interval=ALLOCATION_INTERVAL):
+        self.directory = directory
+        self.sampler = StackSampler(sample_interval)
+        self.allocations = AllocationTracker(allocation_interval)
+        self.timers = {}
+        self.running = False
+
+    def time_function(self, function, name=None):
+        """A timed wrapper around function"""
+        name = name or function.__qualname__
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = FunctionTimer(name)
+        return timer.wrap(function)
+
+    def time_methods(self, obj, *names):
+        """Replace methods of obj with timed wrappers (on the instance only)"""
+        for name in names:
+            setattr(obj, name, self.time_function(getattr(obj, name), f"{type(obj).__name__}.{name}"))
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self.allocations.start()
+        self.sampler.start()
+        self.running = True
+        # Reports are written however the process ends, including SIGTERM from the app
+        atexit.register(self.stop)
+        if threading.current_thread() is threading.main_thread() and \
+                signal.getsignal(signal.SIGTERM) == signal.SIG_DFL:
+            signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+        print(f"Profiling to {self.directory}")
+
+    def stop(self):
+        """Stop sampling and write the reports; safe to call more than once"""
+        if not self.running:
+            return
+        self.running = False
+        self.sampler.stop()
+        self.allocations.stop()
+        self.sampler.write(os.path.join(self.directory, 'stacks.collapsed'))
+        self.allocations.write(os.path.join(self.directory, 'allocations.txt'))
+        with open(os.path.join(self.directory, 'timers.txt'), 'w', encoding='utf-8') as f:
+            for timer in self.timers.values():
+                f.write(timer.summary() + '\n')
+        print(f"Profile written to {self.directory} ({self.sampler.samples} stack samples)")
+
+def start_profiler(name, path=None):
+    """Start profiling into path or $DRONE_PROFILE, or return None if neither is set"""
+    path = path or os.environ.get(PROFILE_ENV)
+    if not path:
+        return None
+    profiler = Profiler(os.path.join(path, f"{name}-{os.getpid()}"))
+    profiler.start()
+    return profiler
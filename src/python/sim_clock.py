@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Simulation Clocks
+RealClock follows wall time. VirtualClock keeps its own time that only moves
+when the simulation sleeps, either scaled against wall time (speedup) or
+instantly, so a mission can run many times faster than real time.
+"""
+
+import time
+import threading
+
+class RealClock:
+    def now(self):
+        """Current time in seconds"""
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        """Block for the given number of seconds"""
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait_until(self, deadline, event=None):
+        """Block until the deadline, returning early if event is set"""
+        remaining = deadline - self.now()
+        if remaining <= 0:
+            return
+        if event is not None:
+            event.wait(remaining)
+        else:
+            time.sleep(remaining)
+
+class VirtualClock:
+    def __init__(self, speedup=None, start=0.0):
+        """speedup=None runs as fast as possible, otherwise N x real time"""
+        if speedup is not None and speedup <= 0:
+            raise ValueError("speedup must be positive or None")
+        self.speedup = speedup
+        self._now = float(start)
+        self._condition = threading.Condition()
+
+    def now(self):
+        """Current virtual time in seconds"""
+        return self._now
+
+    def sleep(self, seconds):
+        """Advance virtual time; only the simulation thread should call this"""
+        if seconds <= 0:
+            return
+        if self.speedup:
+            time.sleep(seconds / self.speedup)
+        with self._condition:
+            self._now += seconds
+            self._condition.notify_all()
+
+    def wait_until(self, deadline, event=None):
+        """Block other threads until virtual time reaches the deadline"""
+        with self._condition:
+            while self._now < deadline:
+                if event is not None and event.is_set():
+                    return
+                # Short timeout so event checks and shutdown are not missed
+                self._condition.wait(0.05)
+
+def create_clock(speedup=None, fast=False):
+    """Real clock by default, virtual clock when a speedup or fast mode is requested"""
+    if fast:
+        return VirtualClock()
+    if speedup and speedup != 1:
+        return VirtualClock(speedup)
+    return RealClock()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Simulated Vehicle Kinematics
+A small time-step model of a multicopter: limited climb/descent rates,
+a cruise speed reached with finite acceleration, and optional seeded wind
+gusts. Positions are integrated in a local north/east frame around the
+starting point and converted back to latitude/longitude.
+"""
+
+import math
+import random
+
+from geo_utils import LocalProjection
+
+class KinematicModel:
+    def __init__(self, lat, lon, alt=0.0, climb_rate=2.5, descent_rate=1.5,
+                 cruise_speed=5.0, acceleration=1.0, gust=0.0, seed=None):
+        for name, value in (('climb_rate', climb_rate), ('descent_rate', descent_rate),
+                            ('cruise_speed', cruise_speed), ('acceleration', acceleration)):
+            if not value > 0:
+                raise ValueError(f"{name} must be positive, got {value}")
+        self.projection = LocalProjection(lat, lon)
+        self.north = 0.0
+        self.east = 0.0
+        self.alt = float(alt)
+        self.speed = 0.0
+        self.climb = 0.0
+        self.heading = 0.0
+        self.distance_flown = 0.0
+        self.climb_rate = climb_rate
+        self.descent_rate = descent_rate
+        self.cruise_speed = cruise_speed
+        self.acceleration = acceleration
+        self.gust = gust
+        self.random = random.Random(seed)
+
+    @property
+    def lat(self):
+        return self.projection.to_global(self.north, self.east)[0]
+
+    @property
+    def lon(self):
+        return self.projection.to_global(self.north, self.east)[1]
+
+    def to_local(self, lat, lon):
+        """Convert latitude/longitude to (north, east) meters from the origin"""
+        return self.projection.to_local(lat, lon)
+
+    def distance_to(self, lat, lon):
+        """Horizontal distance in meters to a point"""
+        north, east = self.to_local(lat, lon)
+        return math.hypot(north - self.north, east - self.east)
+
+    def step_vertical(self, target_alt, dt):
+        """Climb or descend towards target_alt for dt seconds; True once reached"""
+        error = target_alt - self.alt
+        rate = self.climb_rate if error > 0 else self.descent_rate
+        change = max(-rate * dt, min(rate * dt, error))
+        self.alt += change
+        self.climb = change / dt if dt > 0 else 0.0
+        return abs(target_alt - self.alt) < 1e-6
+
+    def step_towards(self, lat, lon, dt):
+        """Fly towards a point for dt seconds; returns the remaining distance"""
+        target_north, target_east = self.to_local(lat, lon)
+        d_north = target_north - self.north
+        d_east = target_east - self.east
+        distance = math.hypot(d_north, d_east)
+        if distance < 1e-6:
+            self.speed = 0.0
+            return 0.0
+
+        # Accelerate to cruise speed, brake in time to stop at the target
+        braking_speed = math.sqrt(2 * self.acceleration * distance)
+        desired = min(self.cruise_speed, braking_speed)
+        if desired > self.speed:
+            self.speed = min(desired, self.speed + self.acceleration * dt)
+        else:
+            self.speed = max(desired, self.speed - self.acceleration * dt)
+
+        speed = self.speed
+        if self.gust:
+            speed = max(0.0, speed + self.random.gauss(0.0, self.gust))
+
+        travel = min(distance, speed * dt)
+        self.north += d_north / distance * travel
+        self.east += d_east / distance * travel
+        self.heading = math.degrees(math.atan2(d_east, d_north)) % 360
+        self.distance_flown += travel
+        return distance - travel
@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Survey Planner
+Generates area coverage missions for a polygon from the sensor footprint
+and overlap:
+
+  lawnmower  parallel sweep lines clipped to the polygon, swept along the
+             direction that needs the fewest lines (fewest turns), entered
+             from the corner closest to the launch point. On concave
+             polygons, transits that would leave the area follow its
+             boundary instead
+  spiral     an Archimedean spiral from the polygon centroid, clipped to
+             the polygon. Clipped gaps are crossed in a straight line, so
+             on concave polygons a crossing can leave the area (a warning
+             is printed)
+
+All geometry is done with NumPy in a local metric frame, so polygons that
+produce tens of thousands of waypoints plan in milliseconds. The result is
+a waypoint_mission.Mission that any mission controller can fly, or a
+mission JSON file for the daemon and the Electron app.
+
+Polygon JSON: [[lat, lon], [lat, lon], ...] or {"polygon": [[lat, lon], ...]}
+"""
+
+import json
+import time
+import sys
+import argparse
+
+import numpy as np
+
+from geo_utils import LocalProjection
+from waypoint_mission import Mission, Waypoint
+
+PATTERNS = ('lawnmower', 'spiral')
+
+def polygon_edges(x, y):
+    """Edge start and end coordinates of a closed polygon"""
+    return x, y, np.roll(x, -1), np.roll(y, -1)
+
+def points_in_polygon(px, py, x, y):
+    """Even-odd rule containment for many points
+
+    Points are sorted by y once, so each edge only tests the contiguous run
+    of points inside its own y band.
+    """
+    order = np.argsort(py)
+    sorted_x, sorted_y = px[order], py[order]
+    inside = np.zeros(len(px), dtype=bool)
+    x1, y1, x2, y2 = polygon_edges(x, y)
+    low = np.searchsorted(sorted_y, np.minimum(y1, y2), side='left')
+    high = np.searchsorted(sorted_y, np.maximum(y1, y2), side='left')
+    for i in np.nonzero(high > low)[0]:
+        band = slice(low[i], high[i])
+        x_cross = x1[i] + (sorted_y[band] - y1[i]) * (x2[i] - x1[i]) / (y2[i] - y1[i])
+        inside[band] ^= sorted_x[band] < x_cross
+    result = np.empty(len(px), dtype=bool)
+    result[order] = inside
+    return result
+
+def convex_hull(x, y):
+    """Monotone chain convex hull; returns vertex indices counter-clockwise"""
+    order = np.lexsort((y, x))
+    def build(indices):
+        hull = []
+        for i in indices:
+            while len(hull) >= 2:
+                o, a = hull[-2], hull[-1]
+                cross = (x[a] - x[o]) * (y[i] - y[o]) - (y[a] - y[o]) * (x[i] - x[o])
+                if cross > 0:
+                    break
+                hull.pop()
+            hull.append(i)
+        return hull
+    lower = build(order)
+    upper = build(order[::-1])
+    return np.array(lower[:-1] + upper[:-1])
+
+def is_convex(x, y):
+    """True if every vertex turns the same way"""
+    dx, dy = np.roll(x, -1) - x, np.roll(y, -1) - y
+    cross = dx * np.roll(dy, -1) - dy * np.roll(dx, -1)
+    return bool(np.all(cross >= 0) or np.all(cross <= 0))
+
+def best_sweep_angle(x, y):
+    """Sweep direction (radians) that minimizes the polygon width across it
+
+    The minimum-width direction of a convex polygon is parallel to one of
+    its hull edges, so only those angles need to be tried.
+    """
+    hull = convex_hull(x, y)
+    if len(hull) < 3:
+        return 0.0
+    hx, hy = x[hull], y[hull]
+    angles = np.arctan2(np.roll(hy, -1) - hy, np.roll(hx, -1) - hx)
+    # Extent perpendicular to each candidate direction, all candidates at once
+    across = -np.sin(angles)[:, None] * hx + np.cos(angles)[:, None] * hy
+    widths = across.max(axis=1) - across.min(axis=1)
+    return float(angles[np.argmin(widths)])
+
+def rotate(x, y, angle):
+    """Rotate points by -angle so that direction angle lies along +x"""
+    c, s = np.cos(angle), np.sin(angle)
+    return c * x + s * y, -s * x + c * y
+
+def unrotate(x, y, angle):
+    """Inverse of rotate"""
+    c, s = np.cos(angle), np.sin(angle)
+    return c * x - s * y, s * x + c * y
+
+def scanline_segments(x, y, spacing):
+    """Inside segments of horizontal scanlines through a polygon
+
+    Returns (line_y, x_start, x_end, line_index, start_edge, end_edge) for
+    every segment, where edge i runs from vertex i to vertex i + 1; concave
+    polygons give several segments per line.
+    """
+    lines = np.arange(y.min() + spacing / 2, y.max(), spacing)
+    if not len(lines):
+        lines = np.array([(y.min() + y.max()) / 2])
+
+    x1, y1, x2, y2 = polygon_edges(x, y)
+    keep = y1 != y2
+    x1, y1, x2, y2 = x1[keep], y1[keep], x2[keep], y2[keep]
+    edge_ids = np.nonzero(keep)[0]
+
+    # Each edge crosses a contiguous run of lines; the half-open y range
+    # avoids counting a shared vertex twice
+    first = np.searchsorted(lines, np.minimum(y1, y2), side='left')
+    last = np.searchsorted(lines, np.maximum(y1, y2), side='left')
+    counts = last - first
+    edge = np.repeat(np.arange(len(counts)), counts)
+    hit_line = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + first[edge]
+    hit_x = x1[edge] + (lines[hit_line] - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+
+    # Sorted crossings per line pair up into inside segments
+    order = np.lexsort((hit_x, hit_line))
+    hit_line, hit_x, hit_edge = hit_line[order], hit_x[order], edge_ids[edge[order]]
+    return (lines[hit_line[0::2]], hit_x[0::2], hit_x[1::2], hit_line[0::2],
+            hit_edge[0::2], hit_edge[1::2])
+
+def densify(x_start, x_end, y, spacing):
+    """Points every spacing meters along horizontal segments, ends included"""
+    lengths = np.abs(x_end - x_start)
+    counts = np.maximum(np.ceil(lengths / spacing).astype(int), 1) + 1
+    segment = np.repeat(np.arange(len(counts)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    fraction = step / (counts[segment] - 1)
+    px = x_start[segment] + (x_end[segment] - x_start[segment]) * fraction
+    return px, y[segment]
+
+def sweep_order(line_y, x_start, x_end, line_index, start_edge, end_edge, first_reversed=False):
+    """Order segments so the sweep direction alternates line by line
+
+    Returns (line_y, x_from, x_to, edge_from, edge_to) in flying order.
+    """
+    reverse = (line_index % 2 == 1) != first_reversed
+    order = np.lexsort((np.where(reverse, -x_start, x_start), line_index))
+    line_y, x_start, x_end, reverse = line_y[order], x_start[order], x_end[order], reverse[order]
+    start_edge, end_edge = start_edge[order], end_edge[order]
+    return (line_y, np.where(reverse, x_end, x_start), np.where(reverse, x_start, x_end),
+            np.where(reverse, end_edge, start_edge), np.where(reverse, start_edge, end_edge))
+
+def legs_outside(ax, ay, bx, by, a_edge, b_edge, x, y):
+    """Which straight legs between boundary points leave the polygon
+
+    A leg leaves if it properly crosses an edge other than the ones its ends
+    lie on, or if its midpoint is outside (a leg across a notch touches the
+    boundary only at its ends).
+    """
+    outside = ~points_in_polygon((ax + bx) / 2, (ay + by) / 2, x, y)
+    x1, y1, x2, y2 = polygon_edges(x, y)
+    for i in range(len(x)):
+        side_a = (bx - ax) * (y1[i] - ay) - (by - ay) * (x1[i] - ax)
+        side_b = (bx - ax) * (y2[i] - ay) - (by - ay) * (x2[i] - ax)
+        side_p = (x2[i] - x1[i]) * (ay - y1[i]) - (y2[i] - y1[i]) * (ax - x1[i])
+        side_q = (x2[i] - x1[i]) * (by - y1[i]) - (y2[i] - y1[i]) * (bx - x1[i])
+        crosses = (side_a * side_b < 0) & (side_p * side_q < 0)
+        outside |= crosses & (a_edge != i) & (b_edge != i)
+    return outside
+
+def boundary_path(x, y, ax, ay, a_edge, bx, by, b_edge):
+    """Vertices along the shorter way round the boundary between two boundary points"""
+    n = len(x)
+    forward = np.arange(a_edge + 1, a_edge + 1 + (b_edge - a_edge) % n) % n
+    backward = np.arange(a_edge, a_edge - (a_edge - b_edge) % n, -1) % n
+    def length(indices):
+        px = np.concatenate(([ax], x[indices], [bx]))
+        py = np.concatenate(([ay], y[indices], [by]))
+        return np.hypot(np.diff(px), np.diff(py)).sum()
+    indices = min((forward, backward), key=length)
+    return x[indices], y[indices]
+
+def lawnmower_path(x, y, spacing, point_spacing=None, start=None, angle=None):
+    """Boustrophedon coverage path in local coordinates"""
+    if angle is None:
+        angle = best_sweep_angle(x, y)
+    rx, ry = rotate(x, y, angle)
+    segments = scanline_segments(rx, ry, spacing)
+    if not len(segments[0]):
+        return np.empty(0), np.empty(0), angle
+
+    # Any of the four corners can be the entry point: the first pass may
+    # run either way and the whole path may be flown backwards
+    if start is not None:
+        sx, sy = rotate(np.array([start[0]]), np.array([start[1]]), angle)
+        options = []
+        for first_reversed in (False, True):
+            line_y, x_from, x_to, _, _ = sweep_order(*segments, first_reversed)
+            options.append((np.hypot(x_from[0] - sx[0], line_y[0] - sy[0]), first_reversed, False))
+            options.append((np.hypot(x_to[-1] - sx[0], line_y[-1] - sy[0]), first_reversed, True))
+        _, first_reversed, backwards = min(options)
+    else:
+        first_reversed, backwards = False, False
+
+    line_y, x_from, x_to, edge_from, edge_to = sweep_order(*segments, first_reversed)
+    if point_spacing:
+        px, py = densify(x_from, x_to, line_y, point_spacing)
+        counts = np.maximum(np.ceil(np.abs(x_to - x_from) / point_spacing).astype(int), 1) + 1
+        segment_ends = np.cumsum(counts)
+    else:
+        px = np.column_stack((x_from, x_to)).ravel()
+        py = np.repeat(line_y, 2)
+        segment_ends = np.arange(2, 2 * len(line_y) + 1, 2)
+
+    # Transits between segments that would leave a concave area follow its boundary
+    outside = legs_outside(x_to[:-1], line_y[:-1], x_from[1:], line_y[1:],
+                           edge_to[:-1], edge_from[1:], rx, ry)
+    if outside.any():
+        pieces_x, pieces_y, begin = [], [], 0
+        for leg in np.nonzero(outside)[0]:
+            end = segment_ends[leg]
+            tx, ty = boundary_path(rx, ry, x_to[leg], line_y[leg], edge_to[leg],
+                                   x_from[leg + 1], line_y[leg + 1], edge_from[leg + 1])
+            pieces_x += [px[begin:end], tx]
+            pieces_y += [py[begin:end], ty]
+            begin = end
+        px = np.concatenate(pieces_x + [px[begin:]])
+        py = np.concatenate(pieces_y + [py[begin:]])
+    if backwards:
+        px, py = px[::-1], py[::-1]
+
+    gx, gy = unrotate(px, py, angle)
+    return gx, gy, angle
+
+def spiral_path(x, y, spacing, point_spacing=None):
+    """Outward Archimedean spiral from the centroid, clipped to the polygon"""
+    point_spacing = point_spacing or spacing / 2
+    cx, cy = x.mean(), y.mean()
+    max_radius = np.hypot(x - cx, y - cy).max()
+
+    # r = b * theta with one spacing per turn; arc length s ~ b * theta^2 / 2
+    b = spacing / (2 * np.pi)
+    theta_max = max_radius / b
+    total_length = b * theta_max ** 2 / 2
+    s = np.arange(0.0, total_length + point_spacing, point_spacing)
+    theta = np.sqrt(2 * s / b)
+    px = cx + b * theta * np.cos(theta)
+    py = cy + b * theta * np.sin(theta)
+
+    inside = points_in_polygon(px, py, x, y)
+    return px[inside], py[inside]
+
+def plan_survey(polygon, footprint_width, overlap=0.2, altitude=30.0, speed=None,
+                pattern='lawnmower', point_spacing=None, start=None, angle=None,
+                arrival_radius=2.0):
+    """Plan a coverage mission over a polygon of (lat, lon) vertices
+
+    footprint_width is the sensor ground footprint across track in meters;
+    adjacent passes overlap by the given fraction. start is an optional
+    (lat, lon) launch point used to choose the entry corner. angle fixes
+    the lawnmower sweep direction in degrees from north.
+    """
+    if pattern not in PATTERNS:
+        raise ValueError(f"Unknown pattern {pattern}; use one of {', '.join(PATTERNS)}")
+    if not footprint_width > 0:
+        raise ValueError("Footprint width must be positive")
+    if not 0 <= overlap < 1:
+        raise ValueError("Overlap must be in [0, 1)")
+    polygon = np.asarray(polygon, dtype=float)
+    if polygon.ndim != 2 or polygon.shape[0] < 3 or polygon.shape[1] != 2:
+        raise ValueError("Polygon needs at least three (lat, lon) vertices")
+    if np.allclose(polygon[0], polygon[-1]):
+        polygon = polygon[:-1]
+
+    spacing = footprint_width * (1 - overlap)
+    projection = LocalProjection(polygon[:, 0].mean(), polygon[:, 1].mean())
+    # Plan in an (east, north) frame so angles are ordinary math angles
+    north, east = projection.to_local(polygon[:, 0], polygon[:, 1])
+
+    if pattern == 'lawnmower':
+        local_start = None
+        if start is not None:
+            start_north, start_east = projection.to_local(start[0], start[1])
+            local_start = (start_east, start_north)
+        sweep = None if angle is None else np.radians(90.0 - angle)
+        px, py, _ = lawnmower_path(east, north, spacing, point_spacing, local_start, sweep)
+    else:
+        if not is_convex(east, north):
+            print("Warning: spiral crossings of a concave polygon can leave the survey area; "
+                  "use the lawnmower pattern to stay inside")
+        px, py = spiral_path(east, north, spacing, point_spacing)
+
+    if not len(px):
+        raise ValueError("Polygon is too small for the requested footprint")
+
+    lats, lons = projection.to_global(py, px)
+    waypoints = [Waypoint(lat, lon, altitude, speed) for lat, lon in zip(lats.tolist(), lons.tolist())]
+    return Mission(waypoints, speed or 5.0, arrival_radius)
+
+def load_polygon(path):
+    """Read a polygon JSON file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data['polygon']
+    return [(float(lat), float(lon)) for lat, lon in data]
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Survey coverage mission planner')
+    parser.add_argument('polygon', help='Polygon JSON file of [lat, lon] vertices')
+    parser.add_argument('--footprint', type=float, required=True,
+                        help='Sensor footprint width across track in meters')
+    parser.add_argument('--overlap', type=float, default=0.2, help='Side overlap fraction (0-1)')
+    parser.add_argument('--altitude', type=float, default=30.0, help='Survey altitude in meters')
+    parser.add_argument('--speed', type=float, default=None, help='Survey speed in m/s')
+    parser.add_argument('--pattern', choices=PATTERNS, default='lawnmower', help='Coverage pattern')
+    parser.add_argument('--point-spacing', type=float, default=None,
+                        help='Add a waypoint every N meters along each pass (e.g. camera triggers)')
+    parser.add_argument('--angle', type=float, default=None,
+                        help='Fixed sweep direction in degrees from north (default: fewest turns)')
+    parser.add_argument('--start', type=float, nargs=2, default=None, metavar=('LAT', 'LON'),
+                        help='Launch point used to pick the entry corner')
+    parser.add_argument('--output', default=None, help='Write the mission JSON here')
+    args = parser.parse_args()
+
+    try:
+        polygon = load_polygon(args.polygon)
+        start_time = time.perf_counter()
+        mission = plan_survey(polygon, args.footprint, args.overlap, args.altitude, args.speed,
+                              args.pattern, args.point_spacing, args.start, args.angle)
+        elapsed = time.perf_counter() - start_time
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Pattern: {args.pattern}")
+    print(f"Waypoints: {len(mission)}")
+    print(f"Route length: {mission.total_distance:.0f}m")
+    print(f"Planned in {elapsed * 1000:.1f} ms")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(mission.to_dict(), f)
+        print(f"Mission written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Swarm Simulator
+Steps many simulated vehicles at once with NumPy state arrays and streams
+real MAVLink 2 frames (HEARTBEAT, SYS_STATUS, GLOBAL_POSITION_INT, VFR_HUD)
+over UDP, with per-vehicle sysids, sequence numbers and message rates.
+Used to load-test the MAVLink parser and the ground station with 50-200
+vehicles on one machine.
+"""
+
+import socket
+import time
+import sys
+import argparse
+
+import numpy as np
+
+from mavlink_frames import HEARTBEAT, SYS_STATUS, GLOBAL_POSITION_INT, VFR_HUD, encode_frames
+from geo_utils import METERS_PER_DEG_LAT
+
+# Per-vehicle message rates in Hz, close to ArduPilot's default stream rates
+MESSAGE_RATES = {
+    HEARTBEAT: 1.0,
+    SYS_STATUS: 2.0,
+    GLOBAL_POSITION_INT: 5.0,
+    VFR_HUD: 4.0,
+}
+
+# ArduCopter quadrotor in GUIDED, armed
+MAV_TYPE_QUADROTOR = 2
+MAV_AUTOPILOT_ARDUPILOTMEGA = 3
+MAV_STATE_ACTIVE = 4
+COPTER_MODE_GUIDED = 4
+BASE_MODE_ARMED_GUIDED = 0x80 | 0x10 | 0x08 | 0x01
+
+class SwarmSimulator:
+    def __init__(self, count, host='127.0.0.1', port=14550, center_lat=34.0000,
+                 center_lon=74.7000, home_alt=1600.0, seed=None, first_sysid=1):
+        if count < 1 or first_sysid + count - 1 > 255:
+            raise ValueError("Vehicle count must fit in sysids 1-255")
+
+        self.count = count
+        self.target = (host, port)
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.meters_per_deg_lon = METERS_PER_DEG_LAT * np.cos(np.radians(center_lat))
+        self.home_alt = home_alt
+        self.socket = None
+        self.is_running = False
+        self.sim_time = 0.0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+        rng = np.random.default_rng(seed)
+        self.sysid = np.arange(first_sysid, first_sysid + count, dtype=np.uint8)
+        self.seq = np.zeros(count, dtype=np.uint8)
+
+        # Each vehicle orbits its own center at its own radius and speed
+        self.orbit_north = rng.uniform(-2000, 2000, count)
+        self.orbit_east = rng.uniform(-2000, 2000, count)
+        self.orbit_radius = rng.uniform(50, 400, count)
+        self.orbit_speed = rng.uniform(3, 15, count) * rng.choice([-1, 1], count)
+        self.orbit_phase = rng.uniform(0, 2 * np.pi, count)
+        self.cruise_alt = rng.uniform(20, 120, count)
+        self.alt_wobble = rng.uniform(0.5, 3.0, count)
+
+        self.north = np.zeros(count)
+        self.east = np.zeros(count)
+        self.alt = np.zeros(count)
+        self.v_north = np.zeros(count)
+        self.v_east = np.zeros(count)
+        self.climb = np.zeros(count)
+        self.heading = np.zeros(count)
+        self.voltage = rng.uniform(16.4, 16.8, count)
+        self.drain_rate = rng.uniform(0.0015, 0.004, count)  # V/s
+        self.current = rng.uniform(15, 30, count)
+
+        # Stagger message schedules so vehicles do not all send together
+        self.next_due = {spec: rng.uniform(0, 1.0 / rate, count)
+                         for spec, rate in MESSAGE_RATES.items()}
+
+        self.step(0.0)
+
+    def setup_socket(self):
+        """Create the UDP socket used to stream frames"""
+        try:
+            self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            print(f"Streaming {self.count} vehicles to {self.target[0]}:{self.target[1]}")
+            return True
+        except Exception as e:
+            print(f"Error setting up UDP socket: {e}")
+            return False
+
+    def step(self, dt):
+        """Advance every vehicle by dt seconds"""
+        self.sim_time += dt
+        angular = self.orbit_speed / self.orbit_radius
+        self.orbit_phase += angular * dt
+
+        cos_phase = np.cos(self.orbit_phase)
+        sin_phase = np.sin(self.orbit_phase)
+        self.north = self.orbit_north + self.orbit_radius * cos_phase
+        self.east = self.orbit_east + self.orbit_radius * sin_phase
+        self.v_north = -self.orbit_speed * sin_phase
+        self.v_east = self.orbit_speed * cos_phase
+
+        wobble = 0.2 * self.sim_time + self.orbit_phase
+        new_alt = self.cruise_alt + self.alt_wobble * np.sin(wobble)
+        self.climb = (new_alt - self.alt) / dt if dt > 0 else np.zeros(self.count)
+        self.alt = new_alt
+
+        self.heading = np.degrees(np.arctan2(self.v_east, self.v_north)) % 360
+        self.voltage = np.maximum(self.voltage - self.drain_rate * dt, 13.2)
+
+    def next_seq(self, index):
+        """Take the next sequence number for the given vehicles"""
+        seq = self.seq[index].copy()
+        self.seq[index] += 1  # uint8 wraps at 256 like MAVLink
+        return seq
+
+    def build_payloads(self, spec, index):
+        """Fill payloads of one message type for the selected vehicles"""
+        payloads = spec.empty(len(index))
+        groundspeed = np.hypot(self.v_north[index], self.v_east[index])
+
+        if spec is HEARTBEAT:
+            payloads['custom_mode'] = COPTER_MODE_GUIDED
+            payloads['type'] = MAV_TYPE_QUADROTOR
+            payloads['autopilot'] = MAV_AUTOPILOT_ARDUPILOTMEGA
+            payloads['base_mode'] = BASE_MODE_ARMED_GUIDED
+            payloads['system_status'] = MAV_STATE_ACTIVE
+            payloads['mavlink_version'] = 3
+
+        elif spec is GLOBAL_POSITION_INT:
+            lat = self.center_lat + self.north[index] / METERS_PER_DEG_LAT
+            lon = self.center_lon + self.east[index] / self.meters_per_deg_lon
+            payloads['time_boot_ms'] = int(self.sim_time * 1000)
+            payloads['lat'] = np.round(lat * 1e7)
+            payloads['lon'] = np.round(lon * 1e7)
+            payloads['alt'] = np.round((self.home_alt + self.alt[index]) * 1000)
+            payloads['relative_alt'] = np.round(self.alt[index] * 1000)
+            payloads['vx'] = np.round(self.v_north[index] * 100)
+            payloads['vy'] = np.round(self.v_east[index] * 100)
+            payloads['vz'] = np.round(-self.climb[index] * 100)
+            payloads['hdg'] = np.round(self.heading[index] * 100) % 36000
+
+        elif spec is VFR_HUD:
+            payloads['airspeed'] = groundspeed
+            payloads['groundspeed'] = groundspeed
+            payloads['alt'] = self.home_alt + self.alt[index]
+            payloads['climb'] = self.climb[index]
+            payloads['heading'] = np.round(self.heading[index]) % 360
+            payloads['throttle'] = 45
+
+        elif spec is SYS_STATUS:
+            full, empty = 16.8, 13.2
+            remaining = np.clip((self.voltage[index] - empty) / (full - empty) * 100, 0, 100)
+            payloads['onboard_control_sensors_present'] = 0x0350FC2F
+            payloads['onboard_control_sensors_enabled'] = 0x0350FC2F
+            payloads['onboard_control_sensors_health'] = 0x0350FC2F
+            payloads['load'] = 250
+            payloads['voltage_battery'] = np.round(self.voltage[index] * 1000)
+            payloads['current_battery'] = np.round(self.current[index] * 100)
+            payloads['battery_remaining'] = np.round(remaining)
+
+        return payloads
+
+    def due_frames(self):
+        """Encode every frame that is due at the current simulation time"""
+        batches = []
+        for spec, rate in MESSAGE_RATES.items():
+            due = self.next_due[spec]
+            index = np.nonzero(due <= self.sim_time)[0]
+            if not len(index):
+                continue
+            due[index] += 1.0 / rate
+            payloads = self.build_payloads(spec, index)
+            batches.append(encode_frames(spec, payloads, self.next_seq(index), self.sysid[index]))
+        return batches
+
+    def send_frames(self, batches):
+        """Send each frame as its own datagram"""
+        for frames in batches:
+            for frame in frames:
+                data = frame.tobytes()
+                self.socket.sendto(data, self.target)
+                self.frames_sent += 1
+                self.bytes_sent += len(data)
+
+    def run(self, duration=None, tick_rate=50.0):
+        """Stream the swarm in real time until stopped or duration elapses"""
+        if not self.setup_socket():
+            return False
+
+        self.is_running = True
+        dt = 1.0 / tick_rate
+        start_time = time.monotonic()
+        next_tick = start_time
+        last_report = start_time
+        last_frames = 0
+        busy_time = 0.0
+
+        try:
+            while self.is_running:
+                now = time.monotonic()
+                if duration and now - start_time >= duration:
+                    break
+
+                tick_start = time.perf_counter()
+                self.step(dt)
+                self.send_frames(self.due_frames())
+                busy_time += time.perf_counter() - tick_start
+
+                if now - last_report >= 5:
+                    elapsed = now - last_report
+                    print(f"Vehicles: {self.count} | "
+                          f"Frames/s: {(self.frames_sent - last_frames) / elapsed:.0f} | "
+                          f"Load: {busy_time / elapsed * 100:.1f}% | "
+                          f"Total frames: {self.frames_sent}")
+                    last_report = now
+                    last_frames = self.frames_sent
+                    busy_time = 0.0
+
+                next_tick += dt
+                delay = next_tick - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    # Falling behind; do not try to catch up with a burst
+                    next_tick = time.monotonic()
+        except KeyboardInterrupt:
+            print("\nStopping swarm simulator...")
+        finally:
+            self.stop()
+
+        return True
+
+    def stop(self):
+        """Stop streaming and close the socket"""
+        self.is_running = False
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+        print(f"Total frames sent: {self.frames_sent} ({self.bytes_sent} bytes)")
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Multi-vehicle MAVLink swarm simulator')
+    parser.add_argument('--vehicles', type=int, default=50, help='Number of vehicles (1-255)')
+    parser.add_argument('--host', default='127.0.0.1', help='Destination host')
+    parser.add_argument('--port', type=int, default=14550, help='Destination UDP port')
+    parser.add_argument('--duration', type=float, default=None, help='Stop after N seconds')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for the swarm layout')
+    parser.add_argument('--center', type=float, nargs=2, default=(34.0000, 74.7000),
+                        metavar=('LAT', 'LON'), help='Center of the swarm area')
+    args = parser.parse_args()
+
+    print("=== MAVLink Swarm Simulator ===")
+    try:
+        simulator = SwarmSimulator(args.vehicles, args.host, args.port,
+                                   args.center[0], args.center[1], seed=args.seed)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    if not simulator.run(args.duration):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+WebSocket Telemetry Gateway
+Serves the parser's telemetry to any number of viewers on the LAN (safety
+officer, payload operator) over WebSocket, alongside the Electron app.
+
+Viewers choose what they get, either in the URL or with a text message
+after connecting:
+  ws://HOST:PORT/?topics=status,derived&rate=5
+  {"topics": ["status", "geofence_events"], "rate": 2}
+Topics: status, derived, links, timesync, position_age_ms, geofence_events
+(all by default). The rate is capped to the nearest rate tier at or below
+the request.
+
+The parser thread only stores a reference to the newest telemetry, so
+viewers add nothing to its receive path. The gateway thread wakes once per
+tier interval. If the state changed, it serializes each distinct topic set
+of that tier once and queues the same frame bytes to every client that
+asked for it. Each connection has a bounded send buffer. A client that
+cannot keep up loses its oldest queued updates, which later state replaces
+anyway, and is disconnected once it accepts nothing at all for a while; it
+never delays the others.
+
+Only the server side of RFC 6455 needed for this is implemented (text
+frames, ping/pong, close), so no extra dependency is required.
+"""
+
+import time
+import json
+import base64
+import socket
+import binascii
+import hashlib
+import selectors
+import threading
+from collections import deque
+from urllib.parse import urlsplit, parse_qs
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+RATE_TIERS = (1, 2, 5, 10, 20)     # Hz
+DEFAULT_RATE = 5
+TOPICS = ('status', 'derived', 'links', 'timesync', 'position_age_ms', 'geofence_events')
+TELEMETRY_KEYS = {'status': 'drone_status'}  # Topic -> telemetry key, where they differ
+MAX_CLIENT_BUFFER = 256 * 1024     # Bytes queued per client before old updates are dropped
+MAX_STALL_TIME = 10.0              # Seconds a client may accept nothing while data is queued
+MAX_REQUEST = 8192                 # Bytes of HTTP upgrade request accepted
+MAX_CLIENT_MESSAGE = 4096          # Bytes of a client text message accepted
+EVENT_HISTORY = 100                # Geofence events kept for the next tier tick
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+def encode_frame(payload, opcode=OP_TEXT):
+    """Unmasked server frame"""
+    length = len(payload)
+    if length < 126:
+        header = bytes((0x80 | opcode, length))
+    elif length < 1 << 16:
+        header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+    else:
+        header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+    return header + payload
+
+def tier_for(rate):
+    """Highest rate tier not above the requested rate"""
+    eligible = [tier for tier in RATE_TIERS if tier <= rate]
+    return eligible[-1] if eligible else RATE_TIERS[0]
+
+def parse_topics(value):
+    if isinstance(value, str):
+        value = value.split(',')
+    topics = frozenset(topic.strip() for topic in value if topic.strip() in TOPICS)
+    return topics or frozenset(TOPICS)
+
+class Client:
+    def __init__(self, sock, address):
+        self.socket = sock
+        self.address = address
+        self.handshake_done = False
+        self.inbuf = bytearray()
+        self.outbuf = deque()
+        self.queued = 0
+        self.offset = 0          # Bytes of outbuf[0] already sent
+        self.topics = frozenset(TOPICS)
+        self.tier = DEFAULT_RATE
+        self.fresh = True        # Needs the current state even if it has not changed
+        self.last_progress = time.monotonic()  # Last time the socket accepted bytes
+        self.sent = 0
+        self.dropped = 0
+        self.closing = False
+
+    def queue(self, frame, droppable=True):
+        """Queue frame bytes; old state updates make room when the buffer is full"""
+        while droppable and self.queued + len(frame) > MAX_CLIENT_BUFFER and len(self.outbuf) > 1:
+            # Keep the partly sent head; drop the oldest whole update after it
+            old = self.outbuf[1]
+            del self.outbuf[1]
+            self.queued -= len(old)
+            self.dropped += 1
+        self.outbuf.append(frame)
+        self.queued += len(frame)
+
+    def subscribe(self, topics=None, rate=None):
+        if topics is not None:
+            self.topics = parse_topics(topics)
+        if rate is not None:
+            self.tier = tier_for(float(rate))
+        self.fresh = True
+
+class TelemetryGateway:
+    def __init__(self, host='0.0.0.0', port=8765):
+        self.host = host
+        self.port = port
+        self.selector = selectors.DefaultSelector()
+        self.server_socket = None
+        self.clients = {}
+        self.state = {}
+        self.version = 0
+        self.events = deque(maxlen=EVENT_HISTORY)
+        self.event_seq = 0
+        self.tier_version = {tier: 0 for tier in RATE_TIERS}
+        self.tier_event_seq = {tier: 0 for tier in RATE_TIERS}
+        self.next_tick = {}
+        self.thread = None
+        self.is_running = False
+        self.frames_encoded = 0
+        self.closed_sent = 0     # Totals of clients that have disconnected
+        self.closed_dropped = 0
+
+    # Parser thread side
+
+    def publish(self, telemetry):
+        """Make telemetry the current state; called for every message, so it only stores references"""
+        state = self.state
+        for topic in TOPICS:
+            value = telemetry.get(TELEMETRY_KEYS.get(topic, topic))
+            if value is None:
+                continue
+            if topic == 'geofence_events':
+                for event in value:
+                    self.event_seq += 1
+                    self.events.append((self.event_seq, event))
+            else:
+                state[topic] = value
+        self.version += 1
+
+    # Gateway thread side
+
+    def start(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(16)
+        self.server_socket.setblocking(False)
+        self.selector.register(self.server_socket, selectors.EVENT_READ, None)
+        now = time.monotonic()
+        self.next_tick = {tier: now for tier in RATE_TIERS}
+        self.is_running = True
+        self.thread = threading.Thread(target=self.run, name='telemetry-gateway', daemon=True)
+        self.thread.start()
+        print(f"Telemetry gateway on ws://{self.host}:{self.port}/")
+
+    def stop(self):
+        self.is_running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        for client in list(self.clients.values()):
+            self.close_client(client)
+        if self.server_socket:
+            self.selector.unregister(self.server_socket)
+            self.server_socket.close()
+            self.server_socket = None
+        self.selector.close()
+
+    def run(self):
+        while self.is_running:
+            timeout = max(0.0, min(self.next_tick.values()) - time.monotonic())
+            for key, events in self.selector.select(min(timeout, 0.5)):
+                if key.data is None:
+                    self.accept()
+                    continue
+                client = key.data
+                try:
+                    if events & selectors.EVENT_READ:
+                        self.read(client)
+                    if events & selectors.EVENT_WRITE and client.socket.fileno() != -1:
+                        self.flush(client)
+                except Exception as e:
+                    # Whatever a peer sends, only its own connection is lost
+                    print(f"Gateway: closing client {client.address[0]}:{client.address[1]}: {e}")
+                    self.close_client(client)
+            now = time.monotonic()
+            for tier, due in self.next_tick.items():
+                if now >= due:
+                    self.tick(tier, now)
+                    self.next_tick[tier] = max(due + 1.0 / tier, now)
+
+    def accept(self):
+        try:
+            sock, address = self.server_socket.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        client = Client(sock, address)
+        self.clients[sock] = client
+        self.selector.register(sock, selectors.EVENT_READ, client)
+
+    def close_client(self, client):
+        if client.socket in self.clients:
+            del self.clients[client.socket]
+            self.closed_sent += client.sent
+            self.closed_dropped += client.dropped
+            try:
+                self.selector.unregister(client.socket)
+            except (KeyError, ValueError):
+                pass
+        client.socket.close()
+
+    def read(self, client):
+        try:
+            data = client.socket.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.close_client(client)
+            return
+        if client.closing:
+            return  # Anything after a rejected request or a close frame is ignored
+        client.inbuf += data
+        if not client.handshake_done:
+            self.handshake(client)
+        if client.handshake_done:
+            self.read_frames(client)
+
+    def handshake(self, client):
+        end = client.inbuf.find(b'\r\n\r\n')
+        if end == -1:
+            if len(client.inbuf) > MAX_REQUEST:
+                self.close_client(client)
+            return
+        request = bytes(client.inbuf[:end]).decode('latin-1')
+        del client.inbuf[:end + 4]
+        lines = request.split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            self.reject(client, '426 Upgrade Required')
+            return
+        try:
+            valid_key = len(base64.b64decode(key, validate=True)) == 16
+        except (binascii.Error, ValueError):
+            valid_key = False
+        if not valid_key:
+            self.reject(client, '400 Bad Request')
+            return
+
+        parts = lines[0].split(' ')
+        query = parse_qs(urlsplit(parts[1] if len(parts) > 1 else '/').query)
+        try:
+            client.subscribe(query['topics'][0] if 'topics' in query else None,
+                             query['rate'][0] if 'rate' in query else None)
+        except ValueError:
+            pass
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('ascii')).digest()).decode('ascii')
+        client.queue((
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n').encode('ascii'), droppable=False)
+        client.handshake_done = True
+        self.flush(client)
+
+    def reject(self, client, status):
+        """Answer a request that is not a valid WebSocket upgrade, then close"""
+        client.queue(f'HTTP/1.1 {status}\r\nContent-Length: 0\r\n\r\n'.encode('ascii'), droppable=False)
+        client.closing = True
+        self.flush(client)
+
+    def read_frames(self, client):
+        buf = client.inbuf
+        while len(buf) >= 2:
+            opcode = buf[0] & 0x0F
+            masked = buf[1] & 0x80
+            length = buf[1] & 0x7F
+            pos = 2
+            if length == 126:
+                if len(buf) < 4:
+                    return
+                length = int.from_bytes(buf[2:4], 'big')
+                pos = 4
+            elif length == 127:
+                if len(buf) < 10:
+                    return
+                length = int.from_bytes(buf[2:10], 'big')
+                pos = 10
+            if not masked or length > MAX_CLIENT_MESSAGE:
+                # Clients must mask; viewers have no reason to send large messages
+                self.close_client(client)
+                return
+            if len(buf) < pos + 4 + length:
+                return
+            mask = buf[pos:pos + 4]
+            payload = bytes(b ^ mask[i & 3] for i, b in enumerate(buf[pos + 4:pos + 4 + length]))
+            del buf[:pos + 4 + length]
+
+            if opcode == OP_TEXT:
+                try:
+                    request = json.loads(payload)
+                    client.subscribe(request.get('topics'), request.get('rate'))
+                except (ValueError, AttributeError, TypeError):
+                    pass
+            elif opcode == OP_PING:
+                client.queue(encode_frame(payload, OP_PONG), droppable=False)
+                self.flush(client)
+            elif opcode == OP_CLOSE:
+                client.queue(encode_frame(payload[:2], OP_CLOSE), droppable=False)
+                client.closing = True
+                self.flush(client)
+                return
+
+    def flush(self, client):
+        """Send as much of the client's queue as the socket takes without blocking"""
+        sock = client.socket
+        while client.outbuf:
+            head = client.outbuf[0]
+            try:
+                sent = sock.send(memoryview(head)[client.offset:])
+            except BlockingIOError:
+                break
+            except OSError:
+                self.close_client(client)
+                return
+            client.offset += sent
+            if sent:
+                client.last_progress = time.monotonic()
+            if client.offset < len(head):
+                break
+            client.outbuf.popleft()
+            client.queued -= len(head)
+            client.offset = 0
+            client.sent += 1
+
+        if client.closing and not client.outbuf:
+            self.close_client(client)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if client.outbuf else 0)
+        try:
+            self.selector.modify(sock, events, client)
+        except (KeyError, ValueError):
+            pass
+
+    def tick(self, tier, now):
+        """Send the tier's clients the current state, serialized once per topic set"""
+        clients = [c for c in self.clients.values() if c.handshake_done and not c.closing and c.tier == tier]
+        if not clients:
+            return
+        changed = self.tier_version[tier] != self.version
+        # list() copies in one step; the parser thread appends concurrently
+        pending = [(seq, event) for seq, event in list(self.events) if seq > self.tier_event_seq[tier]]
+        events = [event for _, event in pending]
+        if not changed and not events and not any(c.fresh for c in clients):
+            return
+        self.tier_version[tier] = self.version
+        if pending:
+            self.tier_event_seq[tier] = pending[-1][0]
+
+        state = dict(self.state)
+        frames = {}
+        for client in clients:
+            if not (changed or client.fresh or (events and 'geofence_events' in client.topics)):
+                continue
+            frame = frames.get(client.topics)
+            if frame is None:
+                message = {'timestamp': time.time()}
+                for topic in client.topics:
+                    if topic == 'geofence_events':
+                        if events:
+                            message[topic] = events
+                    elif topic in state:
+                        message[topic] = state[topic]
+                frame = frames[client.topics] = encode_frame(
+                    json.dumps(message, separators=(',', ':')).encode('utf-8'))
+                self.frames_encoded += 1
+            client.fresh = False
+            if not client.outbuf:
+                client.last_progress = now
+            client.queue(frame)
+            self.flush(client)
+            if client.outbuf and client.socket.fileno() != -1 and now - client.last_progress > MAX_STALL_TIME:
+                print(f"Gateway: dropping stalled client {client.address[0]}:{client.address[1]}")
+                self.close_client(client)
+
+    def stats(self):
+        clients = list(self.clients.values())
+        return {
+            'clients': len(clients),
+            'frames_encoded': self.frames_encoded,
+            'frames_sent': self.closed_sent + sum(c.sent for c in clients),
+            'frames_dropped': self.closed_dropped + sum(c.dropped for c in clients),
+            'tiers': {tier: sum(1 for c in clients if c.tier == tier) for tier in RATE_TIERS},
+        }
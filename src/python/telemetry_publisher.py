@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Telemetry Publisher
+Double-buffered telemetry snapshot shared between the thread that updates
+vehicle state and the thread that sends it to the Electron app.
+
+The producer writes into the back buffer and then swaps it to the front in
+a single reference assignment. A published front buffer is never written
+again (the next back buffer is a fresh copy), so the sender can serialize
+it without locks and without seeing half-applied updates.
+
+Snapshots are sent at a configurable rate, and straight away when a field
+changes meaningfully (mode, armed state, mission phase, or a numeric field
+moving past its threshold).
+"""
+
+import time
+import threading
+
+from sim_clock import RealClock
+
+# Fields whose every change is sent immediately
+IMMEDIATE_FIELDS = ('mode', 'armed', 'status', 'connected', 'geofence')
+
+# Numeric fields sent immediately once they move this far from the last send
+DEFAULT_THRESHOLDS = {
+    'altitude': 1.0,
+    'alt': 1.0,
+    'groundspeed': 1.0,
+    'heading': 10.0,
+}
+
+class TelemetryPublisher:
+    def __init__(self, send, rate=1.0, initial=None, clock=None,
+                 immediate_fields=IMMEDIATE_FIELDS, thresholds=None, min_interval=0.02):
+        if not rate > 0:
+            raise ValueError(f"Telemetry rate must be positive, got {rate}")
+        self.send = send
+        self.period = 1.0 / rate
+        self.clock = clock or RealClock()
+        self.immediate_fields = immediate_fields
+        self.thresholds = DEFAULT_THRESHOLDS if thresholds is None else thresholds
+        self.min_interval = min_interval
+        self._front = dict(initial or {})
+        self._back = dict(self._front)
+        self._last_sent = {}
+        self._producer_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.sent_count = 0
+
+    def snapshot(self):
+        """Latest published state; treat it as read-only"""
+        return self._front
+
+    def get(self, field, default=None):
+        """Read one field from the latest published state"""
+        return self._front.get(field, default)
+
+    def update(self, fields=None, **kwargs):
+        """Apply field updates to the back buffer and publish it"""
+        if fields:
+            kwargs.update(fields)
+        with self._producer_lock:
+            back = self._back
+            back.update(kwargs)
+            # Swap: readers see either the old or the new snapshot, never a mix
+            self._front = back
+            self._back = dict(back)
+
+        if self.is_significant(kwargs):
+            self._wake.set()
+
+    def is_significant(self, fields):
+        """Whether an update should be sent without waiting for the next tick"""
+        last_sent = self._last_sent
+        for field, value in fields.items():
+            if field in self.immediate_fields:
+                if last_sent.get(field) != value:
+                    return True
+            elif field in self.thresholds:
+                previous = last_sent.get(field)
+                try:
+                    if previous is None or abs(value - previous) >= self.thresholds[field]:
+                        return True
+                except TypeError:
+                    continue
+        return False
+
+    def publish_now(self):
+        """Send the current snapshot"""
+        snapshot = self._front
+        self._last_sent = snapshot
+        message = dict(snapshot)
+        message['timestamp'] = time.time()
+        self.send(message)
+        self.sent_count += 1
+
+    def run(self):
+        """Sender loop: periodic sends plus immediate sends on significant changes"""
+        last_send = None
+        while not self._stop.is_set():
+            if last_send is not None:
+                self.clock.wait_until(last_send + self.period, self._wake)
+                if self._stop.is_set():
+                    break
+                if self._wake.is_set():
+                    # Coalesce bursts of significant changes
+                    self.clock.wait_until(last_send + self.min_interval, self._stop)
+            self._wake.clear()
+            try:
+                self.publish_now()
+            except Exception as e:
+                print(f"Telemetry error: {e}")
+            last_send = self.clock.now()
+
+    def start(self):
+        """Run the sender loop on a daemon thread"""
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self, flush=False):
+        """Stop the sender loop, optionally sending the final state first"""
+        self._stop.set()
+        self._wake.set()
+        if flush:
+            try:
+                self.publish_now()
+            except Exception as e:
+                print(f"Telemetry error: {e}")
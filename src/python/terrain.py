@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Terrain Elevation Service
+Offline ground elevation from 1x1 degree DEM tiles in a local directory:
+
+  N34E074.hgt   SRTM tile, big-endian int16, 1201x1201 (3") or 3601x3601 (1")
+  N34E074.raw   raw grid with a N34E074.json header, e.g.
+                {"rows": 3601, "cols": 3601, "dtype": "<f4", "nodata": -9999}
+
+Tiles are memory-mapped rather than read, so only the pages around the
+sampled points are loaded, and a small LRU cache keeps recently used tiles
+mapped. Lookups use bilinear interpolation and are vectorized over any
+number of points, which makes sampling a whole route cheap.
+
+Mission altitudes are relative to home, so clearance checks convert them
+to AMSL with the terrain elevation at the launch point.
+"""
+
+import os
+import math
+import json
+import threading
+import argparse
+import sys
+from collections import OrderedDict
+
+import numpy as np
+
+from waypoint_mission import Mission
+
+TILE_CACHE_SIZE = 16      # Tiles kept memory-mapped
+ROUTE_SAMPLE_SPACING = 30.0  # Meters between terrain samples along a route
+MIN_CLEARANCE = 20.0      # Meters above ground required along the route
+HGT_VOID = -32768
+
+def tile_name(lat_index, lon_index):
+    """SRTM-style tile name for the tile whose south-west corner is given"""
+    return (f"{'N' if lat_index >= 0 else 'S'}{abs(lat_index):02d}"
+            f"{'E' if lon_index >= 0 else 'W'}{abs(lon_index):03d}")
+
+class TerrainTile:
+    def __init__(self, path, lat_index, lon_index, rows, cols, dtype, nodata=None):
+        self.path = path
+        self.lat_index = lat_index
+        self.lon_index = lon_index
+        self.rows = rows
+        self.cols = cols
+        self.nodata = nodata
+        self.data = np.memmap(path, dtype=dtype, mode='r', shape=(rows, cols))
+
+    @classmethod
+    def open(cls, directory, lat_index, lon_index):
+        """Open the tile covering a 1x1 degree cell, or return None"""
+        name = tile_name(lat_index, lon_index)
+        for candidate in (name + '.hgt', name.lower() + '.hgt'):
+            path = os.path.join(directory, candidate)
+            if os.path.exists(path):
+                size = int(round(math.sqrt(os.path.getsize(path) / 2)))
+                if size * size * 2 != os.path.getsize(path):
+                    raise ValueError(f"{path} is not a square SRTM tile")
+                return cls(path, lat_index, lon_index, size, size, '>i2', HGT_VOID)
+
+        path = os.path.join(directory, name + '.raw')
+        header_path = os.path.join(directory, name + '.json')
+        if os.path.exists(path) and os.path.exists(header_path):
+            with open(header_path, 'r', encoding='utf-8') as f:
+                header = json.load(f)
+            return cls(path, lat_index, lon_index, int(header['rows']), int(header['cols']),
+                       header.get('dtype', '<f4'), header.get('nodata'))
+        return None
+
+    def sample(self, lat, lon):
+        """Bilinear elevation at arrays of points inside this tile (NaN on voids)"""
+        # Row 0 is the northern edge, column 0 the western edge
+        row = (self.lat_index + 1 - lat) * (self.rows - 1)
+        col = (lon - self.lon_index) * (self.cols - 1)
+        row0 = np.clip(np.floor(row).astype(np.int64), 0, self.rows - 2)
+        col0 = np.clip(np.floor(col).astype(np.int64), 0, self.cols - 2)
+        fr = np.clip(row - row0, 0.0, 1.0)
+        fc = np.clip(col - col0, 0.0, 1.0)
+
+        corners = [self.data[row0 + dr, col0 + dc].astype(np.float64)
+                   for dr in (0, 1) for dc in (0, 1)]
+        if self.nodata is not None:
+            for values in corners:
+                values[values == self.nodata] = np.nan
+        top = corners[0] * (1 - fc) + corners[1] * fc
+        bottom = corners[2] * (1 - fc) + corners[3] * fc
+        return top * (1 - fr) + bottom * fr
+
+class TerrainService:
+    def __init__(self, directory, cache_size=TILE_CACHE_SIZE):
+        self.directory = directory
+        self.cache_size = cache_size
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+        self.tile_loads = 0
+
+    def tile(self, lat_index, lon_index):
+        """Mapped tile for a 1x1 degree cell through the LRU cache (None if missing)"""
+        key = (lat_index, lon_index)
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                return self.tiles[key]
+
+            tile = TerrainTile.open(self.directory, lat_index, lon_index)
+            self.tile_loads += 1
+            # Missing tiles are cached too, so they are not looked up again
+            self.tiles[key] = tile
+            # Evicted tiles are unmapped once no lookup is using them any more
+            while len(self.tiles) > self.cache_size:
+                self.tiles.popitem(last=False)
+            return tile
+
+    def elevations(self, lats, lons):
+        """Ground elevation in meters AMSL for arrays of points (NaN where unknown)"""
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        result = np.full(lats.shape, np.nan)
+        lat_index = np.floor(lats).astype(np.int64)
+        lon_index = np.floor(lons).astype(np.int64)
+
+        # One vectorized lookup per tile touched
+        keys = (lat_index + 90) * 360 + (lon_index + 180)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(keys.shape)
+        for i, key in enumerate(unique):
+            lat_cell, lon_cell = divmod(int(key), 360)
+            tile = self.tile(lat_cell - 90, lon_cell - 180)
+            if tile is None:
+                continue
+            mask = inverse == i
+            result[mask] = tile.sample(lats[mask], lons[mask])
+        return result
+
+    def elevation(self, lat, lon):
+        """Ground elevation at one point, or None when unknown"""
+        tile = self.tile(int(math.floor(lat)), int(math.floor(lon)))
+        if tile is None:
+            return None
+        value = float(tile.sample(np.array([lat]), np.array([lon]))[0])
+        return None if math.isnan(value) else value
+
+    def sample_route(self, lats, lons, spacing=ROUTE_SAMPLE_SPACING):
+        """Sample terrain every spacing meters along a polyline
+
+        Returns (leg, fraction, lat, lon, elevation) arrays: the leg index each
+        sample belongs to and its position along that leg (0-1).
+        """
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        meters_per_deg_lon = 111320.0 * np.cos(np.radians((lats[:-1] + lats[1:]) / 2))
+        lengths = np.hypot((lats[1:] - lats[:-1]) * 111320.0,
+                           (lons[1:] - lons[:-1]) * meters_per_deg_lon)
+        counts = np.maximum(np.ceil(lengths / spacing).astype(np.int64), 1) + 1
+        leg = np.repeat(np.arange(len(lengths)), counts)
+        step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        fraction = step / (counts[leg] - 1)
+        sample_lat = lats[leg] + (lats[leg + 1] - lats[leg]) * fraction
+        sample_lon = lons[leg] + (lons[leg + 1] - lons[leg]) * fraction
+        return leg, fraction, sample_lat, sample_lon, self.elevations(sample_lat, sample_lon)
+
+    def check_mission(self, mission, home_lat, home_lon, min_clearance=MIN_CLEARANCE,
+                      spacing=ROUTE_SAMPLE_SPACING):
+        """Above-ground clearance along every leg of a mission flown from home
+
+        The launch leg climbs to the first waypoint altitude before leaving
+        home; between waypoints altitude changes linearly. Returns a report
+        with the minimum clearance per leg and the legs below min_clearance.
+        """
+        home_elevation = self.elevation(home_lat, home_lon)
+        if home_elevation is None:
+            raise ValueError("No terrain data at the launch point")
+
+        waypoints = mission.waypoints
+        lats = np.array([home_lat] + [wp.lat for wp in waypoints])
+        lons = np.array([home_lon] + [wp.lon for wp in waypoints])
+        alts = np.array([waypoints[0].alt] + [wp.alt for wp in waypoints])
+
+        leg, fraction, _, _, ground = self.sample_route(lats, lons, spacing)
+        altitude = home_elevation + alts[leg] + (alts[leg + 1] - alts[leg]) * fraction
+        clearance = altitude - ground
+
+        # Minimum clearance per leg; unknown terrain stays NaN
+        legs = len(lats) - 1
+        per_leg = np.full(legs, np.inf)
+        known = ~np.isnan(clearance)
+        np.minimum.at(per_leg, leg[known], clearance[known])
+        unknown = np.bincount(leg[~known], minlength=legs) > 0
+        per_leg[np.isinf(per_leg)] = np.nan
+
+        violations = [
+            {'to_waypoint': int(i), 'clearance': round(float(per_leg[i]), 1)}
+            for i in np.nonzero(per_leg < min_clearance)[0]
+        ]
+        return {
+            'home_elevation': home_elevation,
+            'min_clearance': None if np.all(np.isnan(per_leg)) else round(float(np.nanmin(per_leg)), 1),
+            'leg_clearance': [None if math.isnan(c) else round(float(c), 1) for c in per_leg],
+            'violations': violations,
+            'unknown_legs': [int(i) for i in np.nonzero(unknown)[0]],
+            'samples': int(len(leg)),
+        }
+
+    def clear(self):
+        """Drop every cached tile"""
+        with self.lock:
+            self.tiles.clear()
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Check terrain clearance of a mission')
+    parser.add_argument('mission', help='Waypoint mission JSON file')
+    parser.add_argument('--terrain', required=True, help='Directory of .hgt / .raw elevation tiles')
+    parser.add_argument('--home', type=float, nargs=2, required=True, metavar=('LAT', 'LON'),
+                        help='Launch point the mission altitudes are relative to')
+    parser.add_argument('--min-clearance', type=float, default=MIN_CLEARANCE,
+                        help='Required height above ground in meters')
+    parser.add_argument('--spacing', type=float, default=ROUTE_SAMPLE_SPACING,
+                        help='Meters between terrain samples')
+    args = parser.parse_args()
+
+    terrain = TerrainService(args.terrain)
+    try:
+        report = terrain.check_mission(Mission.from_json(args.mission), args.home[0], args.home[1],
+                                       args.min_clearance, args.spacing)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Home elevation: {report['home_elevation']:.1f}m")
+    print(f"Terrain samples: {report['samples']}")
+    print(f"Minimum clearance: {report['min_clearance']}m")
+    for violation in report['violations']:
+        print(f"  Leg to waypoint {violation['to_waypoint'] + 1}: {violation['clearance']}m above ground")
+    if report['unknown_legs']:
+        print(f"  No terrain data for {len(report['unknown_legs'])} legs")
+    sys.exit(1 if report['violations'] else 0)
+
+if __name__ == "__main__":
+    main()
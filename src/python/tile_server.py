@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+"""
+Offline Map Tile Server
+Serves raster map tiles from a local MBTiles file (SQLite) to the moving
+map in the Electron app over HTTP on localhost, so the map works where
+there is no internet.
+
+  GET  /tiles/{z}/{x}/{y}   tile image (XYZ numbering; 404 if not in the file)
+  GET  /metadata            name, format, zoom range, bounds, center, cache stats
+  POST /prefetch            {"route": [[lat, lon], ...], "zooms": [15, 16]}
+                            {"position": [lat, lon], "heading": 90, "speed": 12,
+                             "zooms": [16]}
+
+Tiles are kept in an in-memory LRU cache with a byte budget, so the map
+can pan and follow the vehicle without reading the same tile from disk
+again. Missing tiles are cached too. A background thread prefetches
+tiles into the cache: the corridor along the planned route and, with
+higher priority, the area ahead of the vehicle on its current heading.
+Each new position request replaces the previous one, so only the latest
+heading is prefetched.
+
+MBTiles stores rows in TMS order (y counted from the south); they are
+flipped to the XYZ numbering web maps use.
+"""
+
+import sys
+import math
+import json
+import sqlite3
+import argparse
+import threading
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from geo_utils import METERS_PER_DEG_LAT
+
+TILE_SERVER_HOST = '127.0.0.1'
+TILE_SERVER_PORT = 14570
+CACHE_BYTES = 64 << 20        # Tile bytes kept in memory
+MISSING_TILE_COST = 64        # Bytes charged to the cache for a tile the file does not have
+MAX_PREFETCH_TILES = 2000     # Tiles queued by one prefetch request
+CORRIDOR_TILES = 1            # Tiles either side of the route or heading that are prefetched
+LOOKAHEAD_TIME = 60.0         # Seconds of flight ahead of the vehicle that are prefetched
+MIN_LOOKAHEAD = 500.0         # Meters prefetched ahead even when hovering
+MAX_LATITUDE = 85.0511        # Web Mercator limit
+EQUATOR_LENGTH = 40075016.686  # Meters
+CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'webp': 'image/webp'}
+
+def tile_xy(lat, lon, zoom):
+    """Fractional XYZ tile coordinates of a point"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    n = 1 << zoom
+    x = (lon + 180.0) / 360.0 * n
+    phi = math.radians(lat)
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0 * n
+    return x, y
+
+def tile_size_m(lat, zoom):
+    """Width of a tile in meters at a latitude"""
+    return EQUATOR_LENGTH * math.cos(math.radians(lat)) / (1 << zoom)
+
+def corridor_tiles(points, zoom, radius=CORRIDOR_TILES):
+    """Tiles within radius tiles of a polyline of (lat, lon) points, in path order"""
+    tiles = OrderedDict()
+    n = 1 << zoom
+
+    def add(lat, lon):
+        x, y = tile_xy(lat, lon, zoom)
+        for dy in range(-radius, radius + 1):
+            ty = int(y) + dy
+            if 0 <= ty < n:
+                for dx in range(-radius, radius + 1):
+                    tiles[(zoom, (int(x) + dx) % n, ty)] = None
+
+    for (lat1, lon1), (lat2, lon2) in zip(points, points[1:]):
+        x1, y1 = tile_xy(lat1, lon1, zoom)
+        x2, y2 = tile_xy(lat2, lon2, zoom)
+        # Sample every half tile so no tile the leg crosses is skipped
+        steps = max(1, int(math.ceil(2 * max(abs(x2 - x1), abs(y2 - y1)))))
+        for i in range(steps):
+            f = i / steps
+            add(lat1 + (lat2 - lat1) * f, lon1 + (lon2 - lon1) * f)
+    if points:
+        add(*points[-1])
+    return list(tiles)
+
+def point_ahead(lat, lon, heading, distance):
+    """Point distance meters from (lat, lon) along a heading (flat-earth, fine for a few km)"""
+    bearing = math.radians(heading)
+    north = distance * math.cos(bearing)
+    east = distance * math.sin(bearing)
+    return (lat + north / METERS_PER_DEG_LAT,
+            lon + east / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 0.01)))
+
+class MBTiles:
+    """Read-only access to the tiles and metadata of an MBTiles file"""
+
+    def __init__(self, path):
+        self.path = path
+        # One connection shared by the request and prefetch threads
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.metadata = dict(self.connection.execute('SELECT name, value FROM metadata').fetchall())
+        self.format = self.metadata.get('format', 'png').lower()
+        if self.format not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported tile format '{self.format}' (raster png/jpg/webp only)")
+        self.content_type = CONTENT_TYPES[self.format]
+        zooms = self.connection.execute('SELECT MIN(zoom_level), MAX(zoom_level) FROM tiles').fetchone()
+        self.minzoom = int(self.metadata.get('minzoom', zooms[0] or 0))
+        self.maxzoom = int(self.metadata.get('maxzoom', zooms[1] or 0))
+        self.reads = 0
+
+    def read(self, zoom, x, y):
+        """Tile bytes, or None if the file does not have the tile"""
+        with self.lock:
+            self.reads += 1
+            row = self.connection.execute(
+                'SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?',
+                (zoom, x, (1 << zoom) - 1 - y)).fetchone()
+        return row[0] if row else None
+
+    def info(self):
+        info = {
+            'name': self.metadata.get('name', ''),
+            'format': self.format,
+            'minzoom': self.minzoom,
+            'maxzoom': self.maxzoom,
+            'attribution': self.metadata.get('attribution', ''),
+        }
+        if 'bounds' in self.metadata:
+            info['bounds'] = [float(v) for v in self.metadata['bounds'].split(',')]
+        if 'center' in self.metadata:
+            info['center'] = [float(v) for v in self.metadata['center'].split(',')]
+        return info
+
+    def close(self):
+        self.connection.close()
+
+class TileCache:
+    """LRU cache of tile bytes with a byte budget"""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """(True, data) if cached (data None for a known missing tile), else (False, None)"""
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                self.hits += 1
+                return True, self.tiles[key]
+            self.misses += 1
+            return False, None
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.tiles
+
+    def put(self, key, data):
+        cost = len(data) if data else MISSING_TILE_COST
+        with self.lock:
+            if key in self.tiles:
+                return
+            self.tiles[key] = data
+            self.bytes += cost
+            while self.bytes > self.max_bytes and len(self.tiles) > 1:
+                _, old = self.tiles.popitem(last=False)
+                self.bytes -= len(old) if old else MISSING_TILE_COST
+
+    def stats(self):
+        with self.lock:
+            return {'tiles': len(self.tiles), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+class TileStore:
+    def __init__(self, mbtiles, cache_bytes=CACHE_BYTES):
+        self.mbtiles = mbtiles
+        self.cache = TileCache(cache_bytes)
+        self.ahead = deque()     # Tiles ahead of the vehicle, fetched first
+        self.route = deque()     # Tiles along the planned route
+        self.condition = threading.Condition()
+        self.prefetched = 0
+        self.thread = threading.Thread(target=self.prefetch_loop, name='tile-prefetch', daemon=True)
+        self.thread.start()
+
+    def get(self, zoom, x, y):
+        key = (zoom, x, y)
+        found, data = self.cache.get(key)
+        if not found:
+            data = self.mbtiles.read(zoom, x, y)
+            self.cache.put(key, data)
+        return data
+
+    def zooms(self, requested):
+        return [z for z in requested if self.mbtiles.minzoom <= z <= self.mbtiles.maxzoom]
+
+    def prefetch_route(self, points, zooms):
+        """Queue the corridor along a route, replacing the previous route"""
+        tiles = []
+        for zoom in self.zooms(zooms):
+            tiles += corridor_tiles(points, zoom)
+        with self.condition:
+            self.route = deque(tiles[:MAX_PREFETCH_TILES])
+            self.condition.notify()
+        return len(self.route)
+
+    def prefetch_ahead(self, lat, lon, heading, speed, zooms):
+        """Queue the corridor ahead of the vehicle, replacing the previous position"""
+        distance = max(MIN_LOOKAHEAD, (speed or 0.0) * LOOKAHEAD_TIME)
+        points = [(lat, lon)]
+        if heading is not None:
+            points.append(point_ahead(lat, lon, heading, distance))
+        tiles = []
+        for zoom in self.zooms(zooms):
+            tiles += corridor_tiles(points, zoom)
+        with self.condition:
+            self.ahead = deque(tiles[:MAX_PREFETCH_TILES])
+            self.condition.notify()
+        return len(self.ahead)
+
+    def prefetch_loop(self):
+        while True:
+            with self.condition:
+                while not self.ahead and not self.route:
+                    self.condition.wait()
+                key = self.ahead.popleft() if self.ahead else self.route.popleft()
+            if key not in self.cache:
+                self.cache.put(key, self.mbtiles.read(*key))
+                self.prefetched += 1
+
+    def stats(self):
+        stats = self.cache.stats()
+        with self.condition:
+            stats['queued'] = len(self.ahead) + len(self.route)
+        stats['prefetched'] = self.prefetched
+        stats['disk_reads'] = self.mbtiles.reads
+        return stats
+
+class TileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, so the map reuses its connections
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+    store = None
+
+    def send_body(self, status, body, content_type, cache=False):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        # The page is loaded from file://, so every response needs CORS
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if cache:
+            self.send_header('Cache-Control', 'max-age=86400')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status, data):
+        self.send_body(status, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def do_OPTIONS(self):
+        self.send_response(204)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, POST')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 4 and parts[0] == 'tiles':
+            try:
+                zoom, x = int(parts[1]), int(parts[2])
+                y = int(parts[3].split('.')[0])
+            except ValueError:
+                self.send_json(400, {'error': 'Expected /tiles/{z}/{x}/{y}'})
+                return
+            mbtiles = self.store.mbtiles
+            # Out of range tiles are not worth a query or a cache entry
+            if (mbtiles.minzoom <= zoom <= mbtiles.maxzoom
+                    and 0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+                data = self.store.get(zoom, x, y)
+            else:
+                data = None
+            if data is None:
+                self.send_body(404, b'', 'text/plain', cache=True)
+            else:
+                self.send_body(200, data, self.store.mbtiles.content_type, cache=True)
+        elif parts == ['metadata']:
+            self.send_json(200, dict(self.store.mbtiles.info(), cache=self.store.stats()))
+        else:
+            self.send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/prefetch':
+            self.send_json(404, {'error': 'Not found'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length))
+            zooms = [int(z) for z in request.get('zooms', [])]
+            queued = {}
+            if 'route' in request:
+                points = [(float(lat), float(lon)) for lat, lon in request['route']]
+                queued['route'] = self.store.prefetch_route(points, zooms)
+            if 'position' in request:
+                lat, lon = (float(v) for v in request['position'])
+                heading = request.get('heading')
+                queued['ahead'] = self.store.prefetch_ahead(
+                    lat, lon, float(heading) if heading is not None else None,
+                    float(request.get('speed') or 0.0), zooms)
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json(400, {'error': f"Invalid prefetch request: {e}"})
+            return
+        self.send_json(200, {'queued': queued})
+
+    def log_message(self, format, *args):
+        # One line per tile request would drown the app console
+        pass
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='Serve map tiles from an MBTiles file on localhost')
+    parser.add_argument('mbtiles', help='MBTiles file with raster (png/jpg/webp) tiles')
+    parser.add_argument('--host', default=TILE_SERVER_HOST, help='Address to listen on')
+    parser.add_argument('--port', type=int, default=TILE_SERVER_PORT, help='Port to listen on')
+    parser.add_argument('--cache-mb', type=float, default=CACHE_BYTES / (1 << 20),
+                        help='Tile bytes kept in memory, in MiB')
+    args = parser.parse_args()
+
+    try:
+        mbtiles = MBTiles(args.mbtiles)
+    except (sqlite3.Error, ValueError) as e:
+        print(f"Error opening {args.mbtiles}: {e}")
+        sys.exit(1)
+
+    TileRequestHandler.store = TileStore(mbtiles, int(args.cache_mb * (1 << 20)))
+    try:
+        server = ThreadingHTTPServer((args.host, args.port), TileRequestHandler)
+    except OSError as e:
+        print(f"Error starting tile server: {e}")
+        sys.exit(1)
+    server.daemon_threads = True
+    info = mbtiles.info()
+    print(f"Map tiles: {info['name'] or args.mbtiles} ({info['format']}, zoom {info['minzoom']}-{info['maxzoom']}) "
+          f"on http://{args.host}:{args.port}/tiles/{{z}}/{{x}}/{{y}}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = TileRequestHandler.store.stats()
+        print(f"Tile server stopped: {stats['hits']} cache hits, {stats['disk_reads']} disk reads")
+        mbtiles.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+MAVLink Time Synchronisation
+Estimates the vehicle clock offset and link round-trip time from TIMESYNC
+exchanges, so telemetry can be stamped with how old its data is in vehicle
+time rather than when the ground station happened to receive it.
+
+A request carries our clock in ts1 with tc1 = 0; the vehicle answers with
+its own clock in tc1 and our ts1 echoed. Assuming a symmetric link, the
+vehicle clock at the midpoint of the round trip was tc1, which gives one
+offset sample. Samples are filtered:
+  - replies that took much longer than the recent minimum RTT are queued
+    somewhere along the link and would bias the offset, so they are dropped
+  - the offset is a running average, fast at first and then smooth
+  - several consistent samples far from the estimate mean the vehicle
+    rebooted (its clock restarted), and the estimate is reset
+
+The local clock is time.monotonic_ns(); vehicle time is the autopilot's
+boot clock, the same one time_boot_ms in telemetry messages comes from.
+"""
+
+import time
+from collections import deque
+
+from mavlink_frames import TIMESYNC, encode_frames
+
+TIMESYNC_INTERVAL = 1.0   # Seconds between requests
+GCS_SYSID = 255
+GCS_COMPID = 190           # MAV_COMP_ID_MISSIONPLANNER
+RTT_WINDOW = 20            # Samples the minimum RTT is taken over
+RTT_OUTLIER_FACTOR = 2.0   # Replies slower than this times the minimum RTT are dropped
+RTT_OUTLIER_SLACK = 2_000_000   # ns always allowed on top of the minimum RTT
+OFFSET_GAIN = 0.1          # Running average weight once converged
+RESET_THRESHOLD = 500_000_000   # ns; a jump this large is a vehicle reboot
+RESET_SAMPLES = 3          # Consistent jumps needed before resetting
+PENDING_TIMEOUT = 5_000_000_000  # ns before an unanswered request is forgotten
+
+class TimeSync:
+    def __init__(self, interval=TIMESYNC_INTERVAL, sysid=GCS_SYSID, compid=GCS_COMPID):
+        self.interval = interval
+        self.sysid = sysid
+        self.compid = compid
+        self.offset = None      # Vehicle clock minus local clock, ns
+        self.rtt = None         # Filtered round-trip time, ns
+        self.rtts = deque(maxlen=RTT_WINDOW)
+        self.pending = {}       # ts1 of our requests still awaiting a reply
+        self.next_request = 0.0
+        self.seq = 0
+        self.samples = 0
+        self.rejected = 0
+        self.resets = 0
+        self.jumps = 0
+
+    @property
+    def synced(self):
+        return self.offset is not None
+
+    def frame(self, tc1, ts1):
+        """Encoded TIMESYNC frame"""
+        payload = TIMESYNC.empty(1)
+        payload['tc1'] = tc1
+        payload['ts1'] = ts1
+        frame = encode_frames(TIMESYNC, payload, self.seq, self.sysid, self.compid)[0].tobytes()
+        self.seq = (self.seq + 1) & 0xFF
+        return frame
+
+    def request(self, now=None):
+        """A TIMESYNC request frame if one is due, else None"""
+        now = time.monotonic() if now is None else now
+        if now < self.next_request:
+            return None
+        self.next_request = now + self.interval
+        ts1 = time.monotonic_ns()
+        # Forget requests the vehicle never answered
+        for sent in [sent for sent in self.pending if ts1 - sent > PENDING_TIMEOUT]:
+            del self.pending[sent]
+        self.pending[ts1] = True
+        return self.frame(0, ts1)
+
+    def handle(self, tc1, ts1, now_ns=None):
+        """Process a received TIMESYNC; returns a reply frame for vehicle requests"""
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        if tc1 == 0:
+            # The vehicle is synchronising to us
+            return self.frame(now_ns, ts1)
+        if self.pending.pop(ts1, None) is None:
+            return None  # A reply to another ground station's request
+        self.add_sample(tc1 - (ts1 + now_ns) // 2, now_ns - ts1)
+        return None
+
+    def add_sample(self, offset, rtt):
+        """Filter one (offset, rtt) measurement into the estimate"""
+        self.rtts.append(rtt)
+        if rtt > RTT_OUTLIER_FACTOR * min(self.rtts) + RTT_OUTLIER_SLACK:
+            self.rejected += 1
+            return
+
+        if self.offset is not None and abs(offset - self.offset) > RESET_THRESHOLD:
+            self.jumps += 1
+            if self.jumps < RESET_SAMPLES:
+                self.rejected += 1
+                return
+            self.resets += 1
+            self.offset = None
+        self.jumps = 0
+
+        if self.offset is None:
+            self.offset = offset
+            self.rtt = rtt
+            self.samples = 1
+            return
+        self.samples += 1
+        # Plain average while converging, then a running average
+        gain = max(1.0 / self.samples, OFFSET_GAIN)
+        self.offset += gain * (offset - self.offset)
+        self.rtt += gain * (rtt - self.rtt)
+
+    def vehicle_time_ms(self, now_ns=None):
+        """Current vehicle boot time in ms, or None before the first sample"""
+        if self.offset is None:
+            return None
+        now_ns = time.monotonic_ns() if now_ns is None else now_ns
+        return (now_ns + self.offset) / 1e6
+
+    def age_ms(self, time_boot_ms, now_ns=None):
+        """How long ago, in vehicle time, a message stamped time_boot_ms was produced"""
+        vehicle_now = self.vehicle_time_ms(now_ns)
+        if vehicle_now is None:
+            return None
+        return vehicle_now - time_boot_ms
+
+    def stats(self):
+        return {
+            'synced': self.synced,
+            'offset_ms': round(self.offset / 1e6, 3) if self.synced else None,
+            'rtt_ms': round(self.rtt / 1e6, 2) if self.rtt is not None else None,
+            'samples': self.samples,
+            'rejected': self.rejected,
+            'resets': self.resets,
+        }
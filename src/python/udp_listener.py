@@ -6,11 +6,19 @@ This script handles the mission without DroneKit mode parsing issues
 
 import socket
 import json
-import time
+import math
 import threading
 import sys
 import struct
-from geopy.distance import geodesic
+import argparse
+from mission_events import open_event_stream
+from profiler import start_profiler
+from sim_clock import RealClock, create_clock
+from sim_kinematics import KinematicModel
+from telemetry_publisher import TelemetryPublisher
+from waypoint_mission import Mission, MissionProgress
+from geofence import Geofence, GeofenceMonitor
+from terrain import TerrainService
 
 # Target GPS coordinates - will be updated by the Electron app
 LATITUDE = 34.0173
@@ -18,11 +26,38 @@ LONGITUDE = 74.7179
 ALTITUDE = 30
 WAIT_TIME_AT_TARGET = 30
 
+# Simulated launch point
+START_LATITUDE = 34.0000
+START_LONGITUDE = 74.7000
+
+# Simulated seconds between progress prints
+REPORT_INTERVAL = 1.0
+
 class SimpleUDPController:
-    def __init__(self):
+    def __init__(self, clock=None, seed=None, cruise_speed=5.0, climb_rate=2.5,
+                 descent_rate=1.5, acceleration=1.0, gust=0.5, arrival_radius=2.0,
+                 time_step=0.1, telemetry_rate=1.0, geofence=None, terrain=None):
         self.udp_socket = None
         self.is_running = True
-        self.drone_status = {
+        self.cancel_requested = False
+        self.event_callback = None
+        self.clock = clock or RealClock()
+        self.seed = seed
+        self.cruise_speed = cruise_speed
+        self.climb_rate = climb_rate
+        self.descent_rate = descent_rate
+        self.acceleration = acceleration
+        self.gust = gust
+        self.arrival_radius = arrival_radius
+        self.time_step = time_step
+        # Built here too, so invalid kinematic parameters fail at construction
+        self.model = self.create_model()
+        self.next_report = 0
+        self.mission_stats = {}
+        self.fence_monitor = GeofenceMonitor(geofence, self.on_fence_event) if geofence else None
+        self.terrain = terrain
+        self.home_elevation = None
+        self.publisher = TelemetryPublisher(self.send_telemetry, telemetry_rate, {
             'connected': False,
             'armed': False,
             'mode': 'UNKNOWN',
@@ -33,7 +68,12 @@ class SimpleUDPController:
             'groundspeed': 0,
             'heading': 0,
             'status': 'Initializing'
-        }
+        }, clock=self.clock)
+    
+    @property
+    def drone_status(self):
+        """Latest published status snapshot (read-only)"""
+        return self.publisher.snapshot()
         
     def setup_udp_connection(self):
         """Setup UDP connection"""
@@ -55,154 +95,256 @@ class SimpleUDPController:
             except Exception as e:
                 print(f"Error sending telemetry: {e}")
     
-    def telemetry_thread(self):
-        """Background thread to send telemetry data"""
-        while self.is_running:
+    def report_event(self, event, **data):
+        """Pass a structured mission event to the registered callback"""
+        if self.event_callback:
             try:
-                # Add timestamp and send current status
-                self.drone_status['timestamp'] = time.time()
-                self.send_telemetry(self.drone_status)
-                time.sleep(1)
+                self.event_callback(event, data)
             except Exception as e:
-                print(f"Telemetry error: {e}")
-                time.sleep(1)
+                print(f"Error reporting event: {e}")
+    
+    def mission_active(self):
+        """Whether the current mission should keep running"""
+        return self.is_running and not self.cancel_requested
+    
+    def on_fence_event(self, event, data):
+        """Report geofence transitions and return to launch on a breach"""
+        self.report_event(event, **data)
+        self.publisher.update(geofence=data['status'])
+        if event == 'geofence_breach' and self.mission_active():
+            print(f"Geofence breach at {data['fence']} ({data['distance']:.1f}m) - returning to launch")
+            self.cancel_requested = True
+    
+    def telemetry_thread(self):
+        """Background thread sending status at the telemetry rate and on changes"""
+        self.publisher.run()
+    
+    def set_phase(self, status, **fields):
+        """Update the mission phase and report it as an event"""
+        if 'mode' in fields and fields['mode'] != self.drone_status['mode']:
+            self.report_event('mode', mode=fields['mode'])
+        self.publisher.update(fields, status=status)
+        self.report_event('phase', phase=status, **fields)
+    
+    def advance(self):
+        """Let one time step pass and publish the model state"""
+        self.clock.sleep(self.time_step)
+        self.publisher.update({
+            'latitude': self.model.lat,
+            'longitude': self.model.lon,
+            'altitude': round(self.model.alt, 2),
+            'groundspeed': round(self.model.speed, 2),
+            'heading': round(self.model.heading, 1)
+        })
+        if self.fence_monitor:
+            self.fence_monitor.update(self.model.lat, self.model.lon, self.model.alt)
+        if self.home_elevation is not None:
+            ground = self.terrain.elevation(self.model.lat, self.model.lon)
+            if ground is not None:
+                self.publisher.update(agl=round(self.home_elevation + self.model.alt - ground, 1))
+    
+    def report_due(self):
+        """True once per report interval of simulated time"""
+        now = self.clock.now()
+        if now >= self.next_report:
+            self.next_report = now + REPORT_INTERVAL
+            return True
+        return False
+    
+    def climb_to(self, target_alt, keep_going):
+        """Climb or descend to target_alt in time steps"""
+        self.next_report = self.clock.now()
+        while keep_going():
+            reached = self.model.step_vertical(target_alt, self.time_step)
+            self.advance()
+            if reached or self.report_due():
+                print(f"Altitude: {self.model.alt:.0f}m")
+                self.report_event('altitude', altitude=round(self.model.alt, 2))
+            if reached:
+                return True
+        return False
     
-    def simulate_mission_progress(self, target_lat, target_lon, target_alt):
-        """Simulate mission progress for demonstration"""
+    def fly_to(self, lat, lon, keep_going, report_distance=True, target_alt=None, progress=None,
+               arrival_radius=None):
+        """Fly to a point in time steps; True once within the arrival radius"""
+        if arrival_radius is None:
+            arrival_radius = self.arrival_radius
+        self.next_report = self.clock.now()
+        while keep_going():
+            remaining = self.model.step_towards(lat, lon, self.time_step)
+            if target_alt is not None:
+                self.model.step_vertical(target_alt, self.time_step)
+            self.advance()
+            arrived = remaining <= arrival_radius
+            if report_distance and (arrived or self.report_due()):
+                print(f"Distance to target: {remaining:.1f}m")
+                if progress:
+                    progress.update(self.model.lat, self.model.lon, self.model.speed)
+                    self.report_event('distance', distance=round(remaining, 2), **progress.state())
+                else:
+                    self.report_event('distance', distance=round(remaining, 2))
+            if arrived:
+                self.model.speed = 0.0
+                self.publisher.update(groundspeed=0.0)
+                return True
+        return False
+    
+    def hold(self, seconds, label):
+        """Hold position for a number of seconds unless the mission stops"""
+        print(f"Waiting {seconds:g} seconds at {label}...")
+        for i in range(math.ceil(seconds)):
+            if not self.mission_active():
+                break
+            print(f"Waiting... {seconds - i:g} seconds remaining")
+            self.clock.sleep(min(1, seconds - i))
+    
+    def simulate_mission_progress(self, target_lat, target_lon, target_alt, wait_time=None):
+        """Simulate a single-target mission with the kinematic model"""
+        if wait_time is None:
+            wait_time = WAIT_TIME_AT_TARGET
         print(f"Simulating mission to {target_lat}, {target_lon} at {target_alt}m")
+        mission = Mission.single_target(target_lat, target_lon, target_alt, wait_time,
+                                        self.cruise_speed, self.arrival_radius)
+        return self.simulate_waypoint_mission(mission)
+    
+    def create_model(self):
+        """Kinematic model at the start position with this controller's parameters"""
+        return KinematicModel(
+            START_LATITUDE, START_LONGITUDE,
+            climb_rate=self.climb_rate,
+            descent_rate=self.descent_rate,
+            cruise_speed=self.cruise_speed,
+            acceleration=self.acceleration,
+            gust=self.gust,
+            seed=self.seed
+        )
+    
+    def simulate_waypoint_mission(self, mission):
+        """Simulate flying a waypoint mission with the kinematic model"""
+        self.cancel_requested = False
+        start_time = self.clock.now()
+        self.mission_stats = {'duration': 0.0, 'distance_flown': 0.0, 'time_to_arrive': None}
+        waypoints = mission.waypoints
+        if len(waypoints) > 1:
+            print(f"Simulating mission with {len(waypoints)} waypoints "
+                  f"({mission.total_distance:.0f}m route)")
+        
+        self.model = self.create_model()
+        if self.terrain:
+            self.home_elevation = self.terrain.elevation(START_LATITUDE, START_LONGITUDE)
         
         # Simulate connection
-        self.drone_status.update({
-            'connected': True,
-            'status': 'Connected',
-            'latitude': 34.0000,  # Starting position
-            'longitude': 74.7000,
-            'altitude': 0
-        })
-        time.sleep(2)
+        self.set_phase('Connected',
+            connected=True,
+            latitude=self.model.lat,
+            longitude=self.model.lon,
+            altitude=0
+        )
+        self.clock.sleep(2)
         
         # Simulate arming
         print("Simulating arming...")
-        self.drone_status.update({
-            'armed': True,
-            'mode': 'GUIDED',
-            'status': 'Armed'
-        })
-        time.sleep(2)
+        self.set_phase('Armed', armed=True, mode='GUIDED')
+        self.clock.sleep(2)
         
         # Simulate takeoff
         print("Simulating takeoff...")
-        self.drone_status['status'] = 'Taking off'
-        for alt in range(0, int(target_alt) + 1, 2):
-            if not self.is_running:
-                break
-            self.drone_status['altitude'] = alt
-            print(f"Altitude: {alt}m")
-            time.sleep(0.5)
+        self.set_phase('Taking off')
+        self.climb_to(waypoints[0].alt, self.mission_active)
         
-        # Simulate flight to target
-        print("Simulating flight to target...")
-        self.drone_status['status'] = 'Flying to target'
+        # Simulate flight along the route
+        progress = MissionProgress(mission)
+        if self.mission_active():
+            print("Simulating flight to target...")
+            self.set_phase('Flying to target')
         
-        start_lat, start_lon = 34.0000, 74.7000
-        steps = 20
-        
-        for i in range(steps + 1):
-            if not self.is_running:
+        for index, waypoint in enumerate(waypoints):
+            if not self.mission_active():
                 break
-                
-            # Interpolate position
-            progress = i / steps
-            current_lat = start_lat + (target_lat - start_lat) * progress
-            current_lon = start_lon + (target_lon - start_lon) * progress
-            
-            self.drone_status.update({
-                'latitude': current_lat,
-                'longitude': current_lon,
-                'groundspeed': 5.0  # 5 m/s
-            })
-            
-            # Calculate distance to target
-            distance = geodesic((current_lat, current_lon), (target_lat, target_lon)).meters
-            print(f"Distance to target: {distance:.1f}m")
-            
-            time.sleep(1)
-        
-        # At target
-        print("Reached target location!")
-        self.drone_status['status'] = 'At target location'
-        
-        # Wait at target
-        print(f"Waiting {WAIT_TIME_AT_TARGET} seconds at target...")
-        for i in range(WAIT_TIME_AT_TARGET):
-            if not self.is_running:
+            last = index == len(waypoints) - 1
+            if len(waypoints) > 1:
+                print(f"Flying to waypoint {index + 1}/{len(waypoints)}")
+            self.model.cruise_speed = mission.leg_speed(index)
+            if not self.fly_to(waypoint.lat, waypoint.lon, self.mission_active,
+                               target_alt=waypoint.alt, progress=progress,
+                               arrival_radius=mission.arrival_radius):
                 break
-            print(f"Waiting... {WAIT_TIME_AT_TARGET - i} seconds remaining")
-            time.sleep(1)
+            
+            if last:
+                # At target
+                self.mission_stats['time_to_arrive'] = self.clock.now() - start_time
+                print("Reached target location!")
+                self.set_phase('At target location')
+            else:
+                print(f"Reached waypoint {index + 1}")
+                self.report_event('waypoint_reached', waypoint=index)
+            if waypoint.hold_time:
+                self.hold(waypoint.hold_time, 'target' if last else f'waypoint {index + 1}')
+            progress.advance()
+        self.model.cruise_speed = self.cruise_speed
         
-        # Return to launch
+        # Return to launch, also when the mission was cancelled mid-flight
+        keep_flying = lambda: self.is_running
         print("Returning to launch...")
-        self.drone_status.update({
-            'mode': 'RTL',
-            'status': 'Returning to launch'
-        })
-        
-        # Simulate return flight
-        for i in range(steps + 1):
-            if not self.is_running:
-                break
-                
-            progress = i / steps
-            current_lat = target_lat + (start_lat - target_lat) * progress
-            current_lon = target_lon + (start_lon - target_lon) * progress
-            
-            self.drone_status.update({
-                'latitude': current_lat,
-                'longitude': current_lon
-            })
-            
-            time.sleep(0.5)
+        self.set_phase('Returning to launch', mode='RTL')
+        self.fly_to(START_LATITUDE, START_LONGITUDE, keep_flying, report_distance=False)
         
         # Landing
         print("Landing...")
-        self.drone_status['status'] = 'Landing'
-        for alt in range(int(target_alt), -1, -2):
-            if not self.is_running:
-                break
-            self.drone_status['altitude'] = max(0, alt)
-            time.sleep(0.3)
+        self.set_phase('Landing')
+        self.climb_to(0, keep_flying)
+        
+        self.mission_stats['duration'] = self.clock.now() - start_time
+        self.mission_stats['distance_flown'] = self.model.distance_flown
+        
+        if self.cancel_requested:
+            self.set_phase('Mission cancelled', armed=False, mode='LAND', altitude=0)
+            print("Mission cancelled")
+            return False
         
         # Mission complete
-        self.drone_status.update({
-            'armed': False,
-            'mode': 'LAND',
-            'status': 'Mission completed',
-            'altitude': 0
-        })
+        self.set_phase('Mission completed', armed=False, mode='LAND', altitude=0)
         
         print("Mission completed successfully!")
+        return True
     
-    def run_mission(self):
+    def prepare(self):
+        """Open the telemetry socket and start the telemetry thread"""
+        if not self.setup_udp_connection():
+            print("Error: Could not setup UDP connection")
+            return False
+        
+        telemetry_thread = threading.Thread(target=self.telemetry_thread)
+        telemetry_thread.daemon = True
+        telemetry_thread.start()
+        return True
+    
+    def execute_mission(self, latitude, longitude, altitude, wait_time=None):
+        """Run one mission on an already prepared controller"""
+        return self.simulate_mission_progress(latitude, longitude, altitude, wait_time)
+    
+    def execute_waypoint_mission(self, mission):
+        """Run one waypoint mission on an already prepared controller"""
+        return self.simulate_waypoint_mission(mission)
+    
+    def run_mission(self, mission=None):
         """Main mission execution function"""
         try:
             print("=== Simple UDP Mission Controller ===")
-            print(f"Target: {LATITUDE}, {LONGITUDE} at {ALTITUDE}m")
+            if mission:
+                print(f"Mission: {len(mission)} waypoints, {mission.total_distance:.0f}m route")
+            else:
+                print(f"Target: {LATITUDE}, {LONGITUDE} at {ALTITUDE}m")
             print("===================================")
             
-            # Setup UDP
-            if not self.setup_udp_connection():
-                print("Error: Could not setup UDP connection")
+            # Setup UDP and start telemetry
+            if not self.prepare():
                 return False
             
-            # Start telemetry thread
-            telemetry_thread = threading.Thread(target=self.telemetry_thread)
-            telemetry_thread.daemon = True
-            telemetry_thread.start()
-            
             # Run the mission simulation
-            self.simulate_mission_progress(LATITUDE, LONGITUDE, ALTITUDE)
-            
-            return True
+            if mission:
+                return self.execute_waypoint_mission(mission)
+            return self.execute_mission(LATITUDE, LONGITUDE, ALTITUDE)
             
         except KeyboardInterrupt:
             print("\nMission interrupted by user")
@@ -216,6 +358,7 @@ class SimpleUDPController:
     def cleanup(self):
         """Clean up resources"""
         self.is_running = False
+        self.publisher.stop(flush=self.udp_socket is not None)
         
         if self.udp_socket:
             try:
@@ -228,10 +371,60 @@ class SimpleUDPController:
 
 def main():
     """Main function"""
-    controller = SimpleUDPController()
+    parser = argparse.ArgumentParser(description='Simulated UDP mission controller')
+    parser.add_argument('--speedup', type=float, default=None,
+                        help='Run the simulation N times faster than real time')
+    parser.add_argument('--fast', action='store_true',
+                        help='Run the simulation as fast as possible on a virtual clock')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='Random seed for repeatable wind gusts')
+    parser.add_argument('--cruise-speed', type=float, default=5.0, help='Cruise speed in m/s')
+    parser.add_argument('--climb-rate', type=float, default=2.5, help='Climb rate in m/s')
+    parser.add_argument('--acceleration', type=float, default=1.0, help='Acceleration in m/s^2')
+    parser.add_argument('--telemetry-rate', type=float, default=1.0,
+                        help='Periodic telemetry rate in Hz (changes are sent immediately)')
+    parser.add_argument('--mission', default=None,
+                        help='Waypoint mission JSON file (e.g. from survey_planner.py)')
+    parser.add_argument('--fence', default=None, help='Geofence JSON file')
+    parser.add_argument('--terrain', default=None,
+                        help='Directory of .hgt / .raw elevation tiles for height above ground')
+    parser.add_argument('--profile', default=None, metavar='DIR',
+                        help='Write stack samples, allocations and timings to DIR on exit '
+                             '(default: $DRONE_PROFILE, off if unset)')
+    args = parser.parse_args()
+    
+    mission = Mission.from_json(args.mission) if args.mission else None
+    geofence = Geofence.from_json(args.fence) if args.fence else None
+    terrain = TerrainService(args.terrain) if args.terrain else None
+    
+    try:
+        controller = SimpleUDPController(
+            clock=create_clock(args.speedup, args.fast),
+            seed=args.seed,
+            cruise_speed=args.cruise_speed,
+            climb_rate=args.climb_rate,
+            acceleration=args.acceleration,
+            telemetry_rate=args.telemetry_rate,
+            geofence=geofence,
+            terrain=terrain
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    profiler = start_profiler('udp_listener', args.profile)
+    if profiler:
+        # telemetry_thread runs for the whole flight; time each send it makes
+        controller.publisher.send = profiler.time_function(
+            controller.publisher.send, 'SimpleUDPController.telemetry_thread:send')
+    
+    # Structured events go to the dedicated channel when one is provided
+    event_stream = open_event_stream()
+    if event_stream:
+        controller.event_callback = event_stream.write_event
     
     try:
-        success = controller.run_mission()
+        success = controller.run_mission(mission)
         if success:
             print("Mission completed successfully!")
             sys.exit(0)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Waypoint Missions
+An ordered list of waypoints with per-leg speed, altitude and hold time.
+Leg lengths, bearings, cumulative route distance and planned time are
+computed once when the mission is built, so MissionProgress can track the
+vehicle in O(1) per telemetry update (distance along the current leg,
+cross-track error, ETA to any waypoint) however long the route is.
+
+Mission JSON:
+  {"default_speed": 5, "arrival_radius": 2,
+   "waypoints": [{"latitude": 34.01, "longitude": 74.71, "altitude": 30,
+                  "speed": 8, "hold_time": 10}, ...]}
+"""
+
+import math
+import json
+
+from geo_utils import LocalProjection, initial_bearing
+
+class Waypoint:
+    def __init__(self, lat, lon, alt, speed=None, hold_time=0.0):
+        self.lat = float(lat)
+        self.lon = float(lon)
+        self.alt = float(alt)
+        self.speed = float(speed) if speed is not None else None
+        if self.speed is not None and not self.speed > 0:
+            raise ValueError(f"Waypoint speed must be positive, got {speed}")
+        self.hold_time = float(hold_time or 0.0)
+
+    def to_dict(self):
+        data = {'latitude': self.lat, 'longitude': self.lon, 'altitude': self.alt,
+                'hold_time': self.hold_time}
+        if self.speed:
+            data['speed'] = self.speed
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['latitude'], data['longitude'], data['altitude'],
+                   data.get('speed'), data.get('hold_time', 0.0))
+
+    def __repr__(self):
+        return f"Waypoint({self.lat:.7f}, {self.lon:.7f}, {self.alt:.1f}m)"
+
+class Mission:
+    def __init__(self, waypoints, default_speed=5.0, arrival_radius=2.0):
+        if not waypoints:
+            raise ValueError("A mission needs at least one waypoint")
+        self.waypoints = list(waypoints)
+        self.default_speed = float(default_speed)
+        self.arrival_radius = float(arrival_radius)
+        if not self.default_speed > 0:
+            raise ValueError(f"default_speed must be positive, got {default_speed}")
+        if not self.arrival_radius > 0:
+            raise ValueError(f"arrival_radius must be positive, got {arrival_radius}")
+        self.projection = LocalProjection(self.waypoints[0].lat, self.waypoints[0].lon)
+        self._precompute()
+
+    def _precompute(self):
+        """Local coordinates, leg geometry and cumulative distance/time"""
+        count = len(self.waypoints)
+        self.north = [0.0] * count
+        self.east = [0.0] * count
+        for i, waypoint in enumerate(self.waypoints):
+            self.north[i], self.east[i] = self.projection.to_local(waypoint.lat, waypoint.lon)
+
+        # Leg i runs from waypoint i-1 to waypoint i; leg 0 is the entry leg
+        self.leg_length = [0.0] * count
+        self.leg_bearing = [0.0] * count
+        self.leg_unit = [(0.0, 0.0)] * count
+        self.cumulative_distance = [0.0] * count
+        self.cumulative_time = [0.0] * count
+        for i in range(1, count):
+            d_north = self.north[i] - self.north[i - 1]
+            d_east = self.east[i] - self.east[i - 1]
+            length = math.hypot(d_north, d_east)
+            self.leg_length[i] = length
+            self.leg_bearing[i] = initial_bearing(
+                self.waypoints[i - 1].lat, self.waypoints[i - 1].lon,
+                self.waypoints[i].lat, self.waypoints[i].lon)
+            self.leg_unit[i] = (d_north / length, d_east / length) if length else (0.0, 0.0)
+            self.cumulative_distance[i] = self.cumulative_distance[i - 1] + length
+            # Time to reach waypoint i includes holding at every earlier waypoint
+            self.cumulative_time[i] = (self.cumulative_time[i - 1] + self.waypoints[i - 1].hold_time +
+                                       length / self.leg_speed(i))
+
+    def leg_speed(self, index):
+        """Planned speed for the leg ending at waypoint index"""
+        return self.waypoints[index].speed or self.default_speed
+
+    @property
+    def total_distance(self):
+        return self.cumulative_distance[-1]
+
+    def __len__(self):
+        return len(self.waypoints)
+
+    def to_dict(self):
+        return {'default_speed': self.default_speed, 'arrival_radius': self.arrival_radius,
+                'waypoints': [waypoint.to_dict() for waypoint in self.waypoints]}
+
+    @classmethod
+    def from_dict(cls, data):
+        waypoints = [Waypoint.from_dict(waypoint) for waypoint in data['waypoints']]
+        return cls(waypoints, data.get('default_speed', 5.0), data.get('arrival_radius', 2.0))
+
+    @classmethod
+    def from_json(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
+
+    @classmethod
+    def single_target(cls, lat, lon, alt, hold_time=0.0, speed=None, arrival_radius=2.0):
+        """The classic one-point mission"""
+        return cls([Waypoint(lat, lon, alt, speed, hold_time)],
+                   speed or 5.0, arrival_radius)
+
+class MissionProgress:
+    def __init__(self, mission):
+        self.mission = mission
+        self.index = 0  # Waypoint currently being flown to
+        self.distance_to_waypoint = float('inf')
+        self.along_leg = 0.0
+        self.cross_track = 0.0
+        self.route_position = 0.0
+        self.groundspeed = 0.0
+
+    @property
+    def finished(self):
+        return self.index >= len(self.mission)
+
+    @property
+    def waypoint(self):
+        return None if self.finished else self.mission.waypoints[self.index]
+
+    def update(self, lat, lon, groundspeed=None):
+        """Update from one position fix; O(1). Returns True when the waypoint is reached"""
+        if self.finished:
+            return False
+        mission = self.mission
+        i = self.index
+        north, east = mission.projection.to_local(lat, lon)
+        d_north = mission.north[i] - north
+        d_east = mission.east[i] - east
+        self.distance_to_waypoint = math.hypot(d_north, d_east)
+
+        if i > 0 and mission.leg_length[i]:
+            unit_north, unit_east = mission.leg_unit[i]
+            from_north = north - mission.north[i - 1]
+            from_east = east - mission.east[i - 1]
+            along = from_north * unit_north + from_east * unit_east
+            self.along_leg = min(max(along, 0.0), mission.leg_length[i])
+            self.cross_track = from_east * unit_north - from_north * unit_east
+        else:
+            self.along_leg = 0.0
+            self.cross_track = 0.0
+
+        self.route_position = max(0.0, mission.cumulative_distance[i] - self.distance_to_waypoint)
+        if groundspeed is not None:
+            self.groundspeed = groundspeed
+        return self.distance_to_waypoint <= mission.arrival_radius
+
+    def advance(self):
+        """Move on to the next waypoint"""
+        if not self.finished:
+            self.index += 1
+            self.distance_to_waypoint = float('inf')
+
+    def eta_to(self, target_index):
+        """Seconds until waypoint target_index is reached; O(1)"""
+        mission = self.mission
+        if self.finished or target_index < self.index:
+            return 0.0
+        # Trust the measured groundspeed once the vehicle is actually cruising
+        planned = mission.leg_speed(self.index)
+        speed = self.groundspeed if self.groundspeed > 0.5 * planned else planned
+        eta = self.distance_to_waypoint / speed
+        if target_index > self.index:
+            # Planned time from the current waypoint onwards, holds included
+            eta += mission.cumulative_time[target_index] - mission.cumulative_time[self.index]
+        return eta
+
+    def state(self):
+        """Progress summary for events and telemetry"""
+        last = len(self.mission) - 1
+        return {
+            'waypoint': self.index,
+            'waypoint_count': len(self.mission),
+            'distance_to_waypoint': round(self.distance_to_waypoint, 2),
+            'along_leg': round(self.along_leg, 2),
+            'cross_track': round(self.cross_track, 2),
+            'route_remaining': round(self.mission.total_distance - self.route_position, 2),
+            'eta_waypoint': round(self.eta_to(self.index), 1),
+            'eta_mission': round(self.eta_to(last), 1),
+        }
@@ -0,0 +1,155 @@
+// End-to-end latency traces, from the parser receiving a datagram to the
+// frame that shows its data (see src/latency-trace.js for the clock).
+// LatencyTracer keeps the newest complete traces in a ring and reports
+// percentiles per stage; it also exports them in the Chrome trace event
+// format, which chrome://tracing and Perfetto open directly.
+
+// Stamps in the order a datagram passes them
+const TRACE_STAGES = ['receive', 'decode', 'forward', 'ingest', 'main', 'ipc', 'deliver', 'render', 'paint'];
+// Segment between consecutive stamps, named for where the time goes
+const TRACE_SEGMENTS = [
+    'Parser decode',        // receive -> decode
+    'Parser encode',        // decode -> forward
+    'UDP send to worker',   // forward -> ingest
+    'Worker batching',      // ingest -> main
+    'Status coalescing',    // main -> ipc
+    'IPC to renderer',      // ipc -> deliver
+    'Wait for frame',       // deliver -> render
+    'Paint'                 // render -> paint
+];
+const TRACE_PERCENTILES = [50, 90, 99];
+
+function traceClock() {
+    return performance.timeOrigin + performance.now();
+}
+
+class LatencyTracer {
+    constructor(capacity = 2000) {
+        this.capacity = capacity;
+        this.traces = [];
+        this.next = 0; // Ring position of the next trace once full
+        this.recorded = 0;
+    }
+
+    record(trace) {
+        if (this.traces.length < this.capacity) {
+            this.traces.push(trace);
+        } else {
+            this.traces[this.next] = trace;
+            this.next = (this.next + 1) % this.capacity;
+        }
+        this.recorded++;
+    }
+
+    clear() {
+        this.traces = [];
+        this.next = 0;
+    }
+
+    // Duration of segment i of a trace, or null if a stamp is missing
+    static segment(trace, i) {
+        const start = trace[TRACE_STAGES[i]];
+        const end = trace[TRACE_STAGES[i + 1]];
+        return typeof start === 'number' && typeof end === 'number' ? end - start : null;
+    }
+
+    static total(trace) {
+        const start = trace[TRACE_STAGES[0]];
+        const end = trace[TRACE_STAGES[TRACE_STAGES.length - 1]];
+        return typeof start === 'number' && typeof end === 'number' ? end - start : null;
+    }
+
+    static percentile(sorted, p) {
+        const rank = Math.min(sorted.length - 1, Math.ceil(p / 100 * sorted.length) - 1);
+        return sorted[Math.max(0, rank)];
+    }
+
+    static summarize(name, values) {
+        const sorted = Float64Array.from(values).sort();
+        const row = { name, count: sorted.length };
+        for (const p of TRACE_PERCENTILES) {
+            row[`p${p}`] = sorted.length ? LatencyTracer.percentile(sorted, p) : null;
+        }
+        row.max = sorted.length ? sorted[sorted.length - 1] : null;
+        return row;
+    }
+
+    // Percentiles per segment and for the whole path
+    summary() {
+        const rows = TRACE_SEGMENTS.map((name, i) => {
+            const values = [];
+            for (const trace of this.traces) {
+                const duration = LatencyTracer.segment(trace, i);
+                if (duration !== null) values.push(duration);
+            }
+            return LatencyTracer.summarize(name, values);
+        });
+        const totals = this.traces.map(LatencyTracer.total).filter(value => value !== null);
+        rows.push(LatencyTracer.summarize('Total', totals));
+        return rows;
+    }
+
+    // Chrome trace event format: one track per segment, times in microseconds
+    exportChromeTrace() {
+        const traceEvents = TRACE_SEGMENTS.map((name, i) => ({
+            name: 'thread_name', ph: 'M', pid: 1, tid: i + 1, args: { name }
+        }));
+        const ordered = this.traces.slice(this.next).concat(this.traces.slice(0, this.next));
+        for (const trace of ordered) {
+            TRACE_SEGMENTS.forEach((name, i) => {
+                const duration = LatencyTracer.segment(trace, i);
+                if (duration === null) return;
+                traceEvents.push({
+                    name,
+                    cat: 'latency',
+                    ph: 'X',
+                    pid: 1,
+                    tid: i + 1,
+                    ts: Math.round(trace[TRACE_STAGES[i]] * 1000),
+                    dur: Math.max(0, Math.round(duration * 1000)),
+                    args: { trace: trace.id }
+                });
+            });
+        }
+        return JSON.stringify({
+            traceEvents,
+            displayTimeUnit: 'ms',
+            otherData: { stages: TRACE_STAGES, traces: ordered.length, summary: this.summary() }
+        });
+    }
+}
+
+class LatencyPanel {
+    constructor(tableBody, countEl, tracer) {
+        this.tableBody = tableBody;
+        this.countEl = countEl;
+        this.tracer = tracer;
+        this.cells = [];
+    }
+
+    render() {
+        const rows = this.tracer.summary();
+        if (!this.cells.length) {
+            for (const row of rows) {
+                const tr = document.createElement('tr');
+                const cells = ['name', 'count', ...TRACE_PERCENTILES.map(p => `p${p}`), 'max'].map(() => {
+                    const td = document.createElement('td');
+                    tr.appendChild(td);
+                    return td;
+                });
+                cells[0].textContent = row.name;
+                this.tableBody.appendChild(tr);
+                this.cells.push(cells);
+            }
+        }
+        rows.forEach((row, i) => {
+            const values = [row.count, ...TRACE_PERCENTILES.map(p => row[`p${p}`]), row.max];
+            values.forEach((value, j) => {
+                const text = value === null ? '-' : j === 0 ? String(value) : value.toFixed(2);
+                const cell = this.cells[i][j + 1];
+                if (cell.textContent !== text) cell.textContent = text;
+            });
+        });
+        this.countEl.textContent = `${this.tracer.traces.length} traces (${this.tracer.recorded} recorded)`;
+    }
+}
@@ -0,0 +1,180 @@
+// Console log model and virtualized view.
+// LogBuffer is a fixed-capacity ring buffer, so a long session uses constant
+// memory: the oldest lines are overwritten once it is full. LogView renders
+// only the rows inside the viewport from a small pool of row elements, and
+// appends are batched into one render per animation frame.
+
+const LOG_LEVELS = ['info', 'success', 'warning', 'error'];
+// Severity used by the level filter; success counts as info
+const LOG_SEVERITY = [0, 0, 1, 2];
+const LOG_CLASSES = ['', 'success-message', 'warning-message', 'error-message'];
+const LOG_SOURCES = ['APP', 'UDP', 'DRONE', 'MISSION', 'GEOFENCE', 'MAP'];
+
+class LogBuffer {
+    constructor(capacity = 5000) {
+        this.capacity = capacity;
+        this.times = new Float64Array(capacity);
+        this.levels = new Uint8Array(capacity);
+        this.sources = new Uint8Array(capacity);
+        this.texts = new Array(capacity).fill('');
+        this.total = 0; // Lines ever pushed; a line's sequence number is its index in this count
+        this.start = 0; // First sequence number after the last clear
+    }
+
+    get oldest() {
+        return Math.max(this.start, this.total - this.capacity);
+    }
+
+    push(level, source, text, time = Date.now()) {
+        const slot = this.total % this.capacity;
+        this.times[slot] = time;
+        this.levels[slot] = level;
+        this.sources[slot] = source;
+        this.texts[slot] = text;
+        return this.total++;
+    }
+
+    // Slot of a sequence number that is still in the buffer
+    slot(seq) {
+        return seq % this.capacity;
+    }
+
+    clear() {
+        // Sequence numbers keep counting, so rows never mistake a new line for an old one
+        this.texts.fill('');
+        this.start = this.total;
+    }
+}
+
+class LogView {
+    constructor(container, buffer, rowHeight = 18) {
+        this.container = container;
+        this.buffer = buffer;
+        this.rowHeight = rowHeight;
+        this.minSeverity = 0;
+        this.source = -1; // -1 shows every source
+        // Sequence numbers of the lines passing the filter, oldest first
+        this.matches = [];
+        this.matchStart = 0;
+        this.rows = [];
+        this.renderQueued = false;
+        this.stickToBottom = true;
+
+        this.spacer = document.createElement('div');
+        this.spacer.className = 'console-spacer';
+        this.rowLayer = document.createElement('div');
+        this.rowLayer.className = 'console-rows';
+        container.appendChild(this.spacer);
+        container.appendChild(this.rowLayer);
+
+        container.addEventListener('scroll', () => {
+            const bottom = container.scrollHeight - container.clientHeight;
+            this.stickToBottom = container.scrollTop >= bottom - this.rowHeight;
+            this.queueRender();
+        });
+        window.addEventListener('resize', () => this.queueRender());
+    }
+
+    passes(slot) {
+        return LOG_SEVERITY[this.buffer.levels[slot]] >= this.minSeverity &&
+            (this.source === -1 || this.buffer.sources[slot] === this.source);
+    }
+
+    append(level, source, text) {
+        // Multi-line output becomes one row per line, so every row has the same height
+        for (const line of text.split('\n')) {
+            if (!line.trim()) {
+                continue;
+            }
+            const seq = this.buffer.push(level, source, line);
+            if (this.passes(this.buffer.slot(seq))) {
+                this.matches.push(seq);
+            }
+        }
+        this.queueRender();
+    }
+
+    setFilter(minSeverity, source) {
+        this.minSeverity = minSeverity;
+        this.source = source;
+        this.matches = [];
+        this.matchStart = 0;
+        for (let seq = this.buffer.oldest; seq < this.buffer.total; seq++) {
+            if (this.passes(this.buffer.slot(seq))) {
+                this.matches.push(seq);
+            }
+        }
+        this.stickToBottom = true;
+        this.queueRender();
+    }
+
+    clear() {
+        this.buffer.clear();
+        this.matches = [];
+        this.matchStart = 0;
+        this.queueRender();
+    }
+
+    queueRender() {
+        if (!this.renderQueued) {
+            this.renderQueued = true;
+            requestAnimationFrame(() => this.render());
+        }
+    }
+
+    dropEvicted() {
+        // Lines overwritten in the ring buffer leave the filtered list too
+        const oldest = this.buffer.oldest;
+        while (this.matchStart < this.matches.length && this.matches[this.matchStart] < oldest) {
+            this.matchStart++;
+        }
+        if (this.matchStart > this.buffer.capacity) {
+            this.matches = this.matches.slice(this.matchStart);
+            this.matchStart = 0;
+        }
+    }
+
+    render() {
+        this.renderQueued = false;
+        this.dropEvicted();
+
+        const count = this.matches.length - this.matchStart;
+        const height = count * this.rowHeight;
+        if (this.spacer.style.height !== `${height}px`) {
+            this.spacer.style.height = `${height}px`;
+        }
+        if (this.stickToBottom) {
+            this.container.scrollTop = height;
+        }
+
+        const visible = Math.ceil(this.container.clientHeight / this.rowHeight) + 1;
+        const first = Math.max(0, Math.min(Math.floor(this.container.scrollTop / this.rowHeight), count - visible));
+        const shown = Math.min(visible, count);
+        this.rowLayer.style.transform = `translateY(${first * this.rowHeight}px)`;
+
+        while (this.rows.length < shown) {
+            const row = document.createElement('div');
+            row.className = 'console-row';
+            this.rowLayer.appendChild(row);
+            this.rows.push({ el: row, seq: -1 });
+        }
+        for (let i = 0; i < this.rows.length; i++) {
+            const row = this.rows[i];
+            if (i >= shown) {
+                row.el.style.display = 'none';
+                row.seq = -1;
+                continue;
+            }
+            const seq = this.matches[this.matchStart + first + i];
+            if (row.seq === seq) {
+                continue;
+            }
+            const slot = this.buffer.slot(seq);
+            const time = new Date(this.buffer.times[slot]).toLocaleTimeString();
+            row.el.style.display = '';
+            row.el.textContent = `[${time}] ${this.buffer.texts[slot]}`;
+            row.el.className = `console-row ${LOG_CLASSES[this.buffer.levels[slot]]}`;
+            row.seq = seq;
+        }
+    }
+}
@@ -0,0 +1,511 @@
+// Moving map drawn on a canvas from offline raster tiles, served from an
+// MBTiles file by src/python/tile_server.py. Decoded tiles are kept in an
+// LRU of ImageBitmaps, so panning and following the vehicle draw from
+// memory instead of fetching and decoding the same tile again; a tile not
+// loaded yet is drawn from the nearest loaded ancestor. The vehicle track
+// is a downsampled history stored in Web Mercator coordinates, so a frame
+// only scales and offsets it. Telemetry may arrive faster than the display
+// refreshes; updates only mark the map dirty and it is drawn at most once
+// per animation frame.
+
+const TILE_SIZE = 256;
+const MAX_TILE_IMAGES = 384;       // Decoded tiles kept for drawing
+const MAX_TILE_REQUESTS = 6;       // Tile fetches in flight at once
+const MAX_ANCESTOR_LEVELS = 4;     // Zoom levels searched for a stand-in tile
+const MAX_OVERZOOM = 3;            // Zoom levels allowed past the file's maximum
+const MAX_TRACK_POINTS = 2000;     // Track points kept; the older half is thinned when full
+const MIN_TRACK_STEP = 2;          // Meters moved before another track point is kept
+const PREFETCH_INTERVAL = 2000;    // ms between prefetch requests for the area ahead
+const EQUATOR_LENGTH = 40075016.686;
+
+// Web Mercator position in [0, 1) world units
+function mercatorX(lon) {
+    return (lon + 180) / 360;
+}
+
+function mercatorY(lat) {
+    const phi = Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI / 180;
+    return (1 - Math.log(Math.tan(phi) + 1 / Math.cos(phi)) / Math.PI) / 2;
+}
+
+class TrackHistory {
+    constructor(capacity = MAX_TRACK_POINTS, minStep = MIN_TRACK_STEP) {
+        this.capacity = capacity;
+        this.minStep = minStep;
+        this.xs = [];
+        this.ys = [];
+        this.tip = false; // The last point is the latest position, not yet kept
+    }
+
+    get length() {
+        return this.xs.length;
+    }
+
+    add(lat, lon) {
+        const x = mercatorX(lon);
+        const y = mercatorY(lat);
+        if (this.tip) {
+            this.xs.pop();
+            this.ys.pop();
+            this.tip = false;
+        }
+        const last = this.xs.length - 1;
+        this.xs.push(x);
+        this.ys.push(y);
+        if (last >= 0) {
+            // World units to meters at this latitude
+            const metersPerUnit = EQUATOR_LENGTH * Math.cos(lat * Math.PI / 180);
+            if (Math.hypot(x - this.xs[last], y - this.ys[last]) * metersPerUnit < this.minStep) {
+                // Too close to the last kept point; drawn, but replaced by the next position
+                this.tip = true;
+                return;
+            }
+        }
+        if (this.xs.length > this.capacity) {
+            this.thin();
+        }
+    }
+
+    // Drop every other point of the older half; recent flight keeps full detail
+    thin() {
+        const half = Math.floor(this.xs.length / 2);
+        const xs = [];
+        const ys = [];
+        for (let i = 0; i < half; i += 2) {
+            xs.push(this.xs[i]);
+            ys.push(this.ys[i]);
+        }
+        this.xs = xs.concat(this.xs.slice(half));
+        this.ys = ys.concat(this.ys.slice(half));
+    }
+
+    clear() {
+        this.xs = [];
+        this.ys = [];
+        this.tip = false;
+    }
+}
+
+class TileImageCache {
+    constructor(capacity = MAX_TILE_IMAGES) {
+        this.capacity = capacity;
+        this.tiles = new Map(); // key -> ImageBitmap, or null for a tile the file does not have
+    }
+
+    // Loaded tile (refreshing its LRU position), null if missing, undefined if not loaded
+    get(key) {
+        const image = this.tiles.get(key);
+        if (image !== undefined) {
+            this.tiles.delete(key);
+            this.tiles.set(key, image);
+        }
+        return image;
+    }
+
+    has(key) {
+        return this.tiles.has(key);
+    }
+
+    set(key, image) {
+        this.tiles.set(key, image);
+        while (this.tiles.size > this.capacity) {
+            const [oldKey, old] = this.tiles.entries().next().value;
+            this.tiles.delete(oldKey);
+            if (old) {
+                old.close();
+            }
+        }
+    }
+
+    clear() {
+        for (const image of this.tiles.values()) {
+            if (image) {
+                image.close();
+            }
+        }
+        this.tiles.clear();
+    }
+}
+
+class MapView {
+    constructor(canvas, statusEl) {
+        this.canvas = canvas;
+        this.statusEl = statusEl;
+        this.context = canvas.getContext('2d');
+        this.images = new TileImageCache();
+        this.track = new TrackHistory();
+        this.source = null;        // { url, metadata } of the tile server
+        this.generation = 0;       // Bumped when the source changes, so late tiles are ignored
+        this.zoom = 16;
+        this.centerX = 0.5;
+        this.centerY = 0.5;
+        this.follow = true;
+        this.vehicle = null;       // { x, y, heading }
+        this.route = [];           // [{ x, y }] of the planned waypoints
+        this.routePoints = [];     // [[lat, lon]] for prefetching
+        this.wanted = [];          // Tiles to fetch, nearest the center first
+        this.loading = new Set();
+        this.lastPrefetch = 0;
+        this.frameRequested = false;
+        this.width = 0;
+        this.height = 0;
+
+        this.resize();
+        new ResizeObserver(() => this.resize()).observe(canvas);
+        this.bindPointer();
+    }
+
+    setSource(url, metadata) {
+        this.images.clear();
+        this.loading.clear();
+        this.generation++;
+        this.source = { url, metadata };
+        if (!this.vehicle && metadata.center) {
+            this.centerX = mercatorX(metadata.center[0]);
+            this.centerY = mercatorY(metadata.center[1]);
+            this.zoom = Math.round(metadata.center[2] || metadata.maxzoom);
+        }
+        this.zoom = Math.max(metadata.minzoom, Math.min(metadata.maxzoom + MAX_OVERZOOM, this.zoom));
+        this.prefetchRoute();
+        this.markDirty();
+    }
+
+    setVehicle(lat, lon, heading, speed) {
+        if (typeof lat !== 'number' || typeof lon !== 'number' || (lat === 0 && lon === 0)) {
+            return;
+        }
+        const x = mercatorX(lon);
+        const y = mercatorY(lat);
+        if (this.vehicle && this.vehicle.x === x && this.vehicle.y === y && this.vehicle.heading === heading) {
+            return;
+        }
+        this.vehicle = { x, y, heading };
+        this.track.add(lat, lon);
+        if (this.follow) {
+            this.centerX = x;
+            this.centerY = y;
+        }
+        this.prefetchAhead(lat, lon, heading, speed);
+        this.markDirty();
+    }
+
+    setRoute(waypoints) {
+        this.routePoints = waypoints.map(wp => [wp.latitude, wp.longitude]);
+        this.route = waypoints.map(wp => ({ x: mercatorX(wp.longitude), y: mercatorY(wp.latitude) }));
+        this.prefetchRoute();
+        this.markDirty();
+    }
+
+    clearTrack() {
+        this.track.clear();
+        this.markDirty();
+    }
+
+    setFollow(follow) {
+        this.follow = follow;
+        if (follow && this.vehicle) {
+            this.centerX = this.vehicle.x;
+            this.centerY = this.vehicle.y;
+        }
+        this.markDirty();
+    }
+
+    zoomBy(levels) {
+        const metadata = this.source ? this.source.metadata : { minzoom: 0, maxzoom: 19 };
+        const zoom = Math.max(metadata.minzoom, Math.min(metadata.maxzoom + MAX_OVERZOOM, this.zoom + levels));
+        if (zoom !== this.zoom) {
+            this.zoom = zoom;
+            this.prefetchRoute();
+            this.markDirty();
+        }
+    }
+
+    // Tile zoom drawn for the view zoom; past the file's maximum tiles are scaled up
+    tileZoom() {
+        return this.source ? Math.min(this.zoom, this.source.metadata.maxzoom) : this.zoom;
+    }
+
+    prefetchZooms() {
+        const zoom = this.tileZoom();
+        return [zoom - 1, zoom, zoom + 1];
+    }
+
+    postPrefetch(request) {
+        if (!this.source) {
+            return;
+        }
+        // text/plain keeps the request simple, so there is no CORS preflight
+        fetch(`${this.source.url}/prefetch`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'text/plain' },
+            body: JSON.stringify(request)
+        }).catch(() => {});
+    }
+
+    prefetchRoute() {
+        if (this.routePoints.length) {
+            this.postPrefetch({ route: this.routePoints, zooms: this.prefetchZooms() });
+        }
+    }
+
+    prefetchAhead(lat, lon, heading, speed) {
+        const now = performance.now();
+        if (now - this.lastPrefetch < PREFETCH_INTERVAL) {
+            return;
+        }
+        this.lastPrefetch = now;
+        this.postPrefetch({
+            position: [lat, lon],
+            heading: typeof heading === 'number' ? heading : null,
+            speed: typeof speed === 'number' ? speed : 0,
+            zooms: [this.tileZoom()]
+        });
+    }
+
+    resize() {
+        const ratio = window.devicePixelRatio || 1;
+        this.width = this.canvas.clientWidth;
+        this.height = this.canvas.clientHeight;
+        this.canvas.width = Math.round(this.width * ratio);
+        this.canvas.height = Math.round(this.height * ratio);
+        this.context.setTransform(ratio, 0, 0, ratio, 0, 0);
+        this.markDirty();
+    }
+
+    bindPointer() {
+        let drag = null;
+        this.canvas.addEventListener('pointerdown', (event) => {
+            drag = { x: event.clientX, y: event.clientY };
+            this.canvas.setPointerCapture(event.pointerId);
+        });
+        this.canvas.addEventListener('pointermove', (event) => {
+            if (!drag) {
+                return;
+            }
+            const scale = TILE_SIZE * 2 ** this.zoom;
+            this.centerX -= (event.clientX - drag.x) / scale;
+            this.centerY -= (event.clientY - drag.y) / scale;
+            drag = { x: event.clientX, y: event.clientY };
+            this.follow = false;
+            this.markDirty();
+        });
+        this.canvas.addEventListener('pointerup', () => {
+            drag = null;
+        });
+        this.canvas.addEventListener('wheel', (event) => {
+            event.preventDefault();
+            this.zoomBy(event.deltaY < 0 ? 1 : -1);
+        }, { passive: false });
+    }
+
+    markDirty() {
+        if (!this.frameRequested) {
+            this.frameRequested = true;
+            requestAnimationFrame(() => {
+                this.frameRequested = false;
+                this.draw();
+            });
+        }
+    }
+
+    draw() {
+        const ctx = this.context;
+        const scale = TILE_SIZE * 2 ** this.zoom; // Pixels per world unit
+        const left = this.centerX * scale - this.width / 2;
+        const top = this.centerY * scale - this.height / 2;
+        ctx.fillStyle = '#1a1a1a';
+        ctx.fillRect(0, 0, this.width, this.height);
+
+        if (this.source) {
+            this.drawTiles(left, top);
+        }
+        this.drawRoute(scale, left, top);
+        this.drawTrack(scale, left, top);
+        this.drawVehicle(scale, left, top);
+        this.updateStatus();
+    }
+
+    drawTiles(left, top) {
+        const ctx = this.context;
+        const tileZoom = this.tileZoom();
+        const size = TILE_SIZE * 2 ** (this.zoom - tileZoom);
+        const count = 2 ** tileZoom;
+        // One tile of margin is loaded around the view, so movement reveals loaded tiles
+        const x0 = Math.floor(left / size) - 1;
+        const y0 = Math.max(0, Math.floor(top / size) - 1);
+        const x1 = Math.floor((left + this.width) / size) + 1;
+        const y1 = Math.min(count - 1, Math.floor((top + this.height) / size) + 1);
+        const centerTileX = (left + this.width / 2) / size;
+        const centerTileY = (top + this.height / 2) / size;
+        const wanted = [];
+
+        for (let ty = y0; ty <= y1; ty++) {
+            for (let tx = x0; tx <= x1; tx++) {
+                const x = ((tx % count) + count) % count;
+                const key = `${tileZoom}/${x}/${ty}`;
+                const image = this.images.get(key);
+                if (image === undefined && !this.loading.has(key)) {
+                    wanted.push({ key, distance: Math.hypot(tx + 0.5 - centerTileX, ty + 0.5 - centerTileY) });
+                }
+                const dx = Math.round(tx * size - left);
+                const dy = Math.round(ty * size - top);
+                const visible = dx + size > 0 && dx < this.width && dy + size > 0 && dy < this.height;
+                if (!visible) {
+                    continue;
+                }
+                if (image) {
+                    ctx.drawImage(image, dx, dy, Math.ceil(size), Math.ceil(size));
+                } else if (image === undefined) {
+                    this.drawAncestor(tileZoom, x, ty, dx, dy, size);
+                }
+            }
+        }
+
+        wanted.sort((a, b) => a.distance - b.distance);
+        this.wanted = wanted.map(tile => tile.key);
+        this.loadTiles();
+    }
+
+    // Scaled part of the nearest loaded parent tile, until the tile itself arrives
+    drawAncestor(zoom, x, y, dx, dy, size) {
+        for (let level = 1; level <= MAX_ANCESTOR_LEVELS && zoom - level >= 0; level++) {
+            const image = this.images.get(`${zoom - level}/${x >> level}/${y >> level}`);
+            if (image) {
+                const part = TILE_SIZE / 2 ** level;
+                const sx = (x - ((x >> level) << level)) * part;
+                const sy = (y - ((y >> level) << level)) * part;
+                this.context.drawImage(image, sx, sy, part, part, dx, dy, Math.ceil(size), Math.ceil(size));
+                return;
+            }
+            if (image === null) {
+                return;
+            }
+        }
+    }
+
+    loadTiles() {
+        while (this.loading.size < MAX_TILE_REQUESTS && this.wanted.length) {
+            const key = this.wanted.shift();
+            if (this.images.has(key) || this.loading.has(key)) {
+                continue;
+            }
+            this.loadTile(key);
+        }
+    }
+
+    async loadTile(key) {
+        const generation = this.generation;
+        this.loading.add(key);
+        let image = null;
+        try {
+            const response = await fetch(`${this.source.url}/tiles/${key}`);
+            if (response.ok) {
+                image = await createImageBitmap(await response.blob());
+            }
+        } catch (error) {
+            image = undefined; // Not cached, so it is requested again
+        }
+        if (generation !== this.generation) {
+            if (image) {
+                image.close();
+            }
+            return;
+        }
+        this.loading.delete(key);
+        if (image !== undefined) {
+            this.images.set(key, image);
+            this.markDirty();
+        }
+        this.loadTiles();
+    }
+
+    drawRoute(scale, left, top) {
+        if (!this.route.length) {
+            return;
+        }
+        const ctx = this.context;
+        ctx.strokeStyle = '#f39c12';
+        ctx.lineWidth = 2;
+        ctx.setLineDash([6, 4]);
+        ctx.beginPath();
+        this.route.forEach((point, i) => {
+            const x = point.x * scale - left;
+            const y = point.y * scale - top;
+            if (i === 0) {
+                ctx.moveTo(x, y);
+            } else {
+                ctx.lineTo(x, y);
+            }
+        });
+        ctx.stroke();
+        ctx.setLineDash([]);
+        ctx.fillStyle = '#f39c12';
+        for (const point of this.route) {
+            ctx.beginPath();
+            ctx.arc(point.x * scale - left, point.y * scale - top, 4, 0, 2 * Math.PI);
+            ctx.fill();
+        }
+    }
+
+    drawTrack(scale, left, top) {
+        const { xs, ys } = this.track;
+        if (xs.length < 2) {
+            return;
+        }
+        const ctx = this.context;
+        ctx.strokeStyle = '#00d2ff';
+        ctx.lineWidth = 2;
+        ctx.beginPath();
+        let lastX = xs[0] * scale - left;
+        let lastY = ys[0] * scale - top;
+        ctx.moveTo(lastX, lastY);
+        for (let i = 1; i < xs.length; i++) {
+            const x = xs[i] * scale - left;
+            const y = ys[i] * scale - top;
+            // Points under a pixel apart at this zoom add nothing to the line
+            if (Math.abs(x - lastX) + Math.abs(y - lastY) >= 1 || i === xs.length - 1) {
+                ctx.lineTo(x, y);
+                lastX = x;
+                lastY = y;
+            }
+        }
+        ctx.stroke();
+    }
+
+    drawVehicle(scale, left, top) {
+        if (!this.vehicle) {
+            return;
+        }
+        const ctx = this.context;
+        ctx.save();
+        ctx.translate(this.vehicle.x * scale - left, this.vehicle.y * scale - top);
+        ctx.rotate((this.vehicle.heading || 0) * Math.PI / 180);
+        ctx.fillStyle = '#e74c3c';
+        ctx.strokeStyle = '#ffffff';
+        ctx.lineWidth = 1.5;
+        ctx.beginPath();
+        ctx.moveTo(0, -11);
+        ctx.lineTo(7, 8);
+        ctx.lineTo(0, 4);
+        ctx.lineTo(-7, 8);
+        ctx.closePath();
+        ctx.fill();
+        ctx.stroke();
+        ctx.restore();
+    }
+
+    updateStatus() {
+        let text = 'No offline map loaded';
+        if (this.source) {
+            const metadata = this.source.metadata;
+            text = `${metadata.name || 'Map'} | zoom ${this.zoom}${this.follow ? ' | following' : ''}`;
+            if (metadata.attribution) {
+                text += ` | ${metadata.attribution.replace(/<[^>]*>/g, '')}`;
+            }
+        }
+        if (this.statusEl.dataset.text !== text) {
+            this.statusEl.dataset.text = text;
+            this.statusEl.textContent = text;
+        }
+    }
+}
@@ -14,6 +14,9 @@ const altitudeInput = document.getElementById('altitude');
 const waitTimeInput = document.getElementById('wait-time');
 const startMissionBtn = document.getElementById('start-mission-btn');
 const stopMissionBtn = document.getElementById('stop-mission-btn');
+const loadMissionBtn = document.getElementById('load-mission-btn');
+const clearMissionBtn = document.getElementById('clear-mission-btn');
+const missionFileText = document.getElementById('mission-file-text');
 
 const droneStatusEl = document.getElementById('drone-status');
 const droneModeEl = document.getElementById('drone-mode');
@@ -23,28 +26,73 @@ const droneLatEl = document.getElementById('drone-lat');
 const droneLonEl = document.getElementById('drone-lon');
 const droneBatteryEl = document.getElementById('drone-battery');
 const distanceTargetEl = document.getElementById('distance-target');
+const droneGeofenceEl = document.getElementById('drone-geofence');
+const droneDataAgeEl = document.getElementById('drone-data-age');
+const droneClimbEl = document.getElementById('drone-climb');
+const droneHomeEl = document.getElementById('drone-home');
+const droneEtaEl = document.getElementById('drone-eta');
+const droneFlightTimeEl = document.getElementById('drone-flight-time');
 
 const consoleEl = document.getElementById('console');
 const clearConsoleBtn = document.getElementById('clear-console');
+const consoleLevelSelect = document.getElementById('console-level');
+const consoleSourceSelect = document.getElementById('console-source');
+
+// Bounded console: ring buffer model, only visible rows are rendered
+const consoleLog = new LogView(consoleEl, new LogBuffer(5000));
+
+const loadMapBtn = document.getElementById('load-map-btn');
+const mapFollowBtn = document.getElementById('map-follow-btn');
+const mapZoomInBtn = document.getElementById('map-zoom-in-btn');
+const mapZoomOutBtn = document.getElementById('map-zoom-out-btn');
+const mapClearTrackBtn = document.getElementById('map-clear-track-btn');
+const mapView = new MapView(document.getElementById('map-canvas'), document.getElementById('map-status'));
+
+const exportTraceBtn = document.getElementById('export-trace-btn');
+const resetTraceBtn = document.getElementById('reset-trace-btn');
+const latencyTracer = new LatencyTracer();
+const latencyPanel = new LatencyPanel(
+    document.getElementById('latency-table-body'),
+    document.getElementById('latency-count'),
+    latencyTracer
+);
 
 // State variables
 let isUdpConnected = false;
 let isMissionRunning = false;
+let loadedMission = null;
+let droneStatus = {};
+let pendingStatus = null;
+let pendingTrace = null;
 
 // Event listeners
 connectBtn.addEventListener('click', startUdpServer);
 disconnectBtn.addEventListener('click', stopUdpServer);
 startMissionBtn.addEventListener('click', startMission);
 stopMissionBtn.addEventListener('click', stopMission);
+loadMissionBtn.addEventListener('click', loadMissionFile);
+clearMissionBtn.addEventListener('click', clearMissionFile);
 clearConsoleBtn.addEventListener('click', clearConsole);
+consoleLevelSelect.addEventListener('change', applyConsoleFilter);
+consoleSourceSelect.addEventListener('change', applyConsoleFilter);
+exportTraceBtn.addEventListener('click', exportTrace);
+resetTraceBtn.addEventListener('click', resetTrace);
+loadMapBtn.addEventListener('click', loadMapTiles);
+mapFollowBtn.addEventListener('click', () => mapView.setFollow(true));
+mapZoomInBtn.addEventListener('click', () => mapView.zoomBy(1));
+mapZoomOutBtn.addEventListener('click', () => mapView.zoomBy(-1));
+mapClearTrackBtn.addEventListener('click', () => mapView.clearTrack());
 
 // IPC event listeners
 ipcRenderer.on('udp-status', (event, status) => {
     updateUdpStatus(status);
 });
 
-ipcRenderer.on('udp-message', (event, data) => {
-    addToConsole(`[UDP] ${data.from}: ${data.message}`, 'info');
+ipcRenderer.on('udp-messages', (event, batch) => {
+    if (batch.dropped) {
+        addToConsole(`[UDP] ${batch.dropped} messages not shown`, 'info');
+    }
+    batch.items.forEach(data => addToConsole(`[UDP] ${data.from}: ${data.message}`, 'info'));
 });
 
 ipcRenderer.on('udp-error', (event, error) => {
@@ -65,8 +113,23 @@ ipcRenderer.on('mission-complete', (event, code) => {
     updateMissionButtons();
 });
 
-ipcRenderer.on('drone-status-update', (event, status) => {
-    updateDroneStatus(status);
+ipcRenderer.on('geofence-event', (event, fence) => {
+    const distance = fence.distance !== null ? ` (${fence.distance.toFixed(1)} m)` : '';
+    if (fence.status === 'breach') {
+        addToConsole(`[GEOFENCE] Breach: ${fence.fence}${distance}`, 'error');
+    } else if (fence.status === 'near_breach') {
+        addToConsole(`[GEOFENCE] Approaching ${fence.fence}${distance}`, 'warning');
+    } else {
+        addToConsole('[GEOFENCE] Clear of all fences', 'info');
+    }
+});
+
+ipcRenderer.on('drone-status-delta', (event, delta, trace) => {
+    if (trace) {
+        trace.deliver = traceClock();
+        pendingTrace = trace;
+    }
+    queueStatus(delta);
 });
 
 // Functions
@@ -98,7 +161,54 @@ async function stopUdpServer() {
     }
 }
 
+async function loadMissionFile() {
+    try {
+        const result = await ipcRenderer.invoke('load-mission-file');
+        if (result.canceled) {
+            return;
+        }
+        if (!result.success) {
+            addToConsole(`[MISSION ERROR] ${result.message}`, 'error');
+            return;
+        }
+        loadedMission = result.mission;
+        missionFileText.textContent = `${result.name} (${loadedMission.waypoints.length} waypoints)`;
+        addToConsole(`[MISSION] Loaded ${result.name}: ${loadedMission.waypoints.length} waypoints`, 'info');
+        mapView.setRoute(loadedMission.waypoints);
+        updateMissionButtons();
+    } catch (error) {
+        addToConsole(`[MISSION ERROR] ${error.message}`, 'error');
+    }
+}
+
+function clearMissionFile() {
+    loadedMission = null;
+    missionFileText.textContent = 'Single target mission';
+    mapView.setRoute([]);
+    updateMissionButtons();
+}
+
+async function startWaypointMission() {
+    try {
+        const result = await ipcRenderer.invoke('start-mission', { mission: loadedMission });
+        if (result.success) {
+            addToConsole(`[MISSION] ${result.message}`, 'success');
+            addToConsole(`[MISSION] Flying ${loadedMission.waypoints.length} waypoints`, 'info');
+            isMissionRunning = true;
+            updateMissionButtons();
+        } else {
+            addToConsole(`[MISSION ERROR] ${result.message}`, 'error');
+        }
+    } catch (error) {
+        addToConsole(`[MISSION ERROR] ${error.message}`, 'error');
+    }
+}
+
 async function startMission() {
+    if (loadedMission) {
+        return startWaypointMission();
+    }
+    
     const missionParams = {
         latitude: parseFloat(latitudeInput.value),
         longitude: parseFloat(longitudeInput.value),
@@ -123,6 +233,7 @@ async function startMission() {
         if (result.success) {
             addToConsole(`[MISSION] ${result.message}`, 'success');
             addToConsole(`[MISSION] Target: ${missionParams.latitude}, ${missionParams.longitude} at ${missionParams.altitude}m`, 'info');
+            mapView.setRoute([missionParams]);
             isMissionRunning = true;
             updateMissionButtons();
         } else {
@@ -166,20 +277,82 @@ function updateMissionButtons() {
     // Enable mission controls only if UDP is connected
     startMissionBtn.disabled = !isUdpConnected || isMissionRunning;
     stopMissionBtn.disabled = !isMissionRunning;
+    loadMissionBtn.disabled = isMissionRunning;
+    clearMissionBtn.disabled = isMissionRunning || !loadedMission;
+}
+
+// Status fields and the DOM element each one renders into
+const statusBindings = [
+    { el: droneStatusEl, keys: ['status'], format: status => String(status.status) },
+    { el: droneModeEl, keys: ['mode'], format: status => String(status.mode) },
+    { el: droneArmedEl, keys: ['armed'], format: status => status.armed ? 'Yes' : 'No' },
+    { el: droneAltitudeEl, keys: ['altitude'], format: status => `${status.altitude.toFixed(1)} m` },
+    { el: droneLatEl, keys: ['latitude'], format: status => status.latitude.toFixed(6) },
+    { el: droneLonEl, keys: ['longitude'], format: status => status.longitude.toFixed(6) },
+    { el: droneBatteryEl, keys: ['battery'], format: status => `${status.battery}%` },
+    { el: distanceTargetEl, keys: ['distanceToTarget'], format: status => formatNumber(status.distanceToTarget, 1, ' m') },
+    { el: droneClimbEl, keys: ['climbRate'], format: status => formatNumber(status.climbRate, 1, ' m/s') },
+    { el: droneHomeEl, keys: ['homeDistance', 'homeBearing'], format: formatHome },
+    { el: droneEtaEl, keys: ['eta'], format: status => formatDuration(status.eta) },
+    { el: droneFlightTimeEl, keys: ['flightTimeLeft', 'batteryDrain'], format: formatFlightTime },
+    { el: droneGeofenceEl, keys: ['geofence', 'fenceName', 'fenceDistance'], format: formatGeofence },
+    { el: droneDataAgeEl, keys: ['dataAge', 'linkRtt'], format: formatDataAge }
+];
+
+// Deltas arriving within one display frame are merged and painted once
+function queueStatus(delta) {
+    if (!pendingStatus) {
+        pendingStatus = {};
+        requestAnimationFrame(flushStatus);
+    }
+    Object.assign(pendingStatus, delta);
+}
+
+function flushStatus() {
+    const changes = pendingStatus;
+    const trace = pendingTrace;
+    pendingStatus = null;
+    pendingTrace = null;
+    Object.assign(droneStatus, changes);
+    updateDroneStatus(changes);
+
+    if (trace) {
+        trace.render = traceClock();
+        // The next frame callback runs once the frame with this update was painted
+        requestAnimationFrame(() => {
+            trace.paint = traceClock();
+            latencyTracer.record(trace);
+        });
+    }
+}
+
+function setText(el, text) {
+    // Skip the DOM write (and the layout it invalidates) when nothing changed
+    if (el.dataset.text !== text) {
+        el.dataset.text = text;
+        el.textContent = text;
+    }
 }
 
-function updateDroneStatus(status) {
-    droneStatusEl.textContent = status.status;
-    droneModeEl.textContent = status.mode;
-    droneArmedEl.textContent = status.armed ? 'Yes' : 'No';
-    droneAltitudeEl.textContent = `${status.altitude.toFixed(1)} m`;
-    droneLatEl.textContent = status.latitude.toFixed(6);
-    droneLonEl.textContent = status.longitude.toFixed(6);
-    droneBatteryEl.textContent = `${status.battery}%`;
-    distanceTargetEl.textContent = `${status.distanceToTarget.toFixed(1)} m`;
+function updateDroneStatus(changes) {
+    for (const binding of statusBindings) {
+        if (binding.keys.some(key => key in changes)) {
+            setText(binding.el, binding.format(droneStatus));
+        }
+    }
+    
+    if ('latitude' in changes || 'longitude' in changes || 'heading' in changes) {
+        mapView.setVehicle(droneStatus.latitude, droneStatus.longitude, droneStatus.heading, droneStatus.groundspeed);
+    }
     
     // Update connection indicator based on drone connection
-    if (status.connected) {
+    if ('connected' in changes) {
+        updateConnectionIndicator();
+    }
+}
+
+function updateConnectionIndicator() {
+    if (droneStatus.connected) {
         connectionIndicator.classList.add('connected');
         connectionText.textContent = 'Drone Connected';
     } else if (isUdpConnected) {
@@ -188,36 +361,116 @@ function updateDroneStatus(status) {
     }
 }
 
-function addToConsole(message, type = 'info') {
-    const timestamp = new Date().toLocaleTimeString();
-    const logLine = `[${timestamp}] ${message}\n`;
-    
-    const span = document.createElement('span');
-    span.textContent = logLine;
-    
-    switch (type) {
-        case 'error':
-            span.className = 'error-message';
-            break;
-        case 'success':
-            span.className = 'success-message';
-            break;
-        case 'warning':
-            span.className = 'warning-message';
-            break;
-        default:
-            break;
+function formatGeofence(status) {
+    if (!status.geofence) {
+        return '-';
     }
-    
-    consoleEl.appendChild(span);
-    consoleEl.scrollTop = consoleEl.scrollHeight;
+    if (status.geofence === 'ok') {
+        return 'OK';
+    }
+    const label = status.geofence === 'breach' ? 'BREACH' : 'NEAR';
+    if (status.fenceName && typeof status.fenceDistance === 'number') {
+        return `${label} ${status.fenceName} (${status.fenceDistance.toFixed(1)} m)`;
+    }
+    return label;
+}
+
+function formatNumber(value, digits, unit) {
+    return typeof value === 'number' ? `${value.toFixed(digits)}${unit}` : '-';
+}
+
+function formatDuration(seconds) {
+    if (typeof seconds !== 'number') {
+        return '-';
+    }
+    const total = Math.round(seconds);
+    const minutes = Math.floor(total / 60);
+    return `${minutes}:${String(total % 60).padStart(2, '0')}`;
+}
+
+function formatHome(status) {
+    if (typeof status.homeDistance !== 'number') {
+        return '-';
+    }
+    const bearing = typeof status.homeBearing === 'number' ? ` @ ${status.homeBearing.toFixed(0)}°` : '';
+    return `${status.homeDistance.toFixed(0)} m${bearing}`;
+}
+
+function formatFlightTime(status) {
+    if (typeof status.flightTimeLeft !== 'number') {
+        return '-';
+    }
+    const drain = typeof status.batteryDrain === 'number' ? ` (${status.batteryDrain.toFixed(1)} %/min)` : '';
+    return `${formatDuration(status.flightTimeLeft)}${drain}`;
+}
+
+function formatDataAge(status) {
+    if (typeof status.dataAge !== 'number') {
+        return '-';
+    }
+    const rtt = typeof status.linkRtt === 'number' ? ` (RTT ${status.linkRtt.toFixed(0)} ms)` : '';
+    return `${status.dataAge.toFixed(0)} ms${rtt}`;
+}
+
+function addToConsole(message, type = 'info') {
+    // The [SOURCE] prefix of a message selects its source for filtering
+    const prefix = /^\[([A-Z]+)/.exec(message);
+    const source = prefix ? LOG_SOURCES.indexOf(prefix[1]) : -1;
+    const level = LOG_LEVELS.indexOf(type);
+    consoleLog.append(level === -1 ? 0 : level, source === -1 ? 0 : source, message);
+}
+
+function applyConsoleFilter() {
+    consoleLog.setFilter(parseInt(consoleLevelSelect.value), parseInt(consoleSourceSelect.value));
 }
 
 function clearConsole() {
-    consoleEl.innerHTML = '';
+    consoleLog.clear();
     addToConsole('Console cleared', 'info');
 }
 
+async function exportTrace() {
+    if (!latencyTracer.traces.length) {
+        addToConsole('[TRACE] No latency traces recorded yet', 'warning');
+        return;
+    }
+    try {
+        const result = await ipcRenderer.invoke('save-trace', latencyTracer.exportChromeTrace());
+        if (result.success) {
+            addToConsole(`[TRACE] ${result.message}`, 'success');
+        } else if (!result.canceled) {
+            addToConsole(`[TRACE ERROR] ${result.message}`, 'error');
+        }
+    } catch (error) {
+        addToConsole(`[TRACE ERROR] ${error.message}`, 'error');
+    }
+}
+
+function resetTrace() {
+    latencyTracer.clear();
+    latencyPanel.render();
+}
+
+function showMapTiles(result) {
+    const { metadata } = result;
+    mapView.setSource(result.url, metadata);
+    addToConsole(`[MAP] Offline map ${result.name}: ${metadata.name || 'unnamed'} ` +
+                 `(${metadata.format}, zoom ${metadata.minzoom}-${metadata.maxzoom})`, 'success');
+}
+
+async function loadMapTiles() {
+    try {
+        const result = await ipcRenderer.invoke('load-map-tiles');
+        if (result.success) {
+            showMapTiles(result);
+        } else if (!result.canceled) {
+            addToConsole(`[MAP ERROR] ${result.message}`, 'error');
+        }
+    } catch (error) {
+        addToConsole(`[MAP ERROR] ${error.message}`, 'error');
+    }
+}
+
 // Input validation functions
 function validateCoordinates() {
     const lat = parseFloat(latitudeInput.value);
@@ -317,6 +570,15 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Initial validation
     validateCoordinates();
+    
+    // Offline map given with MAP_TILES, once its tile server is up
+    ipcRenderer.invoke('get-map-tiles').then((result) => {
+        if (result.success) {
+            showMapTiles(result);
+        } else if (result.message) {
+            addToConsole(`[MAP ERROR] ${result.message}`, 'error');
+        }
+    });
 });
 
 // Save settings to localStorage when they change
@@ -363,15 +625,13 @@ document.addEventListener('keydown', (event) => {
     }
 });
 
-// Auto-refresh drone status every second
-setInterval(async () => {
-    try {
-        const status = await ipcRenderer.invoke('get-drone-status');
-        updateDroneStatus(status);
-    } catch (error) {
-        console.error('Error getting drone status:', error);
-    }
-}, 1000);
+// Full status once at startup; after that the main process pushes deltas
+ipcRenderer.invoke('get-drone-status')
+    .then(queueStatus)
+    .catch(error => console.error('Error getting drone status:', error));
+
+// Latency percentiles are recomputed once a second
+setInterval(() => latencyPanel.render(), 1000);
 
 // Connection health check
 setInterval(() => {
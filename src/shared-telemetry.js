@@ -0,0 +1,97 @@
+// Latest numeric telemetry shared between the UDP ingest worker and the main
+// process through a SharedArrayBuffer. The worker is the only writer; the
+// main thread reads the newest values whenever it needs them without a
+// message round trip.
+//
+// Consistency uses a sequence lock: the writer makes the version odd while
+// it writes and even again when done, and a reader retries if the version
+// was odd or changed while it copied. A bit mask of the fields written since
+// the last read keeps the meaning of a partial update: fields a datagram did
+// not carry are not reported again. NaN stands for null.
+const NUMERIC_FIELDS = [
+  'latitude',
+  'longitude',
+  'altitude',
+  'battery',
+  'groundspeed',
+  'heading',
+  'fenceDistance',
+  'dataAge',
+  'linkRtt',
+  'climbRate',
+  'homeDistance',
+  'homeBearing',
+  'distanceToTarget',
+  'eta',
+  'batteryDrain',
+  'flightTimeLeft',
+  'armed',      // 0/1
+  'connected'   // 0/1
+];
+const BOOLEAN_FIELDS = new Set(['armed', 'connected']);
+const FIELD_INDEX = new Map(NUMERIC_FIELDS.map((name, i) => [name, i]));
+const HEADER_BYTES = 8;        // Int32 version, Int32 changed-field mask
+const MAX_READ_RETRIES = 100;  // A reader gives up after this many torn reads
+
+function createSharedBuffer() {
+  return new SharedArrayBuffer(HEADER_BYTES + NUMERIC_FIELDS.length * Float64Array.BYTES_PER_ELEMENT);
+}
+
+class SharedTelemetry {
+  constructor(buffer) {
+    this.buffer = buffer;
+    this.header = new Int32Array(buffer, 0, 2);
+    this.values = new Float64Array(buffer, HEADER_BYTES, NUMERIC_FIELDS.length);
+  }
+
+  // Writer side: store the given numeric fields; undefined values are ignored
+  // Returns true if any field was stored
+  write(fields) {
+    let mask = 0;
+    Atomics.add(this.header, 0, 1);
+    for (const key of Object.keys(fields)) {
+      const index = FIELD_INDEX.get(key);
+      const value = fields[key];
+      if (index === undefined || value === undefined) continue;
+      this.values[index] = value === null ? NaN : Number(value);
+      mask |= 1 << index;
+    }
+    Atomics.add(this.header, 0, 1);
+    if (mask) {
+      Atomics.or(this.header, 1, mask);
+    }
+    return mask !== 0;
+  }
+
+  // Reader side: the fields written since the last read, or null if there are none
+  read() {
+    // Take the mask before copying: a write racing the copy sets its bits
+    // again and is reported (possibly twice), never lost
+    const mask = Atomics.exchange(this.header, 1, 0);
+    if (!mask) return null;
+
+    for (let attempt = 0; attempt < MAX_READ_RETRIES; attempt++) {
+      const before = Atomics.load(this.header, 0);
+      if (before & 1) continue;
+      const copy = Float64Array.from(this.values);
+      if (Atomics.load(this.header, 0) !== before) continue;
+
+      const fields = {};
+      NUMERIC_FIELDS.forEach((name, i) => {
+        if (!(mask & (1 << i))) return;
+        const value = copy[i];
+        if (Number.isNaN(value)) {
+          fields[name] = null;
+        } else {
+          fields[name] = BOOLEAN_FIELDS.has(name) ? value !== 0 : value;
+        }
+      });
+      return fields;
+    }
+    // Persistent contention; report the fields on the next read
+    Atomics.or(this.header, 1, mask);
+    return null;
+  }
+}
+
+module.exports = { SharedTelemetry, createSharedBuffer, NUMERIC_FIELDS };
@@ -0,0 +1,105 @@
+// Coalesced status push from the main process to the renderer.
+// Telemetry can arrive at 50+ Hz; instead of sending the whole status on
+// every datagram, changes are merged into the current state and flushed at
+// most once per interval as a delta holding only the fields that changed.
+// List channels (e.g. raw UDP lines for the console) are batched into the
+// same flush. A latency trace (see latency-trace.js) can ride along with
+// the next delta and is stamped when that delta is sent.
+const { traceClock } = require('./latency-trace');
+
+const DEFAULT_RATE = 60;       // Flushes per second, about one per display frame
+const MAX_BATCH_ITEMS = 50;    // Newest list items kept per channel and flush
+
+class StatusChannel {
+  constructor(send, initialState = {}, rate = DEFAULT_RATE) {
+    this.send = send;
+    this.state = { ...initialState };
+    this.interval = 1000 / rate;
+    this.changed = new Set();
+    this.batches = new Map();
+    this.timer = null;
+    this.lastFlush = 0;
+    this.trace = null;
+  }
+
+  // Merge fields into the state; undefined values are ignored
+  update(fields) {
+    for (const key of Object.keys(fields)) {
+      const value = fields[key];
+      if (value !== undefined && this.state[key] !== value) {
+        this.state[key] = value;
+        this.changed.add(key);
+      }
+    }
+    if (this.changed.size) {
+      this.schedule();
+    }
+  }
+
+  // Queue an item for a list channel, sent as an array with the next flush
+  append(channel, item) {
+    this.appendBatch(channel, [item]);
+  }
+
+  // Queue several items at once; dropped counts items already discarded upstream
+  appendBatch(channel, items, dropped = 0) {
+    let batch = this.batches.get(channel);
+    if (!batch) {
+      batch = { items: [], dropped: 0 };
+      this.batches.set(channel, batch);
+    }
+    batch.items.push(...items);
+    batch.dropped += dropped;
+    if (batch.items.length > MAX_BATCH_ITEMS) {
+      const excess = batch.items.length - MAX_BATCH_ITEMS;
+      batch.items.splice(0, excess);
+      batch.dropped += excess;
+    }
+    this.schedule();
+  }
+
+  // Attach a trace to the next delta; a newer trace replaces one not yet sent
+  setTrace(trace) {
+    this.trace = trace;
+  }
+
+  schedule() {
+    if (this.timer) {
+      return;
+    }
+    const delay = Math.max(0, this.lastFlush + this.interval - Date.now());
+    this.timer = setTimeout(() => this.flush(), delay);
+  }
+
+  flush() {
+    this.timer = null;
+    this.lastFlush = Date.now();
+
+    if (this.changed.size) {
+      const delta = {};
+      for (const key of this.changed) {
+        delta[key] = this.state[key];
+      }
+      this.changed.clear();
+      if (this.trace) {
+        this.trace.ipc = traceClock();
+        this.send('drone-status-delta', delta, this.trace);
+      } else {
+        this.send('drone-status-delta', delta);
+      }
+    }
+    // A trace whose data changed nothing on screen has no paint to measure
+    this.trace = null;
+
+    for (const [channel, batch] of this.batches) {
+      this.send(channel, batch);
+    }
+    this.batches.clear();
+  }
+
+  snapshot() {
+    return { ...this.state };
+  }
+}
+
+module.exports = { StatusChannel, DEFAULT_RATE };
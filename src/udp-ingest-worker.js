@@ -0,0 +1,289 @@
+// UDP telemetry ingest, run in a worker thread.
+// Receiving, decoding (JSON from our scripts and the MAVLink parser, or raw
+// MAVLink frames) and merging telemetry all happen here, so a high-rate
+// link never competes with window management and IPC on the main process
+// thread. Numeric telemetry is written straight into the SharedArrayBuffer
+// (see shared-telemetry.js); text fields, console lines and geofence events
+// are posted to the main thread at most once per flush interval.
+const { parentPort, workerData } = require('worker_threads');
+const dgram = require('dgram');
+const { SharedTelemetry } = require('./shared-telemetry');
+const { traceClock } = require('./latency-trace');
+
+const MAX_BATCH_ITEMS = 50;    // Newest console lines kept per flush
+const MAVLINK1_MAGIC = 0xFE;
+const MAVLINK2_MAGIC = 0xFD;
+const MAVLINK2_SIGNED = 0x01;
+const SIGNATURE_LEN = 13;
+const MAV_MODE_FLAG_SAFETY_ARMED = 0x80;
+const MAV_AUTOPILOT_ARDUPILOTMEGA = 3;
+const HEARTBEAT_ID = 0;
+const SYS_STATUS_ID = 1;
+const GLOBAL_POSITION_INT_ID = 33;
+const VFR_HUD_ID = 74;
+// Largest payload offset read from each message, for MAVLink 2 zero truncation
+const PAYLOAD_SIZE = { [HEARTBEAT_ID]: 9, [SYS_STATUS_ID]: 31, [GLOBAL_POSITION_INT_ID]: 28, [VFR_HUD_ID]: 20 };
+// ArduCopter flight modes by custom_mode, as pymavlink names them
+const COPTER_MODES = [
+  'STABILIZE', 'ACRO', 'ALT_HOLD', 'AUTO', 'GUIDED', 'LOITER', 'RTL', 'CIRCLE',
+  null, 'LAND', null, 'DRIFT', null, 'SPORT', 'FLIP', 'AUTOTUNE', 'POSHOLD',
+  'BRAKE', 'THROW', 'AVOID_ADSB', 'GUIDED_NOGPS', 'SMART_RTL'
+];
+const TEXT_FIELDS = ['mode', 'status', 'geofence', 'fenceName'];
+
+const shared = new SharedTelemetry(workerData.buffer);
+const flushInterval = 1000 / workerData.rate;
+
+let socket = null;
+let textState = {};
+let changedText = {};
+let lines = { items: [], dropped: 0 };
+let events = [];
+let trace = null;
+let numericChanged = false;
+let flushTimer = null;
+let lastFlush = 0;
+
+// Copy only the fields that are present, so they do not mask earlier values
+function assignDefined(target, fields) {
+  for (const key of Object.keys(fields)) {
+    if (fields[key] !== undefined) target[key] = fields[key];
+  }
+  return target;
+}
+
+function merge(update) {
+  if (shared.write(update)) {
+    numericChanged = true;
+  }
+  for (const key of TEXT_FIELDS) {
+    const value = update[key];
+    if (value !== undefined && textState[key] !== value) {
+      textState[key] = value;
+      changedText[key] = value;
+    }
+  }
+}
+
+function telemetryFromJSON(telemetry) {
+  // Telemetry from the simple UDP mission script
+  const update = {
+    latitude: telemetry.latitude,
+    longitude: telemetry.longitude,
+    altitude: telemetry.altitude,
+    mode: telemetry.mode,
+    armed: telemetry.armed,
+    battery: telemetry.battery,
+    groundspeed: telemetry.groundspeed,
+    heading: telemetry.heading,
+    connected: telemetry.connected,
+    status: telemetry.status,
+    geofence: telemetry.geofence
+  };
+
+  // MAVLink parser data structure
+  if (telemetry.drone_status) {
+    const status = telemetry.drone_status;
+
+    assignDefined(update, {
+      latitude: status.latitude,
+      longitude: status.longitude,
+      altitude: status.altitude,
+      mode: status.mode,
+      armed: status.armed,
+      battery: status.battery,
+      groundspeed: status.groundspeed,
+      heading: status.heading,
+      connected: status.connected,
+      status: status.system_status
+    });
+    if (status.geofence !== undefined) {
+      update.geofence = status.geofence;
+      update.fenceName = status.fence_name;
+      update.fenceDistance = status.fence_distance;
+    }
+  }
+
+  // Streaming estimates from the parser (see flight_metrics.py)
+  if (telemetry.derived) {
+    const derived = telemetry.derived;
+    assignDefined(update, {
+      climbRate: derived.climb_rate,
+      homeDistance: derived.home_distance,
+      homeBearing: derived.home_bearing,
+      distanceToTarget: derived.target_distance,
+      eta: derived.target_eta,
+      batteryDrain: derived.battery_drain,
+      flightTimeLeft: derived.flight_time_left
+    });
+  }
+
+  // Vehicle-time age of the position, from the parser's TIMESYNC estimate
+  update.dataAge = telemetry.position_age_ms;
+  if (telemetry.timesync && telemetry.timesync.rtt_ms !== null) update.linkRtt = telemetry.timesync.rtt_ms;
+
+  if (telemetry.geofence_events) {
+    events.push(...telemetry.geofence_events);
+  }
+  // Only the newest trace of a flush interval goes on; the others were coalesced away
+  if (telemetry.trace) {
+    trace = telemetry.trace;
+  }
+  return update;
+}
+
+// Payload of a frame as a DataView at least `size` bytes long;
+// MAVLink 2 drops trailing zero bytes, which are restored here
+function payloadView(data, start, length, size) {
+  if (length >= size) {
+    return new DataView(data.buffer, data.byteOffset + start, length);
+  }
+  const padded = new Uint8Array(size);
+  padded.set(data.subarray(start, start + length));
+  return new DataView(padded.buffer);
+}
+
+function decodeMessage(update, msgid, payload) {
+  switch (msgid) {
+    case HEARTBEAT_ID: {
+      const customMode = payload.getUint32(0, true);
+      const autopilot = payload.getUint8(5);
+      update.armed = (payload.getUint8(6) & MAV_MODE_FLAG_SAFETY_ARMED) !== 0;
+      update.mode = (autopilot === MAV_AUTOPILOT_ARDUPILOTMEGA && COPTER_MODES[customMode]) || `Mode(${customMode})`;
+      update.connected = true;
+      break;
+    }
+    case SYS_STATUS_ID: {
+      const remaining = payload.getInt8(30);
+      if (remaining >= 0) update.battery = remaining;
+      break;
+    }
+    case GLOBAL_POSITION_INT_ID:
+      update.latitude = payload.getInt32(4, true) / 1e7;
+      update.longitude = payload.getInt32(8, true) / 1e7;
+      update.altitude = payload.getInt32(16, true) / 1000;
+      if (payload.getUint16(26, true) !== 0xFFFF) update.heading = payload.getUint16(26, true) / 100;
+      break;
+    case VFR_HUD_ID:
+      update.groundspeed = payload.getFloat32(4, true);
+      break;
+  }
+}
+
+// Decode the frames of a raw MAVLink datagram; returns the frame count
+function telemetryFromFrames(data, update) {
+  let count = 0;
+  let i = 0;
+  while (i < data.length) {
+    const magic = data[i];
+    let start;
+    let end;
+    let msgid;
+    if (magic === MAVLINK2_MAGIC && i + 10 <= data.length) {
+      start = i + 10;
+      end = start + data[i + 1] + 2 + (data[i + 2] & MAVLINK2_SIGNED ? SIGNATURE_LEN : 0);
+      msgid = data[i + 7] | (data[i + 8] << 8) | (data[i + 9] << 16);
+    } else if (magic === MAVLINK1_MAGIC && i + 6 <= data.length) {
+      start = i + 6;
+      end = start + data[i + 1] + 2;
+      msgid = data[i + 5];
+    } else {
+      i++;
+      continue;
+    }
+    if (end > data.length) break;
+    const size = PAYLOAD_SIZE[msgid];
+    if (size !== undefined) {
+      decodeMessage(update, msgid, payloadView(data, start, data[i + 1], size));
+    }
+    count++;
+    i = end;
+  }
+  return count;
+}
+
+function handleDatagram(msg, remote) {
+  const ingested = traceClock();
+  const first = msg[0];
+  let update;
+  let text;
+  if (first === MAVLINK1_MAGIC || first === MAVLINK2_MAGIC) {
+    update = {};
+    const frames = telemetryFromFrames(msg, update);
+    text = `<${msg.length} bytes, ${frames} MAVLink frames>`;
+    if (!frames) {
+      update = { connected: true, status: 'Receiving data' };
+    }
+  } else {
+    text = msg.toString();
+    try {
+      // JSON telemetry from our mission scripts
+      update = telemetryFromJSON(JSON.parse(text));
+      if (trace && trace.ingest === undefined) {
+        trace.ingest = ingested;
+      }
+    } catch (error) {
+      // Raw (non-JSON) data still means the link is alive
+      update = { connected: true, status: 'Receiving data' };
+    }
+  }
+  merge(update);
+
+  lines.items.push({ from: `${remote.address}:${remote.port}`, message: text });
+  if (lines.items.length > MAX_BATCH_ITEMS) {
+    lines.items.shift();
+    lines.dropped++;
+  }
+  schedule();
+}
+
+function schedule() {
+  if (flushTimer) {
+    return;
+  }
+  const delay = Math.max(0, lastFlush + flushInterval - Date.now());
+  flushTimer = setTimeout(flush, delay);
+}
+
+function flush() {
+  flushTimer = null;
+  lastFlush = Date.now();
+  parentPort.postMessage({
+    type: 'telemetry',
+    numeric: numericChanged,
+    text: Object.keys(changedText).length ? changedText : null,
+    lines: lines.items.length ? lines : null,
+    events: events.length ? events : null,
+    trace
+  });
+  numericChanged = false;
+  changedText = {};
+  lines = { items: [], dropped: 0 };
+  events = [];
+  trace = null;
+}
+
+function start(port) {
+  socket = dgram.createSocket('udp4');
+  socket.on('listening', () => {
+    const address = socket.address();
+    parentPort.postMessage({ type: 'listening', address: address.address, port: address.port });
+  });
+  socket.on('message', handleDatagram);
+  socket.on('error', (err) => {
+    parentPort.postMessage({ type: 'error', message: err.message });
+  });
+  socket.bind(port);
+}
+
+parentPort.on('message', (message) => {
+  if (message.type === 'stop') {
+    if (flushTimer) {
+      clearTimeout(flushTimer);
+      flush();
+    }
+    socket.close(() => process.exit(0));
+  }
+});
+
+start(workerData.port);
@@ -7,7 +7,7 @@ call venv\Scripts\activate
 
 REM Start MAVLink parser in background
 echo Starting MAVLink parser on port 14550...
-start /B python src\python\mavlink_parser.py 14550 14551
+start /B python src\python\mavlink_parser.py 14550 14551 %*
 
 REM Wait a moment for parser to start
 timeout /t 3 /nobreak > nul
@@ -7,7 +7,7 @@ source venv/bin/activate
 
 # Start MAVLink parser in background
 echo "Starting MAVLink parser on port 14550..."
-python src/python/mavlink_parser.py 14550 14551 &
+python src/python/mavlink_parser.py 14550 14551 "$@" &
 PARSER_PID=$!
 
 # Wait a moment for parser to start
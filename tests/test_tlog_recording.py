@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tlog Recording
+Records datagrams through MAVLinkParser and TlogWriter and reads the .tlog
+back with flight_log.
+"""
+
+import os
+import sys
+import socket
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'python'))
+
+from flight_log import FlightLog, TlogWriter
+from mavlink_frames import GLOBAL_POSITION_INT, encode_frames
+from mavlink_parser import MAVLinkParser
+from mavlink_router import scan_frames
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def position_frame(seq, lat):
+    payload = GLOBAL_POSITION_INT.empty(1)
+    payload['lat'] = lat
+    payload['lon'] = 747000000
+    return encode_frames(GLOBAL_POSITION_INT, payload, seq, sysid=1)[0].tobytes()
+
+class TlogRecordingTest(unittest.TestCase):
+    def test_half_duplicate_datagram(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'flight.tlog')
+            primary, backup = free_port(), free_port()
+            parser = MAVLinkParser(primary, free_port(), backup_ports=[backup], timesync=False,
+                                   trace=False, tlog=path)
+            thread = threading.Thread(target=parser.start, daemon=True)
+            thread.start()
+            first, second = position_frame(0, 340000000), position_frame(1, 340001000)
+            with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+                deadline = time.monotonic() + 5
+                while parser.message_count < 1 and time.monotonic() < deadline:
+                    sender.sendto(first, ('127.0.0.1', primary))
+                    time.sleep(0.05)
+                # The backup link repeats the first frame ahead of a new one
+                sender.sendto(first + second, ('127.0.0.1', backup))
+                while parser.message_count < 2 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+            parser.is_running = False
+            thread.join(5)
+
+            self.assertEqual(os.path.getsize(path), 2 * (8 + len(first)))
+            log = FlightLog(path)
+            self.assertEqual(log.meta['frames'], 2)
+            self.assertEqual(log.meta['skipped_bytes'], 0)
+            self.assertEqual(list(log.column('GLOBAL_POSITION_INT', 'seq')), [0, 1])
+            self.assertEqual(list(log.column('GLOBAL_POSITION_INT', 'lat')), [340000000, 340001000])
+
+    def test_bad_checksum_is_dropped(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'flight.tlog')
+            good = position_frame(0, 340000000)
+            corrupt = bytearray(position_frame(1, 340001000))
+            corrupt[12] ^= 0xFF
+            writer = TlogWriter(path)
+            writer.write(corrupt + good, scan_frames(corrupt + good))
+            writer.close()
+
+            self.assertEqual((writer.frames, writer.bad_crc), (1, 1))
+            log = FlightLog(path)
+            self.assertEqual(list(log.column('GLOBAL_POSITION_INT', 'lat')), [340000000])
+
+if __name__ == '__main__':
+    unittest.main()